@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+# Modules whose import dominates cold-start time when they are loaded eagerly
+HEAVY_MODULES = ['pandas', 'matplotlib', 'seaborn', 'scipy']
+
+def time_command(command, cwd, repeats):
+    """
+    Run a command in fresh interpreters and time each run.
+
+    Args:
+    - command (list): Command and arguments.
+    - cwd (str): Working directory of the command.
+    - repeats (int): Number of runs.
+
+    Returns:
+    - list: Wall-clock seconds of each run.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def loaded_heavy_modules(repo_dir):
+    """
+    List the heavy modules loaded by importing mica_main.
+
+    Args:
+    - repo_dir (str): Repository directory holding mica_main.py.
+
+    Returns:
+    - list: Names from HEAVY_MODULES that are imported along with mica_main.
+    """
+    code = (
+        "import sys, mica_main; "
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=repo_dir, check=True, capture_output=True, text=True).stdout
+    return [name for name in output.strip().split(',') if name]
+
+def startup_commands(repo_dir, result_dir, mutation_file, seq_length):
+    """
+    Commands whose cold-start time is measured.
+
+    Args:
+    - repo_dir (str): Repository directory holding mica_main.py.
+    - result_dir (str): Scratch result directory.
+    - mutation_file (str): Small mutation data file.
+    - seq_length (int): Sequence length of the mutation data.
+
+    Returns:
+    - list: (name, command) pairs.
+    """
+    main = [sys.executable, os.path.join(repo_dir, 'mica_main.py')]
+    run = main + ['-f', mutation_file, '-l', str(seq_length)]
+    return [
+        ('help', main + ['-h']),
+        ('import', [sys.executable, '-c', 'import mica_main']),
+        ('run', run + ['-r', os.path.join(result_dir, 'run')]),
+        ('run --plot', run + ['-r', os.path.join(result_dir, 'plot'), '--plot']),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of mica_main.py.")
+    parser.add_argument('--repo', type=str, default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="Repository to benchmark, e.g. a git worktree of an older commit to compare against")
+    parser.add_argument('-f', '--file', type=str, help="Small mutation data file (default: mutations_data.csv of the repository)")
+    parser.add_argument('-l', '--length', type=int, default=30000, help="Sequence length of the mutation data")
+    parser.add_argument('-n', '--repeats', type=int, default=5, help="Number of cold starts per command")
+    parser.add_argument('--no_plot', action='store_true', help="Skip the --plot run")
+    args = parser.parse_args()
+
+    repo_dir = os.path.abspath(args.repo)
+    mutation_file = os.path.abspath(args.file or os.path.join(repo_dir, 'mutations_data.csv'))
+
+    print(f"Repository: {repo_dir}")
+    print(f"Heavy modules loaded by 'import mica_main': {', '.join(loaded_heavy_modules(repo_dir)) or 'none'}")
+    print(f"{'command':<12} {'median s':>9} {'min s':>7}")
+    with tempfile.TemporaryDirectory() as result_dir:
+        for name, command in startup_commands(repo_dir, result_dir, mutation_file, args.length):
+            if args.no_plot and name == 'run --plot':
+                continue
+            times = time_command(command, repo_dir, args.repeats)
+            print(f"{name:<12} {statistics.median(times):>9.3f} {min(times):>7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,24 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning, message="Unable to import Axes3D")
 
 import os
+import math
 import argparse
-from src.data_processor import process_mutation_data, process_region_details
-from src.result_writer import write_processed_data, write_region_data_to_csv
-from src.data_bucketer import bucket_subsubregions_to_subregions, bucket_subregions_to_regions
-from src.plotter import generate_plots
-# from src.heatmapper import plot_region_heatmap, plot_subregion_heatmap, plot_subsubregion_heatmap
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from src.data_processor import build_region_hierarchy, process_geometry_sweep, process_kernel_sweep, process_mutation_array_windows, process_mutation_columns, process_mutation_data, scores_to_processed_data
+from src.result_writer import OUTPUT_FORMATS, write_processed_data, write_region_hierarchy_to_csv, write_result_columns, write_results_to_csv
+from src.manifest_reader import read_manifest
+from src.variant_file_reader import contig_dir_name, detect_variant_format, read_contig_lengths, read_variant_data
+from src.tiling_cache import configure_tiling_cache
+from src.scoring_service import DEFAULT_HOST, DEFAULT_PORT, run_service
+from src.mutation_and_weight_assignor import DECAY_KERNELS, DEFAULT_DECAY_LENGTH, DecayKernel, read_kernel_table
+from src.mutation_file_reader import read_mutation_arrays
+from src.weight_calculator import SCORE_MODES
+from src.seq_partitioner import DEFAULT_GEOMETRY, TilingGeometry, validate_geometry
+from src.stage_profiler import CPROFILE_DUMP, PROFILE_REPORT, configure_profiling, profile_stage, run_profiled
 
-def run_ecmpia_analysis(mutation_file_path, result_dir, seq_length, plot=False):
+def run_ecmpia_analysis(mutation_file_path, result_dir, seq_length, plot=False, output_format='compat', heatmaps=False, kernel=None, geometry=DEFAULT_GEOMETRY, window_length=None, metrics=None):
     """
     Run the ECMPIA analysis using the specified mutations_data.csv file and result directory.
 
@@ -18,44 +28,547 @@ def run_ecmpia_analysis(mutation_file_path, result_dir, seq_length, plot=False):
     - result_dir (str): Path to the directory where the results will be stored.
     - seq_length (int): Length of the DNA sequence.
     - plot (bool): Whether to plot the data or not.
+    - output_format (str): 'compat' for the original CSV files, or 'csv', 'csv.gz' or 'parquet' for typed columns.
+    - heatmaps (bool): Whether to plot the score heatmaps of region_details.csv (compat output only).
+    - kernel (DecayKernel, optional): Score by positional weighted impact with this decay kernel instead of by summed impact.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions, subregions and regions.
+    - window_length (int, optional): Process the sequence window by window (compat output without plots), so
+      memory depends on the window length rather than on the sequence length.
+    - metrics (list, optional): Collects the StageMetrics of every stage (see profile_ecmpia_analysis).
+
+    Returns:
+    - RegionHierarchy: Regions, subregions and sub-subregions with their scores, or None if the analysis failed.
     """
 
     try:
+        if window_length is not None:
+            with profile_stage(metrics, 'read') as counts:
+                mutations = read_mutation_arrays(mutation_file_path)
+                if isinstance(mutations, str):
+                    raise ValueError(mutations)
+                counts['mutations'] = len(mutations[0])
+
+            windows = process_mutation_array_windows(mutations, seq_length, window_length, geometry, kernel)
+            return report_ecmpia_windows(windows, result_dir, heatmaps, kernel, geometry, window_length, metrics)
+
         # Process mutation data
-        positional_scores_0_data, positional_scores_15_data, combined_data_csv = process_mutation_data(mutation_file_path, seq_length)
-
-        # Write processed data to CSV files if processing was successful
-        if positional_scores_0_data is not None and positional_scores_15_data is not None and combined_data_csv is not None:
-            write_processed_data(result_dir, positional_scores_0_data, positional_scores_15_data, combined_data_csv)
-            
-            # Call the bucket_subsubregions_to_subregions function
-            subregions = bucket_subsubregions_to_subregions(combined_data_csv)
-
-            # Call the bucket_subregions_to_regions function
-            regions = bucket_subregions_to_regions(subregions)
-            
-            # Process region details
-            region_details = process_region_details(regions)
-
-            # Write region details to CSV
-            write_region_data_to_csv(result_dir, region_details)
-
-            # Generate and save plots if the plot argument is True
-            if plot:
-                generate_plots(positional_scores_0_data, positional_scores_15_data, combined_data_csv, region_details, result_dir)
-                # plot_region_heatmap(region_weights_file_path, result_dir)
-                # plot_subregion_heatmap(region_details_file_path, result_dir)
-                # plot_subsubregion_heatmap(region_details_file_path, result_dir)
+        scores = process_mutation_data(mutation_file_path, seq_length, columnar=True, kernel=kernel, geometry=geometry, metrics=metrics)
+
+        return report_ecmpia_analysis(scores, result_dir, plot, output_format, heatmaps, kernel, geometry, metrics)
+
+    except ValueError as e:
+        print(e)
+
+def report_ecmpia_analysis(scores, result_dir, plot=False, output_format='compat', heatmaps=False, kernel=None, geometry=DEFAULT_GEOMETRY, metrics=None):
+    """
+    Group, write and optionally plot columnar mutation scores.
+
+    Args:
+    - scores (tuple): (scores_0, scores_15, combined_scores) from process_mutation_columns.
+    - result_dir (str): Path to the directory where the results will be stored.
+    - plot (bool): Whether to plot the data or not.
+    - output_format (str): 'compat' for the original CSV files, or 'csv', 'csv.gz' or 'parquet' for typed columns.
+    - heatmaps (bool): Whether to plot the score heatmaps of region_details.csv (compat output only).
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted subregion and region scores; None averages them.
+    - geometry (TilingGeometry, optional): Tiling geometry the scores were computed with, giving the subregion and region sizes.
+    - metrics (list, optional): Collects the StageMetrics of the hierarchy, region_details, write, plot and heatmaps stages.
+
+    Returns:
+    - RegionHierarchy: Regions, subregions and sub-subregions with their scores.
+    """
+    scores_0, scores_15, combined_scores = scores
+
+    # Group the combined intervals into subregions and regions
+    with profile_stage(metrics, 'hierarchy') as counts:
+        region_hierarchy = build_region_hierarchy(
+            combined_scores.intervals, combined_scores.scores,
+            geometry.subsubregions_per_subregion, geometry.subregions_per_region, kernel
+        )
+        counts['subregions'] = len(region_hierarchy.subregion_scores)
+        counts['regions'] = len(region_hierarchy.region_scores)
+
+    # Write results; mutation lists are only built for the original CSV files
+    if output_format == 'compat':
+        with profile_stage(metrics, 'write'):
+            write_processed_data(result_dir, *scores_to_processed_data(scores_0, scores_15, combined_scores))
+        with profile_stage(metrics, 'region_details'):
+            write_region_hierarchy_to_csv(result_dir, region_hierarchy)
+    else:
+        with profile_stage(metrics, 'write'):
+            write_result_columns(result_dir, scores_0, scores_15, combined_scores, region_hierarchy, output_format)
+
+    # Generate and save plots if the plot argument is True
+    if plot:
+        with profile_stage(metrics, 'plot'):
+            # The plotting stack is slow to import, so it is only loaded when plots are requested
+            from src.plotter import generate_plots
+            generate_plots(scores_0, scores_15, combined_scores, region_hierarchy, result_dir)
+
+    # Heatmaps are plotted from the region_details.csv file just written
+    if heatmaps and output_format == 'compat':
+        with profile_stage(metrics, 'heatmaps'):
+            from src.heatmapper import plot_heatmaps
+            for message in plot_heatmaps(result_dir):
+                print(message)
+
+    return region_hierarchy
+
+def report_ecmpia_windows(windows, result_dir, heatmaps=False, kernel=None, geometry=DEFAULT_GEOMETRY, window_length=None, metrics=None):
+    """
+    Write the columnar scores of a sequence window by window as the original CSV files.
+
+    Each window's sub-subregion and combined interval rows are appended as soon as it is scored; only the
+    combined interval bounds and scores of the whole sequence are kept, for the region hierarchy.
+
+    Args:
+    - windows (iterable): (window_start, window_end, scores_0, scores_15, combined_scores) of each window, from
+      process_mutation_array_windows.
+    - result_dir (str): Path to the directory where the results will be stored.
+    - heatmaps (bool): Whether to plot the score heatmaps of region_details.csv.
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted subregion and region scores; None averages them.
+    - geometry (TilingGeometry, optional): Tiling geometry the scores were computed with, giving the subregion and region sizes.
+    - window_length (int, optional): Window length in bp, also bounding the region detail rows written at once.
+    - metrics (list, optional): Collects the StageMetrics of the windows, hierarchy, region_details and heatmaps stages.
+
+    Returns:
+    - RegionHierarchy: Regions, subregions and sub-subregions with their scores.
+    """
+    # Score and write the windows, keeping the combined intervals and their scores
+    with profile_stage(metrics, 'windows') as counts:
+        intervals, scores = [], []
+        for _, _, scores_0, scores_15, combined_scores in windows:
+            write_processed_data(result_dir, *scores_to_processed_data(scores_0, scores_15, combined_scores), append=bool(intervals))
+            intervals.append(combined_scores.intervals)
+            scores.append(combined_scores.scores)
+        counts['windows'] = len(intervals)
+        counts['intervals'] = sum(map(len, intervals))
+
+    # Group the combined intervals into subregions and regions
+    with profile_stage(metrics, 'hierarchy') as counts:
+        region_hierarchy = build_region_hierarchy(
+            np.concatenate(intervals), np.concatenate(scores),
+            geometry.subsubregions_per_subregion, geometry.subregions_per_region, kernel
+        )
+        counts['subregions'] = len(region_hierarchy.subregion_scores)
+        counts['regions'] = len(region_hierarchy.region_scores)
+
+    with profile_stage(metrics, 'region_details'):
+        chunk_size = 2 * window_length // geometry.step if window_length else None
+        write_region_hierarchy_to_csv(result_dir, region_hierarchy, chunk_size)
+
+    if heatmaps:
+        with profile_stage(metrics, 'heatmaps'):
+            from src.heatmapper import plot_heatmaps
+            for message in plot_heatmaps(result_dir):
+                print(message)
+
+    return region_hierarchy
+
+def profile_ecmpia_analysis(mutation_file_path, result_dir, seq_length, plot=False, output_format='compat', heatmaps=False, kernel=None, geometry=DEFAULT_GEOMETRY, window_length=None):
+    """
+    Run the ECMPIA analysis with per-stage timing and memory metrics.
+
+    The metrics are written to <result_dir>/profile.json, with the cProfile statistics in <result_dir>/profile.pstats
+    and tracemalloc peaks per stage if enabled with configure_profiling. The arguments are those of run_ecmpia_analysis.
+
+    Returns:
+    - tuple: (RegionHierarchy or None, AnalysisMetrics) of the analysis.
+    """
+    info = {
+        'mutation_file': mutation_file_path, 'seq_length': seq_length, 'plot': plot, 'output_format': output_format,
+        'kernel': kernel._asdict() if kernel is not None else None, 'geometry': geometry._asdict(), 'window_length': window_length
+    }
+    return run_profiled(
+        run_ecmpia_analysis, (mutation_file_path, result_dir, seq_length, plot, output_format, heatmaps, kernel, geometry, window_length), result_dir, info
+    )
+
+def run_kernel_sweep(mutation_file_path, result_dir, seq_length, kernels, geometry=DEFAULT_GEOMETRY):
+    """
+    Score one mutation file with positional weighted scores for each of several decay kernels.
+
+    The region scores of every kernel are written to <result_dir>/kernel_sweep_region_scores.csv.
+
+    Args:
+    - mutation_file_path (str): Path to the mutations_data.csv file.
+    - result_dir (str): Path to the directory where the results will be stored.
+    - seq_length (int): Length of the DNA sequence.
+    - kernels (list): DecayKernel of each setting.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions, subregions and regions.
+
+    Returns:
+    - list: Table rows [kernel, decay_length, region_number, region_range, region_score], or None if the analysis failed.
+    """
+    mutations = read_mutation_arrays(mutation_file_path)
+    if isinstance(mutations, str):
+        print(mutations)
+        return None
+
+    try:
+        region_hierarchies = process_kernel_sweep(mutations, seq_length, kernels, geometry)
+    except ValueError as e:
+        print(e)
+        return None
+
+    rows = [
+        [kernel.name, kernel.decay_length, region_number, tuple(region_range), region_score]
+        for kernel, region_hierarchy in zip(kernels, region_hierarchies)
+        for region_number, (region_range, region_score) in enumerate(
+            zip(region_hierarchy.region_ranges.tolist(), region_hierarchy.region_scores.tolist()), start=1
+        )
+    ]
+    write_results_to_csv(os.path.join(result_dir, 'kernel_sweep_region_scores.csv'), rows, [
+        'Kernel', 'Decay Length', 'Region Number', 'Region Range', 'Region Score'
+    ])
+    return rows
+
+def run_geometry_sweep(mutation_file_path, result_dir, seq_length, geometries, kernel=None):
+    """
+    Score one mutation file on each of several tiling geometries.
+
+    The region scores of every geometry are written to <result_dir>/geometry_sweep_region_scores.csv.
 
+    Args:
+    - mutation_file_path (str): Path to the mutations_data.csv file.
+    - result_dir (str): Path to the directory where the results will be stored.
+    - seq_length (int): Length of the DNA sequence.
+    - geometries (list): TilingGeometry of each setting.
+    - kernel (DecayKernel, optional): Score by positional weighted impact with this decay kernel instead of by summed impact.
+
+    Returns:
+    - list: Table rows [step, offset, max_length, subsubregions_per_subregion, subregions_per_region, region_number,
+      region_range, region_score], or None if the analysis failed.
+    """
+    mutations = read_mutation_arrays(mutation_file_path)
+    if isinstance(mutations, str):
+        print(mutations)
+        return None
+
+    try:
+        region_hierarchies = process_geometry_sweep(mutations, seq_length, geometries, kernel)
     except ValueError as e:
         print(e)
+        return None
+
+    rows = [
+        list(geometry) + [region_number, tuple(region_range), region_score]
+        for geometry, region_hierarchy in zip(geometries, region_hierarchies)
+        for region_number, (region_range, region_score) in enumerate(
+            zip(region_hierarchy.region_ranges.tolist(), region_hierarchy.region_scores.tolist()), start=1
+        )
+    ]
+    write_results_to_csv(os.path.join(result_dir, 'geometry_sweep_region_scores.csv'), rows, [
+        'Step', 'Offset', 'Max Length', 'Sub-subregions per Subregion', 'Subregions per Region',
+        'Region Number', 'Region Range', 'Region Score'
+    ])
+    return rows
+
+def run_variant_analysis(variant_file_path, result_dir, plot=False, info_field='impact_score', contig_lengths=None, seq_length=None, bed_score_column=5, output_format='compat', heatmaps=False, kernel=None, geometry=DEFAULT_GEOMETRY, window_length=None):
+    """
+    Run the ECMPIA analysis on every contig of a VCF or BED file, writing each contig's results to <result_dir>/<contig>
+    (see contig_dir_name for names that are not safe as directory names).
+
+    Args:
+    - variant_file_path (str): Path to the plain or bgzipped VCF or BED file.
+    - result_dir (str): Path to the directory where the results will be stored.
+    - plot (bool): Whether to plot the data or not.
+    - info_field (str, optional): VCF INFO field holding the impact score.
+    - contig_lengths (dict, optional): Contig lengths overriding the VCF header lengths.
+    - seq_length (int, optional): Length used for contigs whose length is otherwise unknown.
+    - bed_score_column (int, optional): 1-based BED column holding the impact score.
+    - output_format (str): 'compat' for the original CSV files, or 'csv', 'csv.gz' or 'parquet' for typed columns.
+    - heatmaps (bool): Whether to plot the score heatmaps of each contig (compat output only).
+    - kernel (DecayKernel, optional): Score by positional weighted impact with this decay kernel instead of by summed impact.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions, subregions and regions.
+
+    - window_length (int, optional): Process each contig window by window (compat output without plots).
+
+    Returns:
+    - dict: RegionHierarchy of each successfully analyzed contig.
+    """
+    contigs = read_variant_data(variant_file_path, info_field, contig_lengths, bed_score_column)
+    if isinstance(contigs, str):
+        print(contigs)
+        return {}
+
+    region_hierarchies = {}
+    dir_names = set()
+    for contig, (mutations, contig_length) in contigs.items():
+        contig_length = contig_length or seq_length
+        if contig_length is None:
+            print(f"Contig {contig}: unknown length. Add a ##contig header or pass --contig_lengths or --length.")
+            continue
+        try:
+            dir_name = contig_dir_name(contig, dir_names)
+            dir_names.add(dir_name)
+            contig_dir = os.path.join(result_dir, dir_name)
+            if window_length is not None:
+                windows = process_mutation_array_windows(mutations, contig_length, window_length, geometry, kernel)
+                region_hierarchies[contig] = report_ecmpia_windows(windows, contig_dir, heatmaps, kernel, geometry, window_length)
+                continue
+            scores = process_mutation_columns(mutations, contig_length, kernel, geometry)
+            region_hierarchies[contig] = report_ecmpia_analysis(scores, contig_dir, plot, output_format, heatmaps, kernel, geometry)
+        except ValueError as e:
+            print(f"Contig {contig}: {e}")
+    return region_hierarchies
+
+def run_sample_analysis(sample, plot=False, output_format='compat', kernel=None, geometry=DEFAULT_GEOMETRY, profile=False, window_length=None):
+    """
+    Run the ECMPIA analysis for one sample of a batch manifest.
+
+    Any error of the sample is reported and returned as a failure, so the rest of the batch still runs.
+
+    Args:
+    - sample (dict): Manifest entry with 'sample', 'mutation_file', 'seq_length' and 'result_dir'.
+    - plot (bool): Whether to plot the data or not.
+    - output_format (str): Output format of the per-sample results.
+    - kernel (DecayKernel, optional): Score by positional weighted impact with this decay kernel instead of by summed impact.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions, subregions and regions.
+    - profile (bool): Whether to write the profile report of the sample to its result directory.
+    - window_length (int, optional): Process the sample window by window (compat output without plots).
+
+    Returns:
+    - list: Cohort table rows [sample, region_number, region_range, region_score], or None if the analysis failed.
+    """
+    try:
+        if profile:
+            region_hierarchy, _ = profile_ecmpia_analysis(sample['mutation_file'], sample['result_dir'], sample['seq_length'], plot, output_format, kernel=kernel, geometry=geometry, window_length=window_length)
+        else:
+            region_hierarchy = run_ecmpia_analysis(sample['mutation_file'], sample['result_dir'], sample['seq_length'], plot, output_format, kernel=kernel, geometry=geometry, window_length=window_length)
+    except Exception as e:
+        print(f"Sample {sample['sample']} failed: {type(e).__name__}: {e}")
+        return None
+    if region_hierarchy is None:
+        print(f"Sample {sample['sample']} failed.")
+        return None
+    return [
+        [sample['sample'], region_number, tuple(region_range), region_score]
+        for region_number, (region_range, region_score) in enumerate(
+            zip(region_hierarchy.region_ranges.tolist(), region_hierarchy.region_scores.tolist()), start=1
+        )
+    ]
+
+def init_batch_worker(tiling_cache_dir=None, plot_figures=None, trace_memory=False, cprofile=False):
+    """
+    Configure the tiling cache, plots and profiling of a batch worker process.
+
+    Args:
+    - tiling_cache_dir (str, optional): Directory of an on-disk tiling cache shared by the workers.
+    - plot_figures (list, optional): Figures to render for each plotted sample.
+    - trace_memory (bool, optional): Trace per-stage Python memory peaks of profiled samples.
+    - cprofile (bool, optional): Dump the cProfile statistics of profiled samples.
+    """
+    configure_tiling_cache(cache_dir=tiling_cache_dir)
+    configure_profiling(trace_memory=trace_memory, cprofile=cprofile)
+    if plot_figures is not None:
+        # Samples already run in parallel, so each worker renders its figures one at a time
+        from src.plotter import configure_plots
+        configure_plots(figures=plot_figures, jobs=1)
+
+def run_batch_analysis(manifest_path, result_dir, plot=False, jobs=1, tiling_cache_dir=None, output_format='compat', plot_figures=None, kernel=None, geometry=DEFAULT_GEOMETRY, profile=False, trace_memory=False, cprofile=False, window_length=None):
+    """
+    Run the ECMPIA analysis for every sample of a batch manifest in one process (or a pool of jobs processes).
+
+    Samples are processed in order of sequence length so each worker reuses the cached tiling of a length.
+    Each sample's results are written to its own result directory, and the region scores of all samples
+    to <result_dir>/cohort_region_scores.csv.
+
+    Args:
+    - manifest_path (str): Path to the manifest CSV file.
+    - result_dir (str): Directory of the cohort table and default parent of per-sample result directories.
+    - plot (bool): Whether to plot the data or not.
+    - jobs (int): Number of worker processes.
+    - tiling_cache_dir (str, optional): Directory of an on-disk tiling cache shared by the workers.
+    - output_format (str): Output format of the per-sample results.
+    - plot_figures (list, optional): Figures to render for each plotted sample (default: all).
+    - kernel (DecayKernel, optional): Score by positional weighted impact with this decay kernel instead of by summed impact.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions, subregions and regions.
+    - profile (bool): Whether to write the profile report of each sample to its result directory.
+    - trace_memory (bool): Trace per-stage Python memory peaks of profiled samples.
+    - cprofile (bool): Dump the cProfile statistics of each profiled sample.
+    - window_length (int, optional): Process each sample window by window (compat output without plots).
+
+    Returns:
+    - list: Cohort table rows, or None if the manifest could not be read.
+    """
+    samples = read_manifest(manifest_path, result_dir)
+    if not isinstance(samples, list):
+        print(samples)
+        return None
+
+    # Process samples grouped by sequence length, then restore the manifest order
+    by_length = sorted(range(len(samples)), key=lambda i: samples[i]['seq_length'])
+    sorted_samples = [samples[i] for i in by_length]
+    plots = [plot] * len(samples)
+    output_formats = [output_format] * len(samples)
+    kernels = [kernel] * len(samples)
+    geometries = [geometry] * len(samples)
+    profiles = [profile] * len(samples)
+    window_lengths = [window_length] * len(samples)
+    if jobs > 1:
+        chunksize = max(1, len(samples) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker, initargs=(tiling_cache_dir, (plot_figures or []) if plot else None, trace_memory, cprofile)) as executor:
+            sorted_results = list(executor.map(run_sample_analysis, sorted_samples, plots, output_formats, kernels, geometries, profiles, window_lengths, chunksize=chunksize))
+    else:
+        sorted_results = list(map(run_sample_analysis, sorted_samples, plots, output_formats, kernels, geometries, profiles, window_lengths))
+    results = [None] * len(samples)
+    for i, rows in zip(by_length, sorted_results):
+        results[i] = rows
+
+    cohort_rows = [row for rows in results if rows is not None for row in rows]
+    write_results_to_csv(os.path.join(result_dir, 'cohort_region_scores.csv'), cohort_rows, [
+        'Sample', 'Region Number', 'Region Range', 'Region Score'
+    ])
+    print(f"Analyzed {sum(rows is not None for rows in results)} of {len(samples)} samples.")
+    return cohort_rows
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run ECMPIA analysis on mutation data.")
-    parser.add_argument('-f', '--file', type=str, required=True, help="Path to the mutations_data.csv file")
-    parser.add_argument('-r', '--result_dir', type=str, required=True, help="Path to the ECMPIA result directory")
-    parser.add_argument('-l', '--length', type=int, required=True, help="Length of the DNA sequence")
+    parser.add_argument('-f', '--file', type=str, help="Path to the mutations_data.csv file")
+    parser.add_argument('-r', '--result_dir', type=str, help="Path to the ECMPIA result directory")
+    parser.add_argument('-l', '--length', type=int, help="Length of the DNA sequence")
+    parser.add_argument('-m', '--manifest', type=str, help="Path to a batch manifest CSV with sample, mutation_file, seq_length and result_dir columns")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="Number of worker processes for batch mode and the scoring service (1 scores in the service process)")
     parser.add_argument('--plot', action='store_true', help="Option to plot the data")
+    parser.add_argument('--plots', type=str, help="Comma-separated figures to render (implies --plot; default: all of mutation_positions, regions_subregions, density, hierarchy, regions, subregions, subsubregions)")
+    parser.add_argument('--heatmaps', action='store_true', help="Plot clustered heatmaps of the region, subregion and sub-subregion scores (compat output only)")
+    parser.add_argument('--tiling_cache_dir', type=str, help="Directory of an on-disk tiling cache shared between runs")
+    parser.add_argument('--info_field', type=str, default='impact_score', help="VCF INFO field holding the impact score")
+    parser.add_argument('--contig_lengths', type=str, help="Two-column (contig, length) file, e.g. a .fai index, for VCF/BED input")
+    parser.add_argument('--bed_score_column', type=int, default=5, help="1-based BED column holding the impact score")
+    parser.add_argument('--output_format', choices=OUTPUT_FORMATS, default='compat', help="Result file format: the original CSV files (compat) or typed start/end/score/mutation_count columns as csv, csv.gz or parquet")
+    parser.add_argument('--score', choices=SCORE_MODES, default='impact', help="Score sub-subregions by summed impact, or by positional weighted impact that decays with the distance from each mutation")
+    parser.add_argument('--kernel', type=str, help=f"Comma-separated decay kernels of positional weights (implies --score positional; default: exponential; choose from {', '.join(DECAY_KERNELS)})")
+    parser.add_argument('--decay_length', type=str, default=str(DEFAULT_DECAY_LENGTH), help="Comma-separated decay lengths (positions for sub-subregions, items for subregions and regions) of the kernels")
+    parser.add_argument('--kernel_table', type=str, help="File with the weight of the distances 0, 1, 2, ... one per line, for the table kernel (implies --kernel table)")
+    parser.add_argument('--step', type=str, default=str(DEFAULT_GEOMETRY.step), help="Comma-separated steps in bp between the starts of consecutive sub-subregions")
+    parser.add_argument('--offset', type=str, default=str(DEFAULT_GEOMETRY.offset), help="Comma-separated offsets in bp of the second, shifted set of sub-subregions")
+    parser.add_argument('--max_length', type=str, default=str(DEFAULT_GEOMETRY.max_length), help="Comma-separated lengths in bp of the longest sub-subregion (the last one of each set absorbs the remainder)")
+    parser.add_argument('--subsubregions_per_subregion', type=str, default=str(DEFAULT_GEOMETRY.subsubregions_per_subregion), help="Comma-separated numbers of combined sub-subregions per subregion")
+    parser.add_argument('--subregions_per_region', type=str, default=str(DEFAULT_GEOMETRY.subregions_per_region), help="Comma-separated numbers of regions the subregions are split into")
+    parser.add_argument('--window_length', type=int, help="Process the sequence in windows of about this many bp, so memory depends on the window length rather than the sequence length (compat output without plots)")
+    parser.add_argument('--profile', action='store_true', help=f"Write the wall time, CPU time, peak RSS and item counts of every analysis stage to {PROFILE_REPORT} in the result directory")
+    parser.add_argument('--trace_memory', action='store_true', help="Also trace the peak Python memory of every stage with tracemalloc (slower; implies --profile)")
+    parser.add_argument('--cprofile', action='store_true', help=f"Also dump cProfile statistics to {CPROFILE_DUMP} in the result directory (implies --profile)")
+    parser.add_argument('--serve', action='store_true', help="Run a long-lived scoring service (POST /score) instead of a single analysis")
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help="Host of the scoring service")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port of the scoring service")
+    parser.add_argument('--socket', type=str, help="Unix socket of the scoring service, instead of host and port")
+    parser.add_argument('--warm_lengths', type=str, help="Comma-separated sequence lengths whose tilings the service builds at start-up")
+    parser.add_argument('--data_dir', type=str, help="Directory whose mutation files scoring requests may name with 'mutation_file' (default: inline mutations only)")
     args = parser.parse_args()
 
-    run_ecmpia_analysis(args.file, args.result_dir, args.length, args.plot)
+    if args.serve:
+        try:
+            warm_lengths = tuple(int(length) for length in args.warm_lengths.split(',')) if args.warm_lengths else ()
+        except ValueError:
+            parser.error("--warm_lengths must be a comma-separated list of integers")
+        if args.data_dir and not os.path.isdir(args.data_dir):
+            parser.error(f"--data_dir is not a directory: {args.data_dir}")
+        run_service(
+            host=args.host, port=args.port, socket_path=args.socket, workers=args.jobs if args.jobs > 1 else 0,
+            tiling_cache_dir=args.tiling_cache_dir, warm_lengths=warm_lengths, data_dir=args.data_dir
+        )
+        parser.exit()
+
+    if args.result_dir is None:
+        parser.error("the following arguments are required: -r/--result_dir")
+
+    variant_input = args.file is not None and detect_variant_format(args.file) is not None
+    if args.manifest is None and (args.file is None or (args.length is None and not variant_input)):
+        parser.error("the following arguments are required: -f/--file and -l/--length (or -m/--manifest)")
+
+    if args.tiling_cache_dir:
+        configure_tiling_cache(cache_dir=args.tiling_cache_dir)
+
+    plot_figures = None
+    if args.plots:
+        from src.plotter import PLOT_FIGURES, configure_plots
+        plot_figures = [figure.strip() for figure in args.plots.split(',') if figure.strip()]
+        unknown = [figure for figure in plot_figures if figure not in PLOT_FIGURES]
+        if unknown:
+            parser.error(f"unknown figures in --plots: {', '.join(unknown)} (choose from {', '.join(PLOT_FIGURES)})")
+        configure_plots(figures=plot_figures)
+        args.plot = True
+
+    # Decay kernels: every named kernel with every decay length, and the table kernel once
+    kernel_names = [name.strip() for name in args.kernel.split(',') if name.strip()] if args.kernel else []
+    unknown = [name for name in kernel_names if name not in DECAY_KERNELS]
+    if unknown:
+        parser.error(f"unknown kernels in --kernel: {', '.join(unknown)} (choose from {', '.join(DECAY_KERNELS)})")
+    if args.kernel_table and 'table' not in kernel_names:
+        kernel_names.append('table')
+    try:
+        decay_lengths = [float(length) for length in args.decay_length.split(',')]
+    except ValueError:
+        parser.error("--decay_length must be a comma-separated list of numbers")
+    if not all(math.isfinite(length) and length > 0 for length in decay_lengths):
+        parser.error("--decay_length must be positive and finite")
+    kernels = [DecayKernel(name, length, None) for name in kernel_names or ['exponential'] if name != 'table' for length in decay_lengths]
+    if 'table' in kernel_names:
+        if not args.kernel_table:
+            parser.error("the table kernel needs --kernel_table")
+        table_kernel = read_kernel_table(args.kernel_table)
+        if isinstance(table_kernel, str):
+            parser.error(table_kernel)
+        kernels.append(table_kernel)
+    if kernel_names or len(decay_lengths) > 1:
+        args.score = 'positional'
+    kernel = kernels[0] if args.score == 'positional' else None
+
+    # Tiling geometries: every combination of the listed values
+    geometry_values = []
+    for field in TilingGeometry._fields:
+        try:
+            geometry_values.append([int(value) for value in getattr(args, field).split(',')])
+        except ValueError:
+            parser.error(f"--{field} must be a comma-separated list of integers")
+    geometries = [TilingGeometry(*values) for values in itertools.product(*geometry_values)]
+    for geometry in geometries:
+        try:
+            validate_geometry(geometry)
+        except ValueError as e:
+            parser.error(str(e))
+    geometry = geometries[0]
+
+    if len(kernels) > 1 and len(geometries) > 1:
+        parser.error("sweep over several kernels or several tiling geometries, not both")
+    if len(kernels) > 1 or len(geometries) > 1:
+        if args.manifest or variant_input:
+            parser.error("a sweep over several kernels, decay lengths or tiling geometries needs a single mutation file (-f and -l)")
+        if args.profile or args.trace_memory or args.cprofile:
+            parser.error("--profile, --trace_memory and --cprofile profile a single analysis, not a sweep")
+        if args.plot or args.heatmaps or args.output_format != 'compat' or args.window_length is not None:
+            parser.error("a sweep writes only its region scores table; drop --plot/--plots, --heatmaps, --output_format and --window_length")
+        if len(kernels) > 1:
+            run_kernel_sweep(args.file, args.result_dir, args.length, kernels, geometry)
+        else:
+            run_geometry_sweep(args.file, args.result_dir, args.length, geometries, kernel)
+        parser.exit()
+
+    if args.heatmaps and (args.manifest or args.output_format != 'compat'):
+        parser.error("--heatmaps needs a single mutation or variant file and --output_format compat")
+
+    if args.window_length is not None:
+        if args.window_length < 1:
+            parser.error("--window_length must be positive")
+        if args.plot or args.output_format != 'compat':
+            parser.error("--window_length writes the original CSV files without plots; drop --plot/--plots and --output_format")
+
+    if args.trace_memory or args.cprofile:
+        args.profile = True
+    if args.profile:
+        if variant_input:
+            parser.error("--profile needs a mutation file (-f and -l) or a manifest (-m)")
+        configure_profiling(trace_memory=args.trace_memory, cprofile=args.cprofile)
+
+    if args.manifest:
+        run_batch_analysis(args.manifest, args.result_dir, args.plot, args.jobs, args.tiling_cache_dir, args.output_format, plot_figures, kernel, geometry, args.profile, args.trace_memory, args.cprofile, args.window_length)
+    elif variant_input:
+        contig_lengths = read_contig_lengths(args.contig_lengths) if args.contig_lengths else None
+        if isinstance(contig_lengths, str):
+            parser.error(contig_lengths)
+        run_variant_analysis(args.file, args.result_dir, args.plot, args.info_field, contig_lengths, args.length, args.bed_score_column, args.output_format, args.heatmaps, kernel, geometry, args.window_length)
+    elif args.profile:
+        profile_ecmpia_analysis(args.file, args.result_dir, args.length, args.plot, args.output_format, args.heatmaps, kernel, geometry, args.window_length)
+    else:
+        run_ecmpia_analysis(args.file, args.result_dir, args.length, args.plot, args.output_format, args.heatmaps, kernel, geometry, args.window_length)
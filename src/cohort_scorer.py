@@ -0,0 +1,132 @@
+from collections import namedtuple
+import numpy as np
+from scipy import sparse as sp
+from src.data_bucketer import bucket_means, bucket_ranges, region_bucket_size
+from src.subsubregion_combiner import covering_subsubregions
+from src.tiling_cache import get_tiling
+
+# Scores of a cohort on one sequence length; every score matrix has one row per sample:
+# - samples: sample ids, in order of first appearance.
+# - intervals, scores: combined [start, end] intervals and the samples x intervals score matrix.
+# - subregion_ranges, subregion_scores: subregion [start, end] ranges and the samples x subregions mean scores.
+# - region_ranges, region_scores: region [start, end] ranges and the samples x regions mean scores.
+CohortScores = namedtuple('CohortScores', ['samples', 'intervals', 'scores', 'subregion_ranges', 'subregion_scores', 'region_ranges', 'region_scores'])
+
+def cohort_columns(table):
+    """
+    Extract sample indices, positions and impacts from a long-format cohort table.
+
+    Args:
+    - table (pd.DataFrame or dict): Table with 'sample_id', 'position' and 'impact' columns.
+
+    Returns:
+    - tuple: (samples, sample_indices, positions, impacts) arrays.
+    """
+    for column in ('sample_id', 'position', 'impact'):
+        if column not in table:
+            raise ValueError(f"Parsing error. The cohort table must contain 'sample_id', 'position' and 'impact' columns. Missing: {column}")
+
+    sample_ids = np.asarray(table['sample_id'])
+    samples, first_rows, sample_indices = np.unique(sample_ids, return_index=True, return_inverse=True)
+
+    # Number samples in order of first appearance
+    appearance = np.argsort(first_rows, kind='stable')
+    rank = np.empty(len(samples), dtype=np.int64)
+    rank[appearance] = np.arange(len(samples))
+
+    positions = np.asarray(table['position'], dtype=np.int64)
+    impacts = np.asarray(table['impact'], dtype=np.float64)
+    return samples[appearance], rank[sample_indices], positions, impacts
+
+def cohort_bin_totals(sample_indices, positions, impacts, num_samples, subsubregions, sparse=False):
+    """
+    Sum the impact scores of every sample in every sub-subregion of a set.
+
+    Args:
+    - sample_indices (np.ndarray): Sample index of each mutation.
+    - positions (np.ndarray): Mutation positions.
+    - impacts (np.ndarray): Mutation impact scores.
+    - num_samples (int): Number of samples.
+    - subsubregions (np.ndarray): (n, 4) array of sorted, non-overlapping sub-subregions.
+    - sparse (bool): Return a scipy.sparse CSR matrix instead of a dense array.
+
+    Returns:
+    - np.ndarray or sp.csr_matrix: samples x sub-subregions impact totals.
+    """
+    bins, inside = covering_subsubregions(subsubregions, positions)
+    shape = (num_samples, len(subsubregions))
+    if sparse:
+        return sp.csr_matrix((impacts[inside], (sample_indices[inside], bins[inside])), shape=shape)
+
+    # One bincount over (sample, sub-subregion) cells sums each sample in input order
+    cells = sample_indices[inside] * len(subsubregions) + bins[inside]
+    return np.bincount(cells, weights=impacts[inside], minlength=shape[0] * shape[1]).reshape(shape)
+
+def bucket_mean_matrix(n, bucket_size):
+    """
+    Sparse matrix averaging consecutive buckets of n columns.
+
+    Args:
+    - n (int): Number of columns to bucket.
+    - bucket_size (int): Number of columns per bucket. The last bucket may be smaller.
+
+    Returns:
+    - sp.csr_matrix: n x buckets averaging matrix.
+    """
+    buckets = np.arange(n) // bucket_size
+    counts = np.bincount(buckets)
+    return sp.csr_matrix((1.0 / counts[buckets], (np.arange(n), buckets)), shape=(n, len(counts)))
+
+def score_cohort(table, seq_length, sparse=False, subsubregions_per_subregion=20, subregions_per_region=10):
+    """
+    Score every sample of a cohort on the combined intervals of one sequence length in one pass.
+
+    Dense scores equal those of process_mutation_data and process_region_details for each sample
+    (given its rows in file order); sparse scores agree up to floating-point rounding.
+
+    Args:
+    - table (pd.DataFrame or dict): Long-format table with 'sample_id', 'position' and 'impact' columns.
+    - seq_length (int): Length of the sequence.
+    - sparse (bool): Return scipy.sparse CSR score matrices instead of dense arrays.
+    - subsubregions_per_subregion (int, optional): Number of combined intervals per subregion. Default is 20.
+    - subregions_per_region (int, optional): Number of regions the subregions are split into. Default is 10.
+
+    Returns:
+    - CohortScores: Combined interval, subregion and region scores of every sample.
+    """
+    samples, sample_indices, positions, impacts = cohort_columns(table)
+    tiling = get_tiling(seq_length)
+    starts, ends = tiling.intervals[:, 0], tiling.intervals[:, 1]
+    lengths = ends - starts + 1
+
+    totals_0 = cohort_bin_totals(sample_indices, positions, impacts, len(samples), tiling.subsubregions_0, sparse)
+    totals_15 = cohort_bin_totals(sample_indices, positions, impacts, len(samples), tiling.subsubregions_15, sparse)
+    coverings = [(totals_0, tiling.covering_0, tiling.covered_0), (totals_15, tiling.covering_15, tiling.covered_15)]
+    total_lengths = sum(np.where(covered, lengths, 0) for _, _, covered in coverings)
+
+    if sparse:
+        # Each combined interval averages the totals of its covering sub-subregions
+        weights = np.divide(1.0, total_lengths, out=np.zeros(len(starts)), where=total_lengths > 0) * lengths
+        scores = sum(
+            totals @ sp.csr_matrix((weights[covered], (covering[covered], np.flatnonzero(covered))), shape=(totals.shape[1], len(starts)))
+            for totals, covering, covered in coverings
+        ).tocsr()
+    else:
+        total_impact_scores = np.zeros((len(samples), len(starts)))
+        for totals, covering, covered in coverings:
+            total_impact_scores += np.where(covered, totals[:, covering] * lengths, 0)
+        scores = np.zeros_like(total_impact_scores)
+        np.divide(total_impact_scores, total_lengths, out=scores, where=total_lengths > 0)
+
+    # Roll combined intervals up into subregions and regions
+    subregion_ranges = bucket_ranges(starts, ends, subsubregions_per_subregion)
+    subregions_per_bucket = region_bucket_size(len(subregion_ranges), subregions_per_region)
+    region_ranges = bucket_ranges(subregion_ranges[:, 0], subregion_ranges[:, 1], subregions_per_bucket)
+    if sparse:
+        subregion_scores = scores @ bucket_mean_matrix(len(starts), subsubregions_per_subregion)
+        region_scores = subregion_scores @ bucket_mean_matrix(len(subregion_ranges), subregions_per_bucket)
+    else:
+        subregion_scores = bucket_means(scores, subsubregions_per_subregion)
+        region_scores = bucket_means(subregion_scores, subregions_per_bucket)
+
+    return CohortScores(samples, tiling.intervals, scores, subregion_ranges, subregion_scores, region_ranges, region_scores)
@@ -1,3 +1,5 @@
+import numpy as np
+
 def bucket_subsubregions_to_subregions(combined_data, subsubregions_per_subregion=20):
     """
     Groups sub-subregions into subregions.
@@ -26,9 +28,111 @@ def bucket_subregions_to_regions(subregions, subregions_per_region=10):
     Returns:
     - list: List of regions, each containing a specified number of subregions.
     """
-    num_subregions_per_region = len(subregions) // subregions_per_region
-    if len(subregions) % subregions_per_region != 0:
-        num_subregions_per_region += 1
+    num_subregions_per_region = region_bucket_size(len(subregions), subregions_per_region)
     
     regions = [subregions[i:i + num_subregions_per_region] for i in range(0, len(subregions), num_subregions_per_region)]
     return regions
+
+def region_bucket_size(num_subregions, subregions_per_region=10):
+    """
+    Number of subregions grouped into each region.
+
+    Args:
+    - num_subregions (int): Total number of subregions.
+    - subregions_per_region (int, optional): Number of regions to split the subregions into. Default is 10.
+
+    Returns:
+    - int: Number of subregions per region.
+    """
+    num_subregions_per_region = num_subregions // subregions_per_region
+    if num_subregions % subregions_per_region != 0:
+        num_subregions_per_region += 1
+    return max(1, num_subregions_per_region)
+
+def bucket_means(values, bucket_size):
+    """
+    Average consecutive buckets of values along the last axis, summing each bucket in order like sum().
+
+    Args:
+    - values (np.ndarray): Values to average; the last axis is bucketed.
+    - bucket_size (int): Number of values per bucket. The last bucket may be smaller.
+
+    Returns:
+    - np.ndarray: Bucket means, with the last axis of length ceil(n / bucket_size).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    num_buckets = -(-n // bucket_size)
+
+    # Pad the last bucket with zeros so all buckets have the same size
+    padded = np.zeros(values.shape[:-1] + (num_buckets * bucket_size,))
+    padded[..., :n] = values
+    padded = padded.reshape(values.shape[:-1] + (num_buckets, bucket_size))
+
+    totals = np.zeros(values.shape[:-1] + (num_buckets,))
+    for i in range(bucket_size):
+        totals += padded[..., i]
+
+    counts = np.full(num_buckets, bucket_size)
+    if num_buckets:
+        counts[-1] = n - bucket_size * (num_buckets - 1)
+    return totals / counts
+
+def bucket_ranges(starts, ends, bucket_size):
+    """
+    Ranges covered by consecutive buckets of intervals.
+
+    Args:
+    - starts (np.ndarray): Interval starts.
+    - ends (np.ndarray): Interval ends.
+    - bucket_size (int): Number of intervals per bucket.
+
+    Returns:
+    - np.ndarray: (n, 2) array of [start, end] rows, one per bucket.
+    """
+    first = np.arange(0, len(starts), bucket_size)
+    last = np.minimum(first + bucket_size, len(starts)) - 1
+    return np.column_stack((starts[first], ends[last]))
+
+def bucket_index(n, bucket_size):
+    """
+    Bucket of each of n consecutive items.
+
+    Args:
+    - n (int): Number of items.
+    - bucket_size (int): Number of items per bucket. The last bucket may be smaller.
+
+    Returns:
+    - np.ndarray: Bucket index of each item.
+    """
+    return np.arange(n) // bucket_size
+
+def grouped_means(values, group_index, num_groups):
+    """
+    Average values by group, summing each group in order like sum().
+
+    Args:
+    - values (np.ndarray): Values to average.
+    - group_index (np.ndarray): Group of each value.
+    - num_groups (int): Number of groups; every group must have at least one value.
+
+    Returns:
+    - np.ndarray: Mean of each group.
+    """
+    # bincount adds the weights of each group in input order, starting from 0
+    totals = np.bincount(group_index, weights=values, minlength=num_groups).astype(np.float64, copy=False)
+    counts = np.bincount(group_index, minlength=num_groups)
+    return totals / counts
+
+def group_first_indices(group_index, num_groups):
+    """
+    Index of the first item of each group of a sorted group index.
+
+    Args:
+    - group_index (np.ndarray): Sorted group of each item.
+    - num_groups (int): Number of groups.
+
+    Returns:
+    - np.ndarray: Index of the first item of each group.
+    """
+    return np.searchsorted(group_index, np.arange(num_groups), side='left')
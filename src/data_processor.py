@@ -1,41 +1,255 @@
-from src.mutation_file_reader import read_mutation_data
-from src.mutation_quantifier import quantify_significant_mutations
-from src.subsubregion_combiner import combine_and_map_mutations
+from collections import namedtuple
+import numpy as np
+from src.mutation_file_reader import DEFAULT_CHUNK_SIZE, read_mutation_arrays
+from src.seq_partitioner import DEFAULT_GEOMETRY, DEFAULT_WINDOW_LENGTH, iter_partition_windows
+from src.mutation_index import build_mutation_index, window_sums
+from src.mutation_quantifier import quantify_significant_mutations, score_subsubregions, slice_tiling_scores, tiling_scores_to_tuples
+from src.subsubregion_combiner import combine_tiling_scores, combined_interval_scores, combined_scores_to_tuples, unique_mutation_order
+from src.tiling_cache import get_tiling
+from src.data_bucketer import bucket_index, group_first_indices, grouped_means, region_bucket_size
+from src.weight_calculator import impact_profile, positional_group_scores, positional_tiling_scores, profile_scores
+from src.stage_profiler import profile_stage
 
-def process_mutation_data(mutation_file_path, seq_length):
+# Flat region hierarchy of the combined intervals (sub-subregions of the hierarchy):
+# - intervals, scores: (n, 2) combined [start, end] intervals and their scores.
+# - subregion_index: subregion of each interval; subregion_ranges, subregion_scores: [start, end] and mean score of each subregion.
+# - region_index: region of each subregion; region_ranges, region_scores: [start, end] and mean score of each region.
+RegionHierarchy = namedtuple('RegionHierarchy', [
+    'intervals', 'scores',
+    'subregion_index', 'subregion_ranges', 'subregion_scores',
+    'region_index', 'region_ranges', 'region_scores'
+])
+
+def process_mutation_data(mutation_file_path, seq_length, chunksize=DEFAULT_CHUNK_SIZE, columnar=False, kernel=None, geometry=DEFAULT_GEOMETRY, metrics=None):
     """
     Process mutation data and return partitioned (starting at index 0 and index 15) and combined data.
 
     Args:
     - mutation_file_path (str): Path to the input mutation data file.
     - seq_length (int): Length of the sequence.
+    - chunksize (int, optional): Number of rows parsed per chunk of the mutation data file.
+    - columnar (bool, optional): Return the columnar scores of process_mutation_columns instead of lists.
+    - kernel (DecayKernel, optional): Score sub-subregions by positional weighted impact with this decay kernel
+      instead of by summed impact.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions.
+    - metrics (list, optional): Collects the StageMetrics of the read, quantify and combine stages (columnar only).
 
     Returns:
     - tuple: (positional_scores_0_data, positional_scores_15_data, combined_data)
+      (or (scores_0, scores_15, combined_scores) if columnar is True).
     """
     # Read mutation data file
-    mutations = read_mutation_data(mutation_file_path)
-
-    if isinstance(mutations, list):
-        # Quantify significant mutations
-        positional_scores_0, positional_scores_15 = quantify_significant_mutations(seq_length, mutations)
-        
-        # Prepare data for returning
-        positional_scores_0_data = [
-            [subsubregion[0], subsubregion[1], subsubregion[2]] for subsubregion in positional_scores_0
-        ]
-        positional_scores_15_data = [
-            [subsubregion[0], subsubregion[1], subsubregion[2]] for subsubregion in positional_scores_15
-        ]
-        combined_data = combine_and_map_mutations(positional_scores_0, positional_scores_15)
-        combined_data_csv = [
-            [interval, mutations, score] for interval, mutations, score in combined_data
-        ]
-
-        return positional_scores_0_data, positional_scores_15_data, combined_data_csv
-    else:
+    with profile_stage(metrics, 'read') as counts:
+        mutations = read_mutation_arrays(mutation_file_path, chunksize)
+
+        if isinstance(mutations, str):
+            raise ValueError(mutations)
+        counts['mutations'] = len(mutations[0])
+
+    if columnar:
+        return process_mutation_columns(mutations, seq_length, kernel, geometry, metrics)
+    return process_mutation_arrays(mutations, seq_length, kernel, geometry)
+
+def process_mutation_arrays(mutations, seq_length, kernel=None, geometry=DEFAULT_GEOMETRY):
+    """
+    Process columnar mutation data and return partitioned (starting at index 0 and index 15) and combined data.
+
+    Args:
+    - mutations (tuple): (positions, impacts) arrays.
+    - seq_length (int): Length of the sequence.
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted scores; None sums the impacts.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions.
+
+    Returns:
+    - tuple: (positional_scores_0_data, positional_scores_15_data, combined_data)
+    """
+    scores_0, scores_15, combined_scores = process_mutation_columns(mutations, seq_length, kernel, geometry)
+    return scores_to_processed_data(scores_0, scores_15, combined_scores)
+
+def process_mutation_columns(mutations, seq_length, kernel=None, geometry=DEFAULT_GEOMETRY, metrics=None):
+    """
+    Score columnar mutation data on both sets of sub-subregions and their combined intervals, keeping the results columnar.
+
+    Args:
+    - mutations (tuple): (positions, impacts) arrays.
+    - seq_length (int): Length of the sequence.
+    - kernel (DecayKernel, optional): Score sub-subregions by the mean positional weighted impact of their mutations
+      with this decay kernel (see positional_tiling_scores); None sums the impacts.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions.
+    - metrics (list, optional): Collects the StageMetrics of the quantify and combine stages.
+
+    Returns:
+    - tuple: (scores_0, scores_15, combined_scores) as TilingScores, TilingScores and CombinedScores.
+    """
+    # Quantify significant mutations on the cached tiling of this sequence length
+    with profile_stage(metrics, 'quantify') as counts:
+        tiling = get_tiling(seq_length, geometry)
+        scores_0, scores_15 = quantify_significant_mutations(seq_length, mutations, tiling=tiling)
+        if kernel is not None:
+            scores_0, scores_15 = (positional_tiling_scores(scores, kernel) for scores in (scores_0, scores_15))
+        counts['bins'] = len(scores_0.subsubregions) + len(scores_15.subsubregions)
+
+    # Combine both sets of sub-subregions
+    with profile_stage(metrics, 'combine') as counts:
+        combined_scores = combine_tiling_scores(scores_0, scores_15, tiling=tiling)
+        counts['intervals'] = len(combined_scores.intervals)
+
+    return scores_0, scores_15, combined_scores
+
+def process_kernel_sweep(mutations, seq_length, kernels, geometry=DEFAULT_GEOMETRY):
+    """
+    Score columnar mutation data with positional weighted scores for each of several decay kernels.
+
+    The mutations are assigned and aggregated by offset once (impact_profile); each kernel then only rescores the
+    aggregated impacts, the combined intervals and the hierarchy, at a cost that does not depend on the number of
+    mutations.
+
+    Args:
+    - mutations (tuple): (positions, impacts) arrays.
+    - seq_length (int): Length of the sequence.
+    - kernels (list): DecayKernel of each setting.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions, subregions and regions.
+
+    Returns:
+    - list: RegionHierarchy of each kernel, in order.
+    """
+    tiling = get_tiling(seq_length, geometry)
+    scores_0, scores_15 = quantify_significant_mutations(seq_length, mutations, tiling=tiling)
+    profiles = (impact_profile(scores_0), impact_profile(scores_15))
+    starts, ends = tiling.intervals[:, 0], tiling.intervals[:, 1]
+    coverings = [(tiling.covering_0, tiling.covered_0), (tiling.covering_15, tiling.covered_15)]
+
+    region_hierarchies = []
+    for kernel in kernels:
+        totals = [profile_scores(profile, kernel)[0] for profile in profiles]
+        scores = combined_interval_scores(starts, ends, coverings, totals)
+        region_hierarchies.append(build_region_hierarchy(
+            tiling.intervals, scores, geometry.subsubregions_per_subregion, geometry.subregions_per_region, kernel
+        ))
+    return region_hierarchies
+
+def process_geometry_sweep(mutations, seq_length, geometries, kernel=None):
+    """
+    Score columnar mutation data on each of several tiling geometries.
+
+    The mutations are indexed once (build_mutation_index). Each geometry then costs a cached tiling, a binary
+    search of its sub-subregion bounds and O(bins) arithmetic; sub-subregion totals are window_sums of the
+    index, so they can differ from a single run, which sums the impacts in input order, in the last digits.
+    Positional weighted scores (with a kernel) are aggregated per geometry from the shared index instead.
+
+    Args:
+    - mutations (tuple): (positions, impacts) arrays.
+    - seq_length (int): Length of the sequence.
+    - geometries (list): TilingGeometry of each setting.
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted scores; None sums the impacts.
+
+    Returns:
+    - list: RegionHierarchy of each geometry, in order.
+    """
+    index = build_mutation_index(mutations)
+
+    region_hierarchies = []
+    for geometry in geometries:
+        tiling = get_tiling(seq_length, geometry)
+        subsubregion_sets = (tiling.subsubregions_0, tiling.subsubregions_15)
+        if kernel is None:
+            totals = [window_sums(index, subsubregions[:, 2], subsubregions[:, 3]) for subsubregions in subsubregion_sets]
+        else:
+            totals = [
+                positional_tiling_scores(score_subsubregions(subsubregions, index), kernel).totals
+                for subsubregions in subsubregion_sets
+            ]
+        coverings = [(tiling.covering_0, tiling.covered_0), (tiling.covering_15, tiling.covered_15)]
+        scores = combined_interval_scores(tiling.intervals[:, 0], tiling.intervals[:, 1], coverings, totals)
+        region_hierarchies.append(build_region_hierarchy(
+            tiling.intervals, scores, geometry.subsubregions_per_subregion, geometry.subregions_per_region, kernel
+        ))
+    return region_hierarchies
+
+def scores_to_processed_data(scores_0, scores_15, combined_scores):
+    """
+    Convert columnar scores to the list format returned by process_mutation_data.
+
+    Args:
+    - scores_0 (TilingScores): Scores for sub-subregions starting at index 0.
+    - scores_15 (TilingScores): Scores for sub-subregions starting at index 15.
+    - combined_scores (CombinedScores): Scores of the combined intervals.
+
+    Returns:
+    - tuple: (positional_scores_0_data, positional_scores_15_data, combined_data)
+    """
+    # Prepare data for returning
+    mutation_tuples = list(zip(scores_0.positions.tolist(), scores_0.impacts.tolist()))
+    positional_scores_0_data = [
+        [subsubregion[0], subsubregion[1], subsubregion[2]] for subsubregion in tiling_scores_to_tuples(scores_0, mutation_tuples)
+    ]
+    positional_scores_15_data = [
+        [subsubregion[0], subsubregion[1], subsubregion[2]] for subsubregion in tiling_scores_to_tuples(scores_15, mutation_tuples)
+    ]
+    combined_data_csv = [
+        [interval, mutations, score] for interval, mutations, score in combined_scores_to_tuples(combined_scores, mutation_tuples)
+    ]
+
+    return positional_scores_0_data, positional_scores_15_data, combined_data_csv
+
+def process_mutation_data_windows(mutation_file_path, seq_length, window_length=DEFAULT_WINDOW_LENGTH, geometry=DEFAULT_GEOMETRY, kernel=None):
+    """
+    Process mutation data window by window, so the sub-subregions held at once depend on the window length
+    and not on the sequence length.
+
+    Args:
+    - mutation_file_path (str): Path to the input mutation data file.
+    - seq_length (int): Length of the sequence.
+    - window_length (int, optional): Approximate window length in bp.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions.
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted scores; None sums the impacts.
+
+    Yields:
+    - tuple: (window_start, window_end, scores_0, scores_15, combined_scores) columnar results for each window
+      (see process_mutation_array_windows).
+    """
+    # Read mutation data file
+    mutations = read_mutation_arrays(mutation_file_path)
+    if isinstance(mutations, str):
         raise ValueError(mutations)
-    
+
+    yield from process_mutation_array_windows(mutations, seq_length, window_length, geometry, kernel)
+
+def process_mutation_array_windows(mutations, seq_length, window_length=DEFAULT_WINDOW_LENGTH, geometry=DEFAULT_GEOMETRY, kernel=None):
+    """
+    Process mutation arrays that are already in memory window by window, like process_mutation_data_windows.
+
+    Args:
+    - mutations (tuple): (positions, impacts) arrays.
+    - seq_length (int): Length of the sequence.
+    - window_length (int, optional): Approximate window length in bp.
+    - geometry (TilingGeometry, optional): Tiling geometry of the sub-subregions.
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted scores; None sums the impacts.
+
+    Yields:
+    - tuple: (window_start, window_end, scores_0, scores_15, combined_scores) columnar results for each window.
+      Sub-subregions starting at index 15 are reported in the window where they start.
+    """
+    # Index the mutations once for all windows
+    index = build_mutation_index(mutations)
+    unique_mutations = unique_mutation_order(index.positions, index.impacts)
+
+    for window_start, window_end, subsubregions_0, subsubregions_15 in iter_partition_windows(seq_length, window_length, geometry):
+        # Quantify both sets of sub-subregions overlapping the window
+        scores_0 = score_subsubregions(subsubregions_0, index)
+        scores_15 = score_subsubregions(subsubregions_15, index)
+        if kernel is not None:
+            scores_0, scores_15 = (positional_tiling_scores(scores, kernel) for scores in (scores_0, scores_15))
+
+        # Combine them into the intervals inside the window
+        combined_scores = combine_tiling_scores(scores_0, scores_15, unique_mutations, (window_start, window_end))
+
+        # Report sub-subregions starting at index 15 only once
+        if window_start > 0:
+            scores_15 = slice_tiling_scores(scores_15, scores_15.subsubregions[:, 2] >= window_start)
+
+        yield window_start, window_end, scores_0, scores_15, combined_scores
+
 def process_region_details(regions):
     """
     Extract details for each region, subregion, and sub-subregion.
@@ -95,4 +309,93 @@ def process_region_details(regions):
 
     return region_details
 
+def build_region_hierarchy(intervals, scores, subsubregions_per_subregion=20, subregions_per_region=10, kernel=None):
+    """
+    Group combined intervals into subregions and regions as flat parent index and score arrays.
+
+    Scores equal those of bucket_subsubregions_to_subregions, bucket_subregions_to_regions and process_region_details.
+
+    Args:
+    - intervals (np.ndarray or list): Combined [start, end] intervals, in order.
+    - scores (np.ndarray or list): Score of each interval.
+    - subsubregions_per_subregion (int, optional): Number of intervals per subregion. Default is 20.
+    - subregions_per_region (int, optional): Number of regions the subregions are split into. Default is 10.
+    - kernel (DecayKernel, optional): Score subregions and regions by the mean positional weighted score of their
+      children with this decay kernel (see positional_group_scores) instead of by the mean score.
+
+    Returns:
+    - RegionHierarchy: Intervals, subregions and regions with their parent indices and mean scores.
+    """
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    scores = np.asarray(scores, dtype=np.float64)
+
+    # Subregions group consecutive intervals
+    subregion_index = bucket_index(len(intervals), subsubregions_per_subregion)
+    num_subregions = -(-len(intervals) // subsubregions_per_subregion)
+    subregion_ranges = hierarchy_ranges(intervals, subregion_index, num_subregions)
+    subregion_scores = group_scores(scores, subregion_index, num_subregions, kernel)
+
+    # Regions group consecutive subregions
+    region_index = bucket_index(num_subregions, region_bucket_size(num_subregions, subregions_per_region))
+    num_regions = region_index[-1] + 1 if num_subregions else 0
+    region_ranges = hierarchy_ranges(subregion_ranges, region_index, num_regions)
+    region_scores = group_scores(subregion_scores, region_index, num_regions, kernel)
+
+    return RegionHierarchy(
+        intervals, scores,
+        subregion_index, subregion_ranges, subregion_scores,
+        region_index, region_ranges, region_scores
+    )
+
+def group_scores(values, group_index, num_groups, kernel=None):
+    """
+    Mean (or mean positional weighted) score of each group of consecutive items.
+
+    Args:
+    - values (np.ndarray): Score of each item.
+    - group_index (np.ndarray): Sorted group of each item.
+    - num_groups (int): Number of groups.
+    - kernel (DecayKernel, optional): Decay kernel of positional weighted scores; None averages the scores.
+
+    Returns:
+    - np.ndarray: Score of each group.
+    """
+    if kernel is None:
+        return grouped_means(values, group_index, num_groups)
+    return positional_group_scores(values, group_index, num_groups, kernel)
+
+def hierarchy_ranges(ranges, parent_index, num_parents):
+    """
+    [start, end] range of each parent of consecutive child ranges.
+
+    Args:
+    - ranges (np.ndarray): (n, 2) child [start, end] ranges.
+    - parent_index (np.ndarray): Sorted parent of each child.
+    - num_parents (int): Number of parents.
+
+    Returns:
+    - np.ndarray: (num_parents, 2) parent [start, end] ranges.
+    """
+    first = group_first_indices(parent_index, num_parents)
+    last = np.append(first[1:], len(ranges))[:num_parents] - 1
+    return np.column_stack((ranges[first, 0], ranges[last, 1])).reshape(-1, 2)
+
+def hierarchy_numbers(region_hierarchy):
+    """
+    1-based region, subregion and sub-subregion numbers of every interval, as in process_region_details.
+
+    Subregions are numbered within their region and sub-subregions within their subregion.
+
+    Args:
+    - region_hierarchy (RegionHierarchy): Flat region hierarchy.
+
+    Returns:
+    - tuple: (region_numbers, subregion_numbers, subsubregion_numbers) arrays, one entry per interval.
+    """
+    subregion_index, region_index = region_hierarchy.subregion_index, region_hierarchy.region_index
+    subregion_first = group_first_indices(subregion_index, len(region_hierarchy.subregion_scores))
+    region_first = group_first_indices(region_index, len(region_hierarchy.region_scores))
 
+    subsubregion_numbers = np.arange(len(subregion_index)) - subregion_first[subregion_index] + 1
+    subregion_numbers = np.arange(len(region_index)) - region_first[region_index] + 1
+    return region_index[subregion_index] + 1, subregion_numbers[subregion_index], subsubregion_numbers
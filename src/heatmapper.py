@@ -1,125 +1,144 @@
 import os
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from scipy.cluster.hierarchy import linkage
+from scipy.cluster.hierarchy import leaves_list, linkage
 from scipy.spatial.distance import pdist, squareform
 
-def plot_region_heatmap(file_path, result_dir):
-    data = pd.read_csv(file_path)
-
-    # Filter out rows where Region Weight is zero
-    data = data[data['Region Weight'] != 0]
-
-    # Compute pairwise distances between region weights
-    distances = pdist(data[['Region Weight']], metric='euclidean')
-
-    # Perform hierarchical clustering
-    linkage_matrix = linkage(distances, method='average')
+# Rows shown in a heatmap; larger levels are sorted by score and averaged in equal-count groups
+MAX_HEATMAP_ROWS = 200
 
-    # Create a DataFrame with the distances in square form for seaborn clustermap
-    distance_df = pd.DataFrame(squareform(distances), index=data['Region Number'], columns=data['Region Number'])
+# Heatmaps with more rows than this are drawn without cell annotations
+MAX_ANNOTATED_ROWS = 30
 
-    # Create a clustermap with clustering only on the columns
-    clustermap = sns.clustermap(distance_df, col_linkage=linkage_matrix, row_cluster=False, cmap='coolwarm', annot=True, figsize=(14, 10), annot_kws={"size": 8}, cbar_kws={"shrink": 0.5, "ticks": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]})
-
-    # Add axis titles
-    clustermap.ax_heatmap.set_xlabel('Region')
-    clustermap.ax_heatmap.set_ylabel('Region')
-
-    # Move the row labels to the left and rotate them by 90 degrees
-    clustermap.ax_heatmap.yaxis.tick_left()
-    clustermap.ax_heatmap.yaxis.set_label_position('left')
-    clustermap.ax_heatmap.set_yticklabels(clustermap.ax_heatmap.get_yticklabels(), rotation=0)
+def read_level_scores(file_path, level, id_columns):
+    """
+    Read the score of every item of one level from a region details or region scores CSV file.
 
-    # Add title to the plot
-    # clustermap.fig.suptitle('Regions Correlation Heatmap', y=1.05)
+    Rows repeating an item (region details has one row per sub-subregion) are read once, and items with a zero
+    score are dropped. Files written before the score columns were renamed use '<Level> Weight' instead of
+    '<Level> Score'.
 
-    # Save the plot
-    plot_path = os.path.join(result_dir, 'region_correlation_heatmap.png')
-    clustermap.savefig(plot_path)
-    plt.close()
+    Args:
+    - file_path (str): Path to region_details.csv or region_scores.csv.
+    - level (str): 'Region', 'Subregion' or 'Subsubregion'.
+    - id_columns (list): Columns identifying an item, joined with '-' into its label.
 
-def plot_subregion_heatmap(file_path, result_dir):
+    Returns:
+    - tuple: (labels, scores) arrays in file order.
+    """
     data = pd.read_csv(file_path)
-
-    # Filter out rows where Subregion Weight is zero
-    data = data[data['Subregion Weight'] != 0]
-
-    # Combine region number and subregion number to form a unique identifier
-    data['Subregion ID'] = data['Region Number'].astype(str) + '-' + data['Subregion Number'].astype(str)
-
-    # Pivot the data to get subregions as columns
-    subregion_weights = data.pivot_table(index='Subregion ID', values='Subregion Weight', aggfunc='mean')
-
-    # Compute pairwise distances between subregion weights
-    distances = pdist(subregion_weights, metric='euclidean')
-
-    # Perform hierarchical clustering
+    score_column = f'{level} Score' if f'{level} Score' in data.columns else f'{level} Weight'
+    if score_column not in data.columns:
+        raise ValueError(f"{file_path} has no '{level} Score' column.")
+
+    labels = data[id_columns[0]].astype(str)
+    for column in id_columns[1:]:
+        labels = labels + '-' + data[column].astype(str)
+    scores = data[score_column].groupby(labels, sort=False).first()
+    scores = scores[scores != 0]
+    return scores.index.to_numpy(), scores.to_numpy(dtype=np.float64)
+
+def cluster_scores(labels, scores, max_rows=MAX_HEATMAP_ROWS):
+    """
+    Order one-dimensional scores so that similar scores are adjacent, and group them if there are too many to show.
+
+    Clusters of one-dimensional scores are runs of the sorted scores, so sorting replaces the pairwise distance
+    matrix. Above max_rows, the sorted scores are split into max_rows groups of (almost) equal size, each shown
+    as one row with its mean score and labelled with its score range and number of items.
+
+    Args:
+    - labels (np.ndarray): Item labels.
+    - scores (np.ndarray): Item scores.
+    - max_rows (int, optional): Most rows returned. Default is MAX_HEATMAP_ROWS.
+
+    Returns:
+    - tuple: (row_labels, row_scores) of at most max_rows rows, in order of score.
+    """
+    order = np.argsort(scores, kind='stable')
+    labels, scores = labels[order], scores[order]
+    if len(scores) <= max_rows:
+        return list(labels), scores
+
+    bounds = np.linspace(0, len(scores), max_rows + 1).astype(np.int64)
+    firsts, lasts = bounds[:-1], bounds[1:] - 1
+    row_scores = np.add.reduceat(scores, firsts) / (lasts - firsts + 1)
+    row_labels = [f"{scores[first]:.4g}..{scores[last]:.4g} ({last - first + 1})" for first, last in zip(firsts, lasts)]
+    return row_labels, row_scores
+
+def plot_score_heatmap(labels, scores, axis_label, plot_path, max_rows=MAX_HEATMAP_ROWS, max_annotated_rows=MAX_ANNOTATED_ROWS):
+    """
+    Plot a clustered heatmap of the score distances between the items of one level.
+
+    The distance matrix is only built for the (at most max_rows) rows returned by cluster_scores.
+
+    Args:
+    - labels (np.ndarray): Item labels.
+    - scores (np.ndarray): Item scores.
+    - axis_label (str): Label of both axes.
+    - plot_path (str): Path of the saved plot.
+    - max_rows (int, optional): Most rows shown. Default is MAX_HEATMAP_ROWS.
+    - max_annotated_rows (int, optional): Most rows whose cells are annotated. Default is MAX_ANNOTATED_ROWS.
+
+    Returns:
+    - str: Why the heatmap was skipped, or None if it was saved.
+    """
+    if len(scores) < 2:
+        return f"Skipping {os.path.basename(plot_path)}: fewer than two non-zero scores."
+    row_labels, row_scores = cluster_scores(labels, scores, max_rows)
+
+    # Perform hierarchical clustering of the shown rows, and order the rows like the clustered columns
+    distances = pdist(row_scores[:, np.newaxis], metric='euclidean')
     linkage_matrix = linkage(distances, method='average')
+    order = leaves_list(linkage_matrix)
+    distance_df = pd.DataFrame(squareform(distances)[order], index=[row_labels[i] for i in order], columns=row_labels)
 
-    # Create a DataFrame with the distances in square form for seaborn clustermap
-    distance_df = pd.DataFrame(squareform(distances), index=subregion_weights.index, columns=subregion_weights.index)
-
-    # Create a clustermap with clustering on the columns
-    clustermap = sns.clustermap(distance_df, col_linkage=linkage_matrix, row_cluster=False, cmap='coolwarm', annot=True, figsize=(14, 10), annot_kws={"size": 8}, cbar_kws={"shrink": 0.5, "ticks": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]})
+    # Create a clustermap with clustering only on the columns
+    annotate = len(row_scores) <= max_annotated_rows
+    clustermap = sns.clustermap(distance_df, col_linkage=linkage_matrix, row_cluster=False, cmap='coolwarm', annot=annotate, fmt='.2f', figsize=(14, 10), annot_kws={"size": 8}, cbar_kws={"shrink": 0.5})
 
-    # Add axis titles
-    clustermap.ax_heatmap.set_xlabel('Region-Subregion')
-    clustermap.ax_heatmap.set_ylabel('Region-Subregion')
+    # Add axis titles, noting grouped rows
+    if len(row_scores) < len(scores):
+        axis_label = f"{axis_label} score range ({len(scores)} items in {len(row_scores)} groups)"
+    clustermap.ax_heatmap.set_xlabel(axis_label)
+    clustermap.ax_heatmap.set_ylabel(axis_label)
 
     # Move the row labels to the left and rotate them by 0 degrees
     clustermap.ax_heatmap.yaxis.tick_left()
     clustermap.ax_heatmap.yaxis.set_label_position('left')
     clustermap.ax_heatmap.set_yticklabels(clustermap.ax_heatmap.get_yticklabels(), rotation=0)
 
-    # Add title to the plot
-    # clustermap.fig.suptitle('Subregions Correlation Heatmap', y=1.01)
-
     # Save the plot
-    plot_path = os.path.join(result_dir, 'subregion_correlation_heatmap.png')
     clustermap.savefig(plot_path)
-    plt.close()
-
-def plot_subsubregion_heatmap(file_path, result_dir):
-    data = pd.read_csv(file_path)
-
-    # Filter out rows where Subsubregion Weight is zero
-    data = data[data['Subsubregion Weight'] != 0]
-
-    # Combine region number, subregion number, and subsubregion range to form a unique identifier
-    data['Subsubregion ID'] = (data['Region Number'].astype(str) + '-' + 
-                               data['Subregion Number'].astype(str) + '-' + 
-                               data['Subsubregion Range'].astype(str))
-
-    # Pivot the data to get subsubregions as columns
-    subsubregion_weights = data.pivot_table(index='Subsubregion ID', values='Subsubregion Weight', aggfunc='mean')
-
-    # Compute pairwise distances between subsubregion weights
-    distances = pdist(subsubregion_weights, metric='euclidean')
-
-    # Perform hierarchical clustering
-    linkage_matrix = linkage(distances, method='average')
-
-    # Create a DataFrame with the distances in square form for seaborn clustermap
-    distance_df = pd.DataFrame(squareform(distances), index=subsubregion_weights.index, columns=subsubregion_weights.index)
+    plt.close(clustermap.fig)
+    return None
 
-    # Create a clustermap with clustering on the columns
-    clustermap = sns.clustermap(distance_df, col_linkage=linkage_matrix, row_cluster=False, cmap='coolwarm', annot=True, figsize=(14, 10), annot_kws={"size": 8}, cbar_kws={"shrink": 0.5, "ticks": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]})
-
-    # Add axis titles
-    clustermap.ax_heatmap.set_xlabel('Region-Subregion-Subsubregion')
-    clustermap.ax_heatmap.set_ylabel('Region-Subregion-Subsubregion')
-
-    # Move the row labels to the left and rotate them by 0 degrees
-    clustermap.ax_heatmap.yaxis.tick_left()
-    clustermap.ax_heatmap.yaxis.set_label_position('left')
-    clustermap.ax_heatmap.set_yticklabels(clustermap.ax_heatmap.get_yticklabels(), rotation=0)
+def plot_region_heatmap(file_path, result_dir):
+    labels, scores = read_level_scores(file_path, 'Region', ['Region Number'])
+    return plot_score_heatmap(labels, scores, 'Region', os.path.join(result_dir, 'region_correlation_heatmap.png'))
 
-    # Add title to the plot
-    # clustermap.fig.suptitle('Sub-subregions Correlation Heatmap', y=1.01)
+def plot_subregion_heatmap(file_path, result_dir):
+    labels, scores = read_level_scores(file_path, 'Subregion', ['Region Number', 'Subregion Number'])
+    return plot_score_heatmap(labels, scores, 'Region-Subregion', os.path.join(result_dir, 'subregion_correlation_heatmap.png'))
 
-    # Save the plot
-    plot_path = os.path.join(result_dir, 'subsubregion_correlation_heatmap.png')
-    clustermap.savefig(plot_path)
-    plt.close()
\ No newline at end of file
+def plot_subsubregion_heatmap(file_path, result_dir):
+    labels, scores = read_level_scores(file_path, 'Subsubregion', ['Region Number', 'Subregion Number', 'Subsubregion Range'])
+    return plot_score_heatmap(labels, scores, 'Region-Subregion-Subsubregion', os.path.join(result_dir, 'subsubregion_correlation_heatmap.png'))
+
+def plot_heatmaps(result_dir):
+    """
+    Plot the region, subregion and sub-subregion heatmaps of the region_details.csv file in a result directory.
+
+    Args:
+    - result_dir (str): Result directory holding region_details.csv, where the heatmaps are saved.
+
+    Returns:
+    - list: Messages of the skipped heatmaps, for the caller to report.
+    """
+    region_details_file_path = os.path.join(result_dir, 'region_details.csv')
+    skipped = [
+        plot_level_heatmap(region_details_file_path, result_dir)
+        for plot_level_heatmap in (plot_region_heatmap, plot_subregion_heatmap, plot_subsubregion_heatmap)
+    ]
+    return [message for message in skipped if message is not None]
@@ -0,0 +1,186 @@
+from collections import namedtuple
+import numpy as np
+from src.data_bucketer import grouped_means
+from src.data_processor import build_region_hierarchy
+from src.mutation_quantifier import SUBSUBREGION_FIELDS, quantify_significant_mutations
+from src.normalizer import weighted_ave_normalization_array
+from src.subsubregion_combiner import combine_tiling_scores, combined_interval_scores
+from src.tiling_cache import get_tiling
+
+# Scores of one sequence that are updated in place as mutations are added or removed:
+# - tiling: the cached Tiling of the sequence length.
+# - tiling_scores: (scores_0, scores_15) TilingScores with writable totals and scores. Their positions, impacts,
+#   order, lo and hi describe the initial mutations; sub-subregions edited since are held in bin_mutations.
+# - region_hierarchy: RegionHierarchy of the combined intervals, with writable scores.
+# - bin_mutations: ({}, {}) dicts per set, mapping an edited sub-subregion to its (position, impact) list in input order.
+# - dirty_regions: regions whose mean is refreshed by incremental_region_hierarchy.
+# - starts: contiguous int64 start arrays of (sub-subregions 0, sub-subregions 15, combined intervals) for binary search.
+IncrementalScores = namedtuple('IncrementalScores', ['tiling', 'tiling_scores', 'region_hierarchy', 'bin_mutations', 'dirty_regions', 'starts'])
+
+def build_incremental_scores(seq_length, mutations):
+    """
+    Score mutations once and keep the per-bin, combined interval and region scores for incremental updates.
+
+    Args:
+    - seq_length (int): Length of the sequence.
+    - mutations (list of tuples or tuple of np.ndarray): (position, impact) tuples or columnar (positions, impacts) arrays.
+
+    Returns:
+    - IncrementalScores: Scores to update with add_mutation and remove_mutation.
+    """
+    tiling = get_tiling(seq_length)
+    scores_0, scores_15 = quantify_significant_mutations(seq_length, mutations, tiling=tiling)
+    combined_scores = combine_tiling_scores(scores_0, scores_15, tiling=tiling)
+    region_hierarchy = build_region_hierarchy(combined_scores.intervals, combined_scores.scores)
+
+    tiling_scores = tuple(
+        scores._replace(totals=scores.totals.copy(), scores=scores.scores.copy()) for scores in (scores_0, scores_15)
+    )
+    starts = tuple(np.ascontiguousarray(column, dtype=np.int64) for column in (
+        scores_0.subsubregions[:, 2], scores_15.subsubregions[:, 2], region_hierarchy.intervals[:, 0]
+    ))
+    return IncrementalScores(tiling, tiling_scores, region_hierarchy, ({}, {}), set(), starts)
+
+def covering_bin(subsubregions, starts, position):
+    """
+    Find the sub-subregion of a set containing a position.
+
+    Args:
+    - subsubregions (np.ndarray): (n, 4) array of sorted, non-overlapping sub-subregions.
+    - starts (np.ndarray): Contiguous copy of the sub-subregion starts.
+    - position (int): Mutation position.
+
+    Returns:
+    - int: Index of the sub-subregion, or None if no sub-subregion contains the position.
+    """
+    i = int(np.searchsorted(starts, position, side='right')) - 1
+    if i < 0 or position > subsubregions[i, 3]:
+        return None
+    return i
+
+def bin_mutation_list(incremental_scores, which, i):
+    """
+    Get the (position, impact) list of a sub-subregion, materializing it from the initial mutations on first use.
+
+    Args:
+    - incremental_scores (IncrementalScores): Incremental scores.
+    - which (int): 0 for sub-subregions starting at index 0, 1 for those starting at index 15.
+    - i (int): Index of the sub-subregion.
+
+    Returns:
+    - list: (position, impact) tuples of the sub-subregion in input order.
+    """
+    bin_mutations = incremental_scores.bin_mutations[which]
+    if i not in bin_mutations:
+        scores = incremental_scores.tiling_scores[which]
+        indices = np.sort(scores.order[scores.lo[i]:scores.hi[i]])
+        bin_mutations[i] = list(zip(scores.positions[indices].tolist(), scores.impacts[indices].astype(np.float64).tolist()))
+    return bin_mutations[i]
+
+def update_bin(incremental_scores, which, i, total):
+    """
+    Set the impact total of a sub-subregion and rescore everything that depends on it.
+
+    Args:
+    - incremental_scores (IncrementalScores): Incremental scores.
+    - which (int): 0 for sub-subregions starting at index 0, 1 for those starting at index 15.
+    - i (int): Index of the sub-subregion.
+    - total (float): New impact total.
+    """
+    tiling = incremental_scores.tiling
+    scores = incremental_scores.tiling_scores[which]
+    scores.totals[i] = total
+    scores.scores[i:i + 1] = weighted_ave_normalization_array(scores.totals[i:i + 1], SUBSUBREGION_FIELDS)
+
+    # Rescore the combined intervals inside the sub-subregion
+    hierarchy = incremental_scores.region_hierarchy
+    starts, ends = incremental_scores.starts[2], hierarchy.intervals[:, 1]
+    first = np.searchsorted(starts, scores.subsubregions[i, 2], side='left')
+    last = np.searchsorted(starts, scores.subsubregions[i, 3], side='right')
+    if first == last:
+        return
+    coverings = [
+        (tiling.covering_0[first:last], tiling.covered_0[first:last]),
+        (tiling.covering_15[first:last], tiling.covered_15[first:last])
+    ]
+    totals = [tiling_scores.totals for tiling_scores in incremental_scores.tiling_scores]
+    hierarchy.scores[first:last] = combined_interval_scores(starts[first:last], ends[first:last], coverings, totals)
+
+    # Re-average their subregions, and mark their regions for re-averaging
+    for subregion in range(hierarchy.subregion_index[first], hierarchy.subregion_index[last - 1] + 1):
+        lo, hi = np.searchsorted(hierarchy.subregion_index, [subregion, subregion + 1])
+        hierarchy.subregion_scores[subregion] = grouped_means(hierarchy.scores[lo:hi], np.zeros(hi - lo, dtype=np.int64), 1)[0]
+        incremental_scores.dirty_regions.add(int(hierarchy.region_index[subregion]))
+
+def add_mutation(incremental_scores, position, impact):
+    """
+    Add a mutation after all current mutations and update the affected scores.
+
+    Args:
+    - incremental_scores (IncrementalScores): Incremental scores, updated in place.
+    - position (int): Mutation position.
+    - impact (float): Mutation impact score.
+    """
+    position, impact = int(position), float(impact)
+    for which, scores in enumerate(incremental_scores.tiling_scores):
+        i = covering_bin(scores.subsubregions, incremental_scores.starts[which], position)
+        if i is None:
+            continue
+        bin_mutation_list(incremental_scores, which, i).append((position, impact))
+
+        # Appending adds the impact last, exactly as a full run sums the sub-subregion
+        update_bin(incremental_scores, which, i, scores.totals[i] + impact)
+
+def remove_mutation(incremental_scores, position, impact):
+    """
+    Remove the first current mutation equal to (position, impact) and update the affected scores.
+
+    Args:
+    - incremental_scores (IncrementalScores): Incremental scores, updated in place.
+    - position (int): Mutation position.
+    - impact (float): Mutation impact score.
+
+    Raises:
+    - ValueError: If a sub-subregion containing the position does not hold the mutation.
+    """
+    position, impact = int(position), float(impact)
+
+    # Check both sets of sub-subregions before changing either
+    bins = []
+    for which, scores in enumerate(incremental_scores.tiling_scores):
+        i = covering_bin(scores.subsubregions, incremental_scores.starts[which], position)
+        if i is None:
+            continue
+        mutations = bin_mutation_list(incremental_scores, which, i)
+        if (position, impact) not in mutations:
+            raise ValueError(f"Mutation not found: ({position}, {impact})")
+        bins.append((which, i, mutations))
+
+    for which, i, mutations in bins:
+        mutations.remove((position, impact))
+
+        # Re-sum the remaining impacts in input order, as a full run does
+        total = 0.0
+        for _, mutation_impact in mutations:
+            total += mutation_impact
+        update_bin(incremental_scores, which, i, total)
+
+def incremental_region_hierarchy(incremental_scores):
+    """
+    Get the region hierarchy of the current mutations, re-averaging the regions changed since the last call.
+
+    Region means are sums over all of their subregions in order, so they are refreshed here once per batch
+    of edits rather than on every edit.
+
+    Args:
+    - incremental_scores (IncrementalScores): Incremental scores.
+
+    Returns:
+    - RegionHierarchy: Region hierarchy equal to that of a full run on the current mutations.
+    """
+    hierarchy = incremental_scores.region_hierarchy
+    for region in incremental_scores.dirty_regions:
+        lo, hi = np.searchsorted(hierarchy.region_index, [region, region + 1])
+        hierarchy.region_scores[region] = grouped_means(hierarchy.subregion_scores[lo:hi], np.zeros(hi - lo, dtype=np.int64), 1)[0]
+    incremental_scores.dirty_regions.clear()
+    return hierarchy
@@ -0,0 +1,75 @@
+import os
+import csv
+from src.variant_file_reader import contig_dir_name
+
+MANIFEST_COLUMNS = ['sample', 'mutation_file', 'seq_length', 'result_dir']
+
+def read_manifest(file_path, default_result_dir=None):
+    """
+    Read a batch manifest of samples from a CSV file.
+
+    The manifest has one row per sample with 'sample', 'mutation_file', 'seq_length' and 'result_dir'
+    columns. Relative paths in the manifest are resolved against its directory; an empty 'result_dir'
+    defaults to <default_result_dir>/<sample>, with the sample name made safe as a directory name (see
+    contig_dir_name). Samples and result directories must be unique.
+
+    Args:
+    - file_path (str): Path to the manifest CSV file.
+    - default_result_dir (str, optional): Parent directory for samples without a result_dir.
+
+    Returns:
+    - list of dicts: One dict per sample with the manifest columns if successful.
+    - str: Error message if any issue occurs.
+    """
+    try:
+        if not os.path.isfile(file_path):
+            return f"Manifest not found: {file_path}"
+
+        base_dir = os.path.dirname(os.path.abspath(file_path))
+        with open(file_path, newline='') as f:
+            reader = csv.DictReader(f)
+            missing_columns = [column for column in MANIFEST_COLUMNS[:3] if column not in (reader.fieldnames or [])]
+            if missing_columns:
+                return f"Parsing error. The manifest must contain {', '.join(MANIFEST_COLUMNS)} columns. Missing: {', '.join(missing_columns)}"
+
+            samples = []
+            sample_names = set()
+            dir_names = set()
+            result_dirs = set()
+            for line_number, row in enumerate(reader, start=2):
+                sample = (row['sample'] or '').strip()
+                mutation_file = (row['mutation_file'] or '').strip()
+                result_dir = (row.get('result_dir') or '').strip()
+                if not sample or not mutation_file:
+                    return f"Data error. Manifest line {line_number} must have a sample and a mutation_file."
+                try:
+                    seq_length = int(row['seq_length'])
+                except (TypeError, ValueError):
+                    return f"Data type error. Manifest line {line_number}: seq_length must be an integer."
+                if sample in sample_names:
+                    return f"Data error. Manifest line {line_number}: sample {sample} is listed more than once."
+                sample_names.add(sample)
+
+                if not result_dir:
+                    if default_result_dir is None:
+                        return f"Data error. Manifest line {line_number} must have a result_dir."
+                    dir_name = contig_dir_name(sample, dir_names)
+                    dir_names.add(dir_name)
+                    result_dir = os.path.abspath(os.path.join(default_result_dir, dir_name))
+                result_dir = os.path.abspath(os.path.join(base_dir, result_dir))
+                if result_dir in result_dirs:
+                    return f"Data error. Manifest line {line_number}: result_dir {result_dir} is used by another sample."
+                result_dirs.add(result_dir)
+                samples.append({
+                    'sample': sample,
+                    'mutation_file': os.path.join(base_dir, mutation_file),
+                    'seq_length': seq_length,
+                    'result_dir': result_dir,
+                })
+
+        if not samples:
+            return "Manifest is empty."
+        return samples
+
+    except csv.Error as e:
+        return f"Parsing error. Please check the manifest format and content: {e}"
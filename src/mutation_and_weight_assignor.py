@@ -1,24 +1,144 @@
-def assign_mutations(subsubregions, mutations):
+from collections import namedtuple
+import numpy as np
+from src.seq_partitioner import as_subsubregion_array
+
+# Decay kernels of positional weights, by name:
+# - exponential: exp(-d / decay_length); linear: max(0, 1 - d / decay_length); gaussian: exp(-(d / decay_length)^2 / 2).
+# - table: user-supplied weights of the distances 0, 1, 2, ..., and 0 beyond the table.
+DECAY_KERNELS = ['exponential', 'linear', 'gaussian', 'table']
+
+# A decay kernel: its name, decay length (in positions or items) and, for 'table' kernels, the tuple of weights.
+# Kernels are hashable, so their weights can be cached per kernel.
+DecayKernel = namedtuple('DecayKernel', ['name', 'decay_length', 'table'])
+
+# Distance over which the default kernel falls to 1/e
+DEFAULT_DECAY_LENGTH = 10.0
+DEFAULT_KERNEL = DecayKernel('exponential', DEFAULT_DECAY_LENGTH, None)
+
+def mutations_to_arrays(mutations):
+    """
+    Split mutations into columnar position and impact arrays.
+
+    Args:
+    - mutations (list of tuples or tuple of np.ndarray): (position, mutation_data) tuples, or an already
+      columnar (positions, impacts) pair which is returned unchanged.
+
+    Returns:
+    - tuple: (positions, impacts) as int64 and float64 arrays in input order.
+    """
+    if isinstance(mutations, tuple) and len(mutations) == 2 and isinstance(mutations[0], np.ndarray):
+        return mutations
+    positions = np.fromiter((mutation[0] for mutation in mutations), dtype=np.int64, count=len(mutations))
+    impacts = np.fromiter((mutation[1] for mutation in mutations), dtype=np.float64, count=len(mutations))
+    return positions, impacts
+
+def sort_mutation_positions(mutations):
+    """
+    Sort mutation positions once so sub-subregions can be resolved by binary search.
+
+    Args:
+    - mutations (list of tuples or np.ndarray): (position, mutation_data) tuples, or an array of positions.
+
+    Returns:
+    - tuple: (sorted_positions, order), where sorted_positions is an int64 array and
+      order[i] is the index in mutations of the i-th sorted position (stable for equal positions).
+    """
+    if isinstance(mutations, np.ndarray):
+        positions = mutations.astype(np.int64, copy=False)
+    else:
+        positions = np.fromiter((mutation[0] for mutation in mutations), dtype=np.int64, count=len(mutations))
+    order = np.argsort(positions, kind='stable')
+    return positions[order], order
+
+def assign_mutation_offsets(subsubregions, sorted_positions):
+    """
+    Locate the slice of sorted mutation positions covered by each sub-subregion.
+
+    Args:
+    - subsubregions (list of lists or np.ndarray): [subsubregion_number, length, start_index, end_index] rows.
+    - sorted_positions (np.ndarray): Mutation positions sorted in ascending order.
+
+    Returns:
+    - tuple: (lo, hi) offset arrays; the mutations of the i-th sub-subregion are
+      sorted_positions[lo[i]:hi[i]].
+    """
+    subsubregions = as_subsubregion_array(subsubregions)
+    lo = np.searchsorted(sorted_positions, subsubregions[:, 2], side='left')
+    hi = np.searchsorted(sorted_positions, subsubregions[:, 3], side='right')
+    return lo, hi
+
+def assign_mutations(subsubregions, mutations, sorted_mutations=None):
     """
     Assign mutations to their respective sub-subregions.
 
     Args:
     - subsubregions (list of lists): [subsubregion_number, length, start_index, end_index].
     - mutations (list of tuples): (position, mutation_data).
+    - sorted_mutations (tuple, optional): Output of sort_mutation_positions(mutations), to share one sort across tilings.
 
     Returns:
-    - list of tuples: Each tuple contains a sub-subregion and its assigned mutations.
+    - list of tuples: Each tuple contains a sub-subregion and its assigned mutations, in input order.
     """
+    if sorted_mutations is None:
+        sorted_mutations = sort_mutation_positions(mutations)
+    sorted_positions, order = sorted_mutations
+    lo, hi = assign_mutation_offsets(subsubregions, sorted_positions)
+
     assigned = []
-    
-    for subsubregion in subsubregions:
-        subsubregion_mutations = []
-        for mutation in mutations:
-            # Check if mutation position is within the sub-subregion range
-            if subsubregion[2] <= mutation[0] <= subsubregion[3]:
-                subsubregion_mutations.append(mutation)
-        
+    for subsubregion, start, end in zip(subsubregions, lo.tolist(), hi.tolist()):
+        # Restore input order within the sub-subregion
+        subsubregion_mutations = [mutations[i] for i in np.sort(order[start:end]).tolist()]
+
         # Append sub-subregion and its mutations to the result list
         assigned.append((subsubregion, subsubregion_mutations))
-    
+
     return assigned
+
+def assign_positional_weight(distance, kernel=DEFAULT_KERNEL):
+    """
+    Calculate positional weights that decay with the distance from a mutation.
+
+    Args:
+    - distance (int or np.ndarray): Non-negative distance(s) from the mutation, in positions or items.
+    - kernel (DecayKernel, optional): Decay kernel. Default is DEFAULT_KERNEL.
+
+    Returns:
+    - np.ndarray: Weights of the distances.
+
+    Raises:
+    - ValueError: If the kernel is unknown, or a 'table' kernel has no table.
+    """
+    distance = np.asarray(distance, dtype=np.float64)
+    if kernel.name == 'exponential':
+        return np.exp(-distance / kernel.decay_length)
+    if kernel.name == 'linear':
+        return np.maximum(0.0, 1.0 - distance / kernel.decay_length)
+    if kernel.name == 'gaussian':
+        return np.exp(-0.5 * (distance / kernel.decay_length) ** 2)
+    if kernel.name == 'table':
+        if not kernel.table:
+            raise ValueError("A 'table' decay kernel needs a table of weights.")
+        table = np.append(np.asarray(kernel.table, dtype=np.float64), 0.0)
+        return table[np.minimum(distance.astype(np.int64), len(table) - 1)]
+    raise ValueError(f"Invalid decay kernel: {kernel.name}. Choose one of {', '.join(DECAY_KERNELS)}.")
+
+def read_kernel_table(file_path):
+    """
+    Read a 'table' decay kernel from a text file with the weight of the distances 0, 1, 2, ... one per line.
+
+    Args:
+    - file_path (str): Path to the table file.
+
+    Returns:
+    - DecayKernel: The table kernel, or an error message string if the file cannot be read.
+    """
+    try:
+        with open(file_path) as f:
+            weights = tuple(float(line) for line in f if line.strip())
+    except OSError as e:
+        return f"Error reading kernel table {file_path}: {e}"
+    except ValueError:
+        return f"Invalid kernel table {file_path}: every line must hold one number."
+    if not weights:
+        return f"Invalid kernel table {file_path}: no weights."
+    return DecayKernel('table', None, weights)
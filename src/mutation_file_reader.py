@@ -1,57 +1,307 @@
 import os
-import pandas as pd
+import numpy as np
 
-def read_mutation_data(file_path):
+# Default number of rows read per chunk
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+MUTATION_COLUMNS = ['mut_positions', 'impact_score']
+
+# Supported mutation file formats by file extension
+MUTATION_FILE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.ipc': 'feather',
+    '.npz': 'npz',
+}
+
+def detect_mutation_format(file_path):
+    """
+    Detect the format of a mutation file from its extension.
+
+    Args:
+    - file_path (str): Path to the input file.
+
+    Returns:
+    - str: 'csv', 'parquet', 'feather' or 'npz', or None if the format is not supported.
+    """
+    return MUTATION_FILE_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+def check_mutation_file(file_path):
+    """
+    Check that a mutation file exists and has a supported format.
+
+    Args:
+    - file_path (str): Path to the input file.
+
+    Returns:
+    - str: Error message if any issue occurs, otherwise None.
+    """
+    # Check if the file exists
+    if not os.path.exists(file_path):
+        return f"File not found: {file_path}"
+
+    # Check if the file path is a file
+    if not os.path.isfile(file_path):
+        return "File not found."
+
+    # Check the file extension to ensure the format is supported
+    if detect_mutation_format(file_path) is None:
+        return "Invalid file format. Only CSV, Parquet, Feather/Arrow IPC and NPZ files are supported."
+
+    return None
+
+def check_mutation_columns(columns):
+    """
+    Check that the required columns are present.
+
+    Args:
+    - columns (iterable): Column names of the input file.
+
+    Returns:
+    - str: Error message if any column is missing, otherwise None.
+    """
+    if 'mut_positions' not in columns or 'impact_score' not in columns:
+        return "Parsing error. The file must contain 'mut_positions' and 'impact_score' columns."
+    return None
+
+def validate_mutation_arrays(positions, impacts):
     """
-    Read mutation positions and impact scores from a CSV file.
+    Validate the data types and values of columnar mutation data.
+
+    Args:
+    - positions (np.ndarray): Mutation positions.
+    - impacts (np.ndarray): Mutation impact scores.
+
+    Returns:
+    - str: Error message if any issue occurs, otherwise None.
+    """
+    # Check data types of the columns
+    if not np.issubdtype(positions.dtype, np.integer):
+        return "Data type error. The 'mut_positions' column must contain integers."
+    if not (np.issubdtype(impacts.dtype, np.floating) or np.issubdtype(impacts.dtype, np.integer)):
+        return "Data type error. The 'impact_score' column must contain floats or integers."
+
+    # Ensure there are no missing values
+    if np.issubdtype(impacts.dtype, np.floating) and np.isnan(impacts).any():
+        return "Data error. The 'mut_positions' and 'impact_score' columns must not contain missing values."
+
+    return None
+
+def as_mutation_arrays(positions, impacts):
+    """
+    Cast validated columns to int64 positions and int64/float64 impacts, without copying when they already are.
+
+    Args:
+    - positions (np.ndarray): Mutation positions.
+    - impacts (np.ndarray): Mutation impact scores.
+
+    Returns:
+    - tuple: (positions, impacts) arrays.
+    """
+    impact_dtype = np.int64 if np.issubdtype(impacts.dtype, np.integer) else np.float64
+    return positions.astype(np.int64, copy=False), impacts.astype(impact_dtype, copy=False)
+
+def validate_mutation_chunk(df):
+    """
+    Validate the data types and values of a chunk of mutation data.
+
+    Args:
+    - df (pd.DataFrame): Chunk with 'mut_positions' and 'impact_score' columns.
+
+    Returns:
+    - str: Error message if any issue occurs, otherwise None.
+    """
+    import pandas as pd
+
+    # Check data types of the columns
+    if not pd.api.types.is_integer_dtype(df['mut_positions']):
+        return "Data type error. The 'mut_positions' column must contain integers."
+    if not (pd.api.types.is_float_dtype(df['impact_score']) or pd.api.types.is_integer_dtype(df['impact_score'])):
+        return "Data type error. The 'impact_score' column must contain floats or integers."
+
+    # Ensure there are no missing values
+    if df['mut_positions'].isnull().any() or df['impact_score'].isnull().any():
+        return "Data error. The 'mut_positions' and 'impact_score' columns must not contain missing values."
+
+    return None
+
+def iter_mutation_chunks(file_path, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Stream mutation positions and impact scores from a CSV file in chunks.
+
+    Only the 'mut_positions' and 'impact_score' columns are parsed, with the C engine, and every chunk is
+    validated before it is yielded.
 
     Args:
     - file_path (str): Path to the input CSV file.
+    - chunksize (int, optional): Number of rows per chunk.
+
+    Yields:
+    - tuple: (positions, impacts) arrays; positions are int64 and impacts int64 or float64 as in the file.
+
+    Raises:
+    - ValueError: With the error message if any issue occurs.
+    """
+    # pandas is only needed for CSV input, so it is imported on first use
+    import pandas as pd
+
+    try:
+        error = check_mutation_file(file_path)
+        if error:
+            raise ValueError(error)
+
+        # Check if the header has the required columns
+        error = check_mutation_columns(pd.read_csv(file_path, nrows=0).columns)
+        if error:
+            raise ValueError(error)
+
+        reader = pd.read_csv(file_path, usecols=MUTATION_COLUMNS, keep_default_na=False, engine='c', chunksize=chunksize)
+        with reader:
+            for df in reader:
+                if df.empty:
+                    continue
+
+                error = validate_mutation_chunk(df)
+                if error:
+                    raise ValueError(error)
+
+                yield as_mutation_arrays(df['mut_positions'].to_numpy(), df['impact_score'].to_numpy())
+    except pd.errors.ParserError:
+        raise ValueError("Parsing error. Please check the file format and content.")
+
+def read_arrow_mutation_arrays(file_path, file_format):
+    """
+    Read the mutation columns of a Parquet or Feather/Arrow IPC file.
+
+    Only 'mut_positions' and 'impact_score' are read. Feather files are memory-mapped, and single-chunk
+    columns without nulls are handed over without copying.
+
+    Args:
+    - file_path (str): Path to the input file.
+    - file_format (str): 'parquet' or 'feather'.
 
     Returns:
-    - list of tuples: List of (mutation_position, impact_score) tuples if successful.
+    - tuple: (positions, impacts) arrays.
+
+    Raises:
+    - ValueError: With the error message if any issue occurs.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError(f"Reading {file_format} files requires pyarrow. Install it with: pip install pyarrow")
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        error = check_mutation_columns(pq.read_schema(file_path).names)
+        if error:
+            raise ValueError(error)
+        table = pq.read_table(file_path, columns=MUTATION_COLUMNS)
+    else:
+        source = pa.memory_map(file_path)
+        try:
+            reader = pa.ipc.open_file(source)
+        except pa.ArrowInvalid:
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+        error = check_mutation_columns(reader.schema.names)
+        if error:
+            raise ValueError(error)
+        table = reader.read_all().select(MUTATION_COLUMNS)
+
+    columns = []
+    for name in MUTATION_COLUMNS:
+        column = table.column(name)
+        if column.null_count:
+            raise ValueError("Data error. The 'mut_positions' and 'impact_score' columns must not contain missing values.")
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        columns.append(array.to_numpy(zero_copy_only=False))
+    return tuple(columns)
+
+def read_npz_mutation_arrays(file_path):
+    """
+    Read the mutation columns of an .npz file with 'mut_positions' and 'impact_score' arrays.
+
+    Args:
+    - file_path (str): Path to the input file.
+
+    Returns:
+    - tuple: (positions, impacts) arrays.
+
+    Raises:
+    - ValueError: With the error message if any issue occurs.
+    """
+    with np.load(file_path, allow_pickle=False) as data:
+        error = check_mutation_columns(data.files)
+        if error:
+            raise ValueError(error)
+        return data['mut_positions'].ravel(), data['impact_score'].ravel()
+
+def read_mutation_arrays(file_path, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Read mutation positions and impact scores from a CSV, Parquet, Feather/Arrow IPC or NPZ file into columnar arrays.
+
+    Args:
+    - file_path (str): Path to the input file.
+    - chunksize (int, optional): Number of rows parsed per chunk of CSV files.
+
+    Returns:
+    - tuple: (positions, impacts) arrays if successful.
     - str: Error message if any issue occurs.
     """
     try:
-        # Check if the file exists
-        if not os.path.exists(file_path):
-            return f"File not found: {file_path}"
-        
-        # Check if the file path is a file
-        if not os.path.isfile(file_path):
-            return "File not found."
-        
-        # Check the file extension to ensure it is a CSV file
-        if not file_path.endswith('.csv'):
-            return "Invalid file format. Only CSV files are supported."
-
-        # Read the CSV file
-        df = pd.read_csv(file_path, keep_default_na=False)
-        
-        # Check if the DataFrame has the required columns
-        if 'mut_positions' not in df.columns or 'impact_score' not in df.columns:
-            return "Parsing error. The file must contain 'mut_positions' and 'impact_score' columns."
-        
-        # Check if the DataFrame is empty
-        if df.empty:
+        file_format = detect_mutation_format(file_path)
+        if file_format in ('parquet', 'feather', 'npz'):
+            error = check_mutation_file(file_path)
+            if error:
+                return error
+
+            if file_format == 'npz':
+                positions, impacts = read_npz_mutation_arrays(file_path)
+            else:
+                positions, impacts = read_arrow_mutation_arrays(file_path, file_format)
+
+            # Check if the file is empty
+            if not len(positions):
+                return "File is empty."
+            if len(positions) != len(impacts):
+                return "Data error. The 'mut_positions' and 'impact_score' columns must have the same length."
+            error = validate_mutation_arrays(positions, impacts)
+            if error:
+                return error
+            return as_mutation_arrays(positions, impacts)
+
+        chunks = list(iter_mutation_chunks(file_path, chunksize))
+
+        # Check if the file is empty
+        if not chunks or not sum(len(positions) for positions, _ in chunks):
             return "File is empty."
-        
-        # Check data types of the columns
-        if not pd.api.types.is_integer_dtype(df['mut_positions']):
-            return "Data type error. The 'mut_positions' column must contain integers."
-        if not (pd.api.types.is_float_dtype(df['impact_score']) or pd.api.types.is_integer_dtype(df['impact_score'])):
-            return "Data type error. The 'impact_score' column must contain floats or integers."
-        
-        # Ensure there are no missing values
-        if df['mut_positions'].isnull().any() or df['impact_score'].isnull().any():
-            return "Data error. The 'mut_positions' and 'impact_score' columns must not contain missing values."
-        
-        # Extract mutation positions and impact scores as a list of tuples
-        mutations = list(df[['mut_positions', 'impact_score']].itertuples(index=False, name=None))
-        
-        return mutations
-    
-    except pd.errors.ParserError:
-        return "Parsing error. Please check the file format and content."
+
+        positions = np.concatenate([positions for positions, _ in chunks])
+        impacts = np.concatenate([impacts for _, impacts in chunks])
+        return positions, impacts
+
     except Exception as e:
         return f"{str(e)}"
+
+def read_mutation_data(file_path):
+    """
+    Read mutation positions and impact scores from a CSV, Parquet, Feather/Arrow IPC or NPZ file.
+
+    Args:
+    - file_path (str): Path to the input file.
+
+    Returns:
+    - list of tuples: List of (mutation_position, impact_score) tuples if successful.
+    - str: Error message if any issue occurs.
+    """
+    mutations = read_mutation_arrays(file_path)
+    if isinstance(mutations, str):
+        return mutations
+
+    # Extract mutation positions and impact scores as a list of tuples
+    positions, impacts = mutations
+    return list(zip(positions.tolist(), impacts.tolist()))
@@ -0,0 +1,172 @@
+from collections import namedtuple
+import numpy as np
+from src.mutation_and_weight_assignor import mutations_to_arrays, sort_mutation_positions
+
+# Index of one loaded mutation set, built once and shared by every query and tiling:
+# - positions, impacts: mutation arrays in input order.
+# - sorted_positions, order: positions in ascending order and the input index of each (see sort_mutation_positions).
+# - cumulative_impacts: prefix sums of the impacts in sorted order, with a leading 0, so the impacts of the
+#   sorted mutations lo to hi - 1 sum to cumulative_impacts[hi] - cumulative_impacts[lo].
+# - ranks: optional dense table of the number of mutations before each position 0 to len(ranks) - 1, or None.
+MutationIndex = namedtuple('MutationIndex', ['positions', 'impacts', 'sorted_positions', 'order', 'cumulative_impacts', 'ranks'])
+
+def build_mutation_index(mutations, rank_length=None):
+    """
+    Sort mutations once and sum their impacts into prefix sums.
+
+    Windows are located by binary search of the sorted positions. With rank_length, a dense table of the rank
+    of every position (4 bytes per position) is built as well, so large batches of windows are located with
+    one lookup per bound instead.
+
+    Args:
+    - mutations (list of tuples or tuple of np.ndarray): (position, impact) tuples or columnar (positions, impacts)
+      arrays; an existing MutationIndex is returned unchanged.
+    - rank_length (int, optional): Length of the sequence covered by the rank table, e.g. the sequence length;
+      extended to the last mutation position if needed.
+
+    Returns:
+    - MutationIndex: Sorted positions and cumulative impacts of the mutations.
+
+    Raises:
+    - ValueError: If a rank table is requested for negative positions.
+    """
+    if isinstance(mutations, MutationIndex):
+        return mutations
+    positions, impacts = mutations_to_arrays(mutations)
+    sorted_positions, order = sort_mutation_positions(positions)
+    cumulative_impacts = np.zeros(len(order) + 1)
+    np.cumsum(impacts[order], out=cumulative_impacts[1:])
+
+    ranks = None
+    if rank_length is not None:
+        if len(sorted_positions) and sorted_positions[0] < 0:
+            raise ValueError("Error: A rank table needs non-negative mutation positions.")
+        rank_length = max(int(rank_length), int(sorted_positions[-1]) + 1 if len(sorted_positions) else 0)
+        ranks = np.zeros(rank_length + 1, dtype=np.int32 if len(order) < 2 ** 31 else np.int64)
+        np.cumsum(np.bincount(sorted_positions, minlength=rank_length), out=ranks[1:])
+    return MutationIndex(positions, impacts, sorted_positions, order, cumulative_impacts, ranks)
+
+def window_offsets(index, starts, ends):
+    """
+    Locate the sorted mutations of each [start, end] window by binary search.
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - starts (int or np.ndarray): First position of each window.
+    - ends (int or np.ndarray): Last position of each window (inclusive).
+
+    Returns:
+    - tuple: (lo, hi) offsets; the mutations of window i are index.order[lo[i]:hi[i]].
+    """
+    if index.ranks is not None:
+        # The rank of a position is the number of mutations before it
+        last = len(index.ranks) - 1
+        lo = index.ranks[np.clip(starts, 0, last)].astype(np.int64)
+        hi = index.ranks[np.clip(np.add(ends, 1), 0, last)].astype(np.int64)
+    else:
+        lo = np.searchsorted(index.sorted_positions, starts, side='left')
+        hi = np.searchsorted(index.sorted_positions, ends, side='right')
+    return lo, np.maximum(lo, hi)
+
+def window_counts(index, starts, ends):
+    """
+    Count the mutations in each [start, end] window, in O(log M) per window (O(1) with a rank table).
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - starts (int or np.ndarray): First position of each window.
+    - ends (int or np.ndarray): Last position of each window (inclusive).
+
+    Returns:
+    - np.ndarray: Number of mutations of each window.
+    """
+    lo, hi = window_offsets(index, starts, ends)
+    return hi - lo
+
+def window_sums(index, starts, ends):
+    """
+    Sum the impacts of the mutations in each [start, end] window, in O(log M) per window (O(1) with a rank table).
+
+    Sums are differences of prefix sums, so their absolute error grows with the cumulative impact before the
+    window rather than with the window itself; bin_sums sums contiguous bins exactly in input order.
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - starts (int or np.ndarray): First position of each window.
+    - ends (int or np.ndarray): Last position of each window (inclusive).
+
+    Returns:
+    - np.ndarray: Total impact of each window.
+    """
+    lo, hi = window_offsets(index, starts, ends)
+    return index.cumulative_impacts[hi] - index.cumulative_impacts[lo]
+
+def window_means(index, starts, ends):
+    """
+    Mean impact of the mutations in each [start, end] window, in O(log M) per window (O(1) with a rank table).
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - starts (int or np.ndarray): First position of each window.
+    - ends (int or np.ndarray): Last position of each window (inclusive).
+
+    Returns:
+    - np.ndarray: Total impact divided by the number of mutations of each window, 0 for empty windows.
+    """
+    return window_stats(index, starts, ends)[2]
+
+def window_stats(index, starts, ends):
+    """
+    Total, count and mean impact of each [start, end] window, locating every window once.
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - starts (int or np.ndarray): First position of each window.
+    - ends (int or np.ndarray): Last position of each window (inclusive).
+
+    Returns:
+    - tuple: (totals, counts, means) arrays; means are 0 for empty windows.
+    """
+    lo, hi = window_offsets(index, starts, ends)
+    counts = hi - lo
+    totals = index.cumulative_impacts[hi] - index.cumulative_impacts[lo]
+    means = np.zeros(np.shape(counts))
+    np.divide(totals, counts, out=means, where=counts > 0)
+    return totals, counts, means
+
+def query_window(index, start, end):
+    """
+    Total, count and mean impact of the mutations in one [start, end] window.
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - start (int): First position of the window.
+    - end (int): Last position of the window (inclusive).
+
+    Returns:
+    - tuple: (total, count, mean) of the window; mean is 0 for an empty window.
+    """
+    lo, hi = (int(offset) for offset in window_offsets(index, start, end))
+    total = float(index.cumulative_impacts[hi] - index.cumulative_impacts[lo])
+    count = hi - lo
+    return total, count, total / count if count else 0.0
+
+def bin_sums(index, lo, hi):
+    """
+    Sum the impacts of contiguous, non-overlapping bins in input order, as the original per-bin loops did.
+
+    Args:
+    - index (MutationIndex): Index of the mutations.
+    - lo (np.ndarray): First sorted offset of each bin, as returned by window_offsets.
+    - hi (np.ndarray): End sorted offset of each bin; hi[i] == lo[i + 1] for adjacent bins.
+
+    Returns:
+    - np.ndarray: Total impact of each bin.
+    """
+    # The bins' mutations form one run of the sorted order; label each mutation of the run with its bin
+    run = index.order[lo[0]:hi[-1]] if len(lo) else index.order[:0]
+    bin_ids = np.repeat(np.arange(len(lo)), hi - lo)
+
+    # Sum in input order (bincount returns integers when no mutation falls in a bin)
+    input_order = np.argsort(run, kind='stable')
+    return np.bincount(bin_ids[input_order], weights=index.impacts[run[input_order]], minlength=len(lo)).astype(np.float64, copy=False)
@@ -1,39 +1,122 @@
-from src.seq_partitioner import partition_seq_length
-from src.mutation_and_weight_assignor import assign_mutations
-from src.normalizer import weighted_ave_normalization
+from collections import namedtuple
+import numpy as np
+from src.seq_partitioner import as_subsubregion_array
+from src.tiling_cache import get_tiling
+from src.mutation_index import bin_sums, build_mutation_index, window_offsets
+from src.normalizer import weighted_ave_normalization_array
 
-def quantify_significant_mutations(seq_length, mutations):
+# Columnar scores of one set of sub-subregions:
+# - subsubregions: (n, 4) integer array of [subsubregion_number, length, start_index, end_index] rows.
+# - lo, hi: offsets into the sorted mutations; order[lo[i]:hi[i]] are the mutations of sub-subregion i.
+# - totals, scores: summed and normalized impact scores per sub-subregion.
+# - positions, impacts, order: the shared mutation arrays (input order) and their sort order.
+TilingScores = namedtuple('TilingScores', ['subsubregions', 'lo', 'hi', 'totals', 'scores', 'positions', 'impacts', 'order'])
+
+# Scores are normalized by len(subsubregion), i.e. the number of fields of a
+# [subsubregion_number, length, start_index, end_index] record, as in the original tuple path.
+SUBSUBREGION_FIELDS = 4
+
+def score_subsubregions(subsubregions, index):
+    """
+    Sum and normalize the impact scores of one set of sub-subregions.
+
+    Args:
+    - subsubregions (list of lists or np.ndarray): Sorted, contiguous [subsubregion_number, length, start_index, end_index] rows.
+    - index (MutationIndex): Index of the mutations, as returned by build_mutation_index.
+
+    Returns:
+    - TilingScores: Columnar sub-subregions, mutation offsets and scores.
+    """
+    subsubregions = as_subsubregion_array(subsubregions)
+    lo, hi = window_offsets(index, subsubregions[:, 2], subsubregions[:, 3])
+
+    # Sum the impact scores per sub-subregion in input order, and normalize the whole set at once
+    totals = bin_sums(index, lo, hi)
+    scores = weighted_ave_normalization_array(totals, SUBSUBREGION_FIELDS)
+
+    return TilingScores(subsubregions, lo, hi, totals, scores, index.positions, index.impacts, index.order)
+
+def subsubregion_mutation_indices(tiling_scores, i):
+    """
+    Get the input-order indices of the mutations assigned to one sub-subregion.
+
+    Args:
+    - tiling_scores (TilingScores): Columnar scores of a set of sub-subregions.
+    - i (int): Index of the sub-subregion.
+
+    Returns:
+    - np.ndarray: Indices into the mutation arrays, in input order.
+    """
+    return np.sort(tiling_scores.order[tiling_scores.lo[i]:tiling_scores.hi[i]])
+
+def tiling_scores_to_tuples(tiling_scores, mutations=None):
+    """
+    Convert columnar scores to the list-of-tuples format.
+
+    Args:
+    - tiling_scores (TilingScores): Columnar scores of a set of sub-subregions.
+    - mutations (list of tuples, optional): The original mutations; rebuilt from the arrays if not given.
+
+    Returns:
+    - list of tuples: (subsubregion, subsubregion_mutations, normalized_score) for each sub-subregion.
+    """
+    if mutations is None or isinstance(mutations, tuple):
+        mutations = list(zip(tiling_scores.positions.tolist(), tiling_scores.impacts.tolist()))
+
+    subsubregion_mutations_scores = []
+    for i, (subsubregion, score) in enumerate(zip(tiling_scores.subsubregions.tolist(), tiling_scores.scores)):
+        subsubregion_mutations = [mutations[j] for j in subsubregion_mutation_indices(tiling_scores, i).tolist()]
+        subsubregion_mutations_scores.append((subsubregion, subsubregion_mutations, score))
+    return subsubregion_mutations_scores
+
+def slice_tiling_scores(tiling_scores, selection):
+    """
+    Select a subset of the sub-subregions of columnar scores.
+
+    Args:
+    - tiling_scores (TilingScores): Columnar scores of a set of sub-subregions.
+    - selection (np.ndarray or slice): Boolean mask, indices or slice of the sub-subregions to keep.
+
+    Returns:
+    - TilingScores: Scores of the selected sub-subregions, sharing the mutation arrays.
+    """
+    return tiling_scores._replace(
+        subsubregions=tiling_scores.subsubregions[selection],
+        lo=tiling_scores.lo[selection],
+        hi=tiling_scores.hi[selection],
+        totals=tiling_scores.totals[selection],
+        scores=tiling_scores.scores[selection],
+    )
+
+def quantify_significant_mutations(seq_length, mutations, as_tuples=False, tiling=None, index=None):
     """
     Quantify significant mutations by summing and normalizing impact scores for sub-subregions.
 
     Args:
     - seq_length (int): Length of the DNA sequence.
-    - mutations (list of tuples): List of mutations, each represented as (position, mutation_data).
+    - mutations (list of tuples or tuple of np.ndarray): List of mutations, each represented as (position, mutation_data),
+      or columnar (positions, impacts) arrays.
+    - as_tuples (bool): Return lists of (subsubregion, mutations, normalized_score) tuples instead of columnar scores.
+    - tiling (Tiling, optional): Precomputed tiling of seq_length; taken from the tiling cache if not given.
+    - index (MutationIndex, optional): Index of the mutations, to share it with other tilings and window queries.
 
     Returns:
-    - tuple: Two lists containing sub-subregions with their mutations and normalized impact scores for sub-subregions starting at index 0 and index 15.
+    - tuple: Scores for sub-subregions starting at index 0 and index 15, as two TilingScores
+      (or two lists of tuples if as_tuples is True).
     """
     # Partition the sequence into sub-subregions starting at index 0 and index 15
-    subsubregions_0, subsubregions_15 = partition_seq_length(seq_length)
-    
-    # Process sub-subregions starting at index 0
-    subsubregion_mutations_scores_0 = []
-    assigned_mutations_0 = assign_mutations(subsubregions_0, mutations)
-    for subsubregion, subsubregion_mutations in assigned_mutations_0:
-        # Sum the impact scores of the mutations in the subsubregion
-        total_impact_score = sum(mutation[1] for mutation in subsubregion_mutations)
-        # Normalize by subsubregion length
-        normalized_score = weighted_ave_normalization(total_impact_score, len(subsubregion))
-        subsubregion_mutations_scores_0.append((subsubregion, subsubregion_mutations, normalized_score))
-
-    # Process sub-subregions starting at index 15
-    subsubregion_mutations_scores_15 = []
-    assigned_mutations_15 = assign_mutations(subsubregions_15, mutations)
-    for subsubregion, subsubregion_mutations in assigned_mutations_15:
-        # Sum the impact scores of the mutations in the subsubregion
-        total_impact_score = sum(mutation[1] for mutation in subsubregion_mutations)
-        # Normalize by subsubregion length
-        normalized_score = weighted_ave_normalization(total_impact_score, len(subsubregion))
-        subsubregion_mutations_scores_15.append((subsubregion, subsubregion_mutations, normalized_score))
-
-    return subsubregion_mutations_scores_0, subsubregion_mutations_scores_15
+    if tiling is None:
+        tiling = get_tiling(seq_length)
+    subsubregions_0, subsubregions_15 = tiling.subsubregions_0, tiling.subsubregions_15
+
+    # Index the mutations once for both partitions
+    if index is None:
+        index = build_mutation_index(mutations)
+
+    # Score sub-subregions starting at index 0 and index 15
+    scores_0 = score_subsubregions(subsubregions_0, index)
+    scores_15 = score_subsubregions(subsubregions_15, index)
+
+    if as_tuples:
+        return tiling_scores_to_tuples(scores_0, mutations), tiling_scores_to_tuples(scores_15, mutations)
+    return scores_0, scores_15
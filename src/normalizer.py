@@ -19,3 +19,25 @@ def weighted_ave_normalization(total_impact_score, length):
 
     # Replace NaN values with 0
     return np.nan_to_num(normalized_value)
+
+
+def weighted_ave_normalization_array(total_impact_scores, lengths):
+    """
+    Normalize an array of total impact scores by their lengths in one vectorized call.
+
+    Args:
+    - total_impact_scores (np.ndarray): Total impact scores, one per subsubregion.
+    - lengths (np.ndarray or int): Lengths of the subsubregions.
+
+    Returns:
+    - np.ndarray: The normalized values, with NaNs and non-positive lengths replaced by 0.
+    """
+    total_impact_scores = np.asarray(total_impact_scores, dtype=np.float64)
+    lengths = np.broadcast_to(np.asarray(lengths, dtype=np.float64), total_impact_scores.shape)
+
+    # Calculate the normalized impact scores where the length is positive
+    normalized_values = np.zeros_like(total_impact_scores)
+    np.divide(total_impact_scores, lengths, out=normalized_values, where=lengths > 0)
+
+    # Replace NaN values with 0
+    return np.nan_to_num(normalized_values, copy=False)
@@ -1,52 +1,314 @@
 import os
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
 import numpy as np
+from src.data_bucketer import group_first_indices
+from src.data_processor import hierarchy_numbers
+
+# Figures are only saved to files, so the non-interactive backend is used here and in the worker processes
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgb, to_rgba
+
+# Figures rendered by generate_plots, in order
+PLOT_FIGURES = ['mutation_positions', 'regions_subregions', 'density', 'hierarchy', 'regions', 'subregions', 'subsubregions']
+
+# Plot data extracted once and shared by all figures:
+# - mutation_points: (positions, scores) arrays of the sub-subregions starting at index 0 and 15 and of the combined
+#   intervals, one point per mutation of each sub-subregion or interval.
+# - score_intervals: (starts, ends, scores) arrays of the same three sets.
+# - subsubregion_data, subregion_data, region_data: (start, end, score, label) tuples from extract_plot_data_from_hierarchy.
+PlotData = namedtuple('PlotData', ['mutation_points', 'score_intervals', 'subsubregion_data', 'subregion_data', 'region_data'])
+
+# Most labels drawn on one plot; the rest are counted in a note above the plot
+DEFAULT_MAX_LABELS = 200
+
+# Times a colliding label is moved up by its own height before it is left out
+MAX_LABEL_NUDGES = 3
+
+# Scatter plots with more points than this (after decimation) are drawn as an image of their pixel coverage
+MAX_SCATTER_POINTS = 20000
+
+_settings = {'figures': None, 'jobs': None}
+_worker = {}
+
+def configure_plots(figures=None, jobs=None):
+    """
+    Configure the figures rendered by generate_plots.
+
+    Args:
+    - figures (list, optional): Names from PLOT_FIGURES to render.
+    - jobs (int, optional): Number of rendering processes; 1 renders in the calling process.
+    """
+    if figures is not None:
+        _settings['figures'] = list(figures)
+    if jobs is not None:
+        _settings['jobs'] = max(1, jobs)
+
+def extract_mutation_points(scores):
+    """
+    Position and score of every mutation of every sub-subregion or combined interval.
+
+    Args:
+    - scores (TilingScores or CombinedScores): Columnar scores.
+
+    Returns:
+    - tuple: (positions, scores) arrays, ordered by sub-subregion and then by input order of the mutations.
+    """
+    counts = scores.hi - scores.lo
+    bins = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) + np.repeat(scores.lo - (np.cumsum(counts) - counts), counts)
+    indices = scores.order[offsets]
+    sort = np.lexsort((indices, bins))
+    return scores.positions[indices[sort]], scores.scores[bins[sort]]
+
+def extract_figure_data(scores_0, scores_15, combined_scores, region_hierarchy, figures=PLOT_FIGURES):
+    """
+    Extract the data of the given figures once, for all of them.
+
+    Args:
+    - scores_0 (TilingScores): Scores for sub-subregions starting at index 0.
+    - scores_15 (TilingScores): Scores for sub-subregions starting at index 15.
+    - combined_scores (CombinedScores): Scores of the combined intervals.
+    - region_hierarchy (RegionHierarchy): Flat hierarchy of regions, subregions, and sub-subregions.
+    - figures (list): Names from PLOT_FIGURES; data only used by other figures is left as None.
+
+    Returns:
+    - PlotData: Data of the figures.
+    """
+    mutation_points = score_intervals = None
+    subsubregion_data = subregion_data = region_data = None
+    if 'mutation_positions' in figures:
+        mutation_points = tuple(extract_mutation_points(scores) for scores in (scores_0, scores_15, combined_scores))
+    if 'density' in figures:
+        score_intervals = (
+            (scores_0.subsubregions[:, 2], scores_0.subsubregions[:, 3], scores_0.scores),
+            (scores_15.subsubregions[:, 2], scores_15.subsubregions[:, 3], scores_15.scores),
+            (combined_scores.intervals[:, 0], combined_scores.intervals[:, 1], combined_scores.scores)
+        )
+    if set(figures) & {'regions_subregions', 'hierarchy', 'regions', 'subregions', 'subsubregions'}:
+        subsubregion_data, subregion_data, region_data = extract_plot_data_from_hierarchy(region_hierarchy)
+    return PlotData(mutation_points, score_intervals, subsubregion_data, subregion_data, region_data)
+
+def axes_pixel_size(ax):
+    """
+    Approximate width and height of an axes in pixels.
+
+    Args:
+    - ax (Axes): Axes of a figure.
+
+    Returns:
+    - tuple: (width, height) in pixels.
+    """
+    position = ax.get_position()
+    return (
+        max(1, int(ax.figure.get_figwidth() * ax.figure.dpi * position.width)),
+        max(1, int(ax.figure.get_figheight() * ax.figure.dpi * position.height))
+    )
+
+def pixel_bins(values, num_bins):
+    """
+    Bin values into num_bins equal bins spanning their range, e.g. the pixel columns of an axes.
+
+    Args:
+    - values (np.ndarray): Values to bin.
+    - num_bins (int): Number of bins.
+
+    Returns:
+    - np.ndarray: Bin of each value, from 0 to num_bins - 1.
+    """
+    low, high = values.min(), values.max()
+    if high <= low:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - low) * (num_bins / (high - low))).astype(np.int64), num_bins - 1)
+
+def decimate_points(x, y, width, height, max_per_pixel=8):
+    """
+    Keep at most max_per_pixel points per pixel of a scatter plot with more points than pixel columns.
+
+    Semi-transparent markers stop darkening after a few layers (8 layers at alpha 0.4 are 98% opaque),
+    so the plot looks the same with the remaining points dropped.
+
+    Args:
+    - x (np.ndarray): Point x coordinates.
+    - y (np.ndarray): Point y coordinates.
+    - width (int): Width of the axes in pixels.
+    - height (int): Height of the axes in pixels.
+    - max_per_pixel (int, optional): Number of points kept per pixel. Default is 8.
+
+    Returns:
+    - tuple: (x, y) arrays of the kept points, in their original order.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= width:
+        return x, y
+    cells = pixel_bins(x, width) * height + pixel_bins(y, height)
+    order = np.argsort(cells, kind='stable')
+    sorted_cells = cells[order]
+    cell_starts = np.flatnonzero(np.append(True, sorted_cells[1:] != sorted_cells[:-1]))
+    ranks = np.arange(len(x)) - np.repeat(cell_starts, np.diff(np.append(cell_starts, len(x))))
+    keep = np.sort(order[ranks < max_per_pixel])
+    return x[keep], y[keep]
+
+def decimate_line(x, y, width):
+    """
+    Reduce a polyline with more points than pixel columns to the first, lowest, highest and last point of
+    each run of consecutive points in one pixel column, which draws the same pixels.
+
+    Args:
+    - x (np.ndarray): Point x coordinates, in drawing order.
+    - y (np.ndarray): Point y coordinates.
+    - width (int): Width of the axes in pixels.
+
+    Returns:
+    - tuple: (x, y) arrays of the kept points, in drawing order.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= width:
+        return x, y
+    columns = pixel_bins(x, width)
+    runs = np.cumsum(np.append(0, columns[1:] != columns[:-1]))
+    run_starts = np.flatnonzero(np.append(True, runs[1:] != runs[:-1]))
+    run_ends = np.append(run_starts[1:], len(x)) - 1
+
+    # Sorting by (run, y) puts the lowest point of each run first and the highest last
+    by_y = np.lexsort((y, runs))
+    keep = np.concatenate((run_starts, run_ends, by_y[run_starts], by_y[run_ends]))
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+def decimate_intervals(starts, ends, scores, width):
+    """
+    Aggregate sorted intervals with more intervals than pixel columns to one per pixel column.
+
+    Args:
+    - starts (np.ndarray): Sorted interval starts.
+    - ends (np.ndarray): Interval ends.
+    - scores (np.ndarray): Interval scores.
+    - width (int): Width of the axes in pixels.
+
+    Returns:
+    - tuple: (starts, ends, low_scores, high_scores) arrays; the intervals themselves, with equal low and high
+      scores, if there are no more than width of them.
+    """
+    if len(starts) <= width:
+        return starts, ends, scores, scores
+    columns = pixel_bins((starts + ends) / 2, width)
+    first = np.flatnonzero(np.append(True, columns[1:] != columns[:-1]))
+    last = np.append(first[1:], len(starts)) - 1
+    return starts[first], ends[last], np.minimum.reduceat(scores, first), np.maximum.reduceat(scores, first)
+
+def point_coverage(x, y, limits, width, height, size, dpi):
+    """
+    Number of markers covering each pixel of an axes.
+
+    Args:
+    - x (np.ndarray): Point x coordinates.
+    - y (np.ndarray): Point y coordinates.
+    - limits (tuple): ((x0, x1), (y0, y1)) limits of the axes.
+    - width (int): Width of the axes in pixels.
+    - height (int): Height of the axes in pixels.
+    - size (float): Marker size in points squared, as for scatter.
+    - dpi (float): Resolution of the figure.
+
+    Returns:
+    - np.ndarray: (height, width) marker counts, with row 0 at the bottom.
+    """
+    (x0, x1), (y0, y1) = limits
+    columns = np.clip(((x - x0) / (x1 - x0) * width).astype(np.int64), 0, width - 1)
+    rows = np.clip(((y - y0) / (y1 - y0) * height).astype(np.int64), 0, height - 1)
+    counts = np.bincount(rows * width + columns, minlength=width * height).reshape(height, width)
+
+    # Spread each count over the disk of a marker, with partly covered pixels at its edge
+    radius = np.sqrt(size) / 2 * dpi / 72
+    r = int(np.ceil(radius + 0.5))
+    padded = np.pad(counts, r)
+    coverage = np.zeros((height, width))
+    for dy in range(-r, r + 1):
+        for dx in range(-r, r + 1):
+            weight = min(1.0, radius + 0.5 - np.hypot(dx, dy))
+            if weight > 0:
+                coverage += weight * padded[r + dy:r + dy + height, r + dx:r + dx + width]
+    return coverage
+
+def add_scatter_points(ax, point_sets):
+    """
+    Add scatter plots to an axes, drawing them as one image when they have too many points to draw one by one.
+
+    Args:
+    - ax (Axes): Axes to draw on.
+    - point_sets (list): (x, y, color, alpha, size) of each scatter plot, in drawing order.
+    """
+    width, height = axes_pixel_size(ax)
+    point_sets = [(*decimate_points(x, y, width, height), color, alpha, size) for x, y, color, alpha, size in point_sets]
+    if sum(len(x) for x, *_ in point_sets) <= MAX_SCATTER_POINTS:
+        for x, y, color, alpha, size in point_sets:
+            ax.scatter(x, y, color=color, alpha=alpha, s=size)
+        return
+
+    # Autoscale to the points and everything already drawn, then fix the limits the image is drawn for
+    for x, y, *_ in point_sets:
+        if len(x):
+            ax.update_datalim([(x.min(), y.min()), (x.max(), y.max())])
+    ax.autoscale_view()
+    limits = (ax.get_xlim(), ax.get_ylim())
+
+    # Composite the marker coverage of each set over the previous ones, as the scatter plots would be drawn
+    image = np.zeros((height, width, 4))
+    for x, y, color, alpha, size in point_sets:
+        if not len(x):
+            continue
+        opacity = 1 - (1 - alpha) ** point_coverage(x, y, limits, width, height, size, ax.figure.dpi)
+        image[..., :3] = np.asarray(to_rgb(color)) * opacity[..., None] + image[..., :3] * (1 - opacity[..., None])
+        image[..., 3] = opacity + image[..., 3] * (1 - opacity)
+    rgb = np.divide(image[..., :3], image[..., 3:], out=np.zeros((height, width, 3)), where=image[..., 3:] > 0)
+    ax.imshow(np.dstack((rgb, image[..., 3])), extent=(*limits[0], *limits[1]), origin='lower', aspect='auto', zorder=1)
+    ax.set_xlim(*limits[0])
+    ax.set_ylim(*limits[1])
+
+def interval_columns(data):
+    """
+    Split (start, end, score, label) tuples into arrays.
+
+    Args:
+    - data (list): (start, end, score, label) tuples.
 
-def extract_plot_data(positional_scores):
-    mutation_positions = []
-    scores = []
-    for subsubregion in positional_scores:
-        start = subsubregion[0][2]
-        end = subsubregion[0][3]
-        score = subsubregion[2]
-        for mutation in subsubregion[1]:
-            mutation_positions.append(mutation[0])
-            scores.append(score)
-    return mutation_positions, scores
-
-def plot_positional_scores_by_mutation_positions(positional_scores_0, positional_scores_15, combined_data, output_dir):
-    mutation_positions_0, scores_0 = extract_plot_data(positional_scores_0)
-    mutation_positions_15, scores_15 = extract_plot_data(positional_scores_15)
-
-    combined_positions = []
-    combined_scores = []
-    for interval, mutations, score in combined_data:
-        for mutation in mutations:
-            combined_positions.append(mutation[0])
-            combined_scores.append(score)
+    Returns:
+    - tuple: (starts, ends, scores) arrays.
+    """
+    if not data:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    starts, ends, scores = (np.array(column, dtype=np.float64) for column in list(zip(*data))[:3])
+    return starts, ends, scores
+
+def plot_positional_scores_by_mutation_positions(figure_data, output_dir):
+    (mutation_positions_0, scores_0), (mutation_positions_15, scores_15), (combined_positions, combined_scores) = figure_data.mutation_points
 
     # Plotting the data
     fig, ax = plt.subplots(figsize=(15, 8))
+    width, _ = axes_pixel_size(ax)
 
     # Scatter plot for mutation positions and positional scores
-    scatter_0 = ax.scatter(mutation_positions_0, scores_0, color='blue', label='Start Index 0', alpha=0.4, s=20)
-    scatter_15 = ax.scatter(mutation_positions_15, scores_15, color='green', label='Start Index 15', alpha=0.4, s=20)
-    scatter_combined = ax.scatter(combined_positions, combined_scores, color='red', label='Combined', alpha=0.4, s=20)
+    add_scatter_points(ax, [
+        (mutation_positions_0, scores_0, 'blue', 0.4, 20),
+        (mutation_positions_15, scores_15, 'green', 0.4, 20),
+        (combined_positions, combined_scores, 'red', 0.4, 20)
+    ])
 
     # Plot lines connecting the dots for each category
     # Start Index 0
-    if mutation_positions_0:
-        ax.plot(mutation_positions_0, scores_0, color='blue', linestyle='-', alpha=0.4)
+    if len(mutation_positions_0):
+        ax.plot(*decimate_line(mutation_positions_0, scores_0, width), color='blue', linestyle='-', alpha=0.4)
 
     # Start Index 15
-    if mutation_positions_15:
-        ax.plot(mutation_positions_15, scores_15, color='green', linestyle='-', alpha=0.4)
+    if len(mutation_positions_15):
+        ax.plot(*decimate_line(mutation_positions_15, scores_15, width), color='green', linestyle='-', alpha=0.4)
 
     # Combined
-    if combined_positions:
-        ax.plot(combined_positions, combined_scores, color='red', linestyle='-', alpha=0.4)
+    if len(combined_positions):
+        ax.plot(*decimate_line(combined_positions, combined_scores, width), color='red', linestyle='-', alpha=0.4)
 
     # Custom legend
     handles = [
@@ -159,48 +421,134 @@ def plot_positional_scores_by_mutation_positions(positional_scores_0, positional
 #     plt.savefig(plot_file)
 #     plt.close(fig)
 
-def plot_density_for_positional_scores(positional_scores_0, positional_scores_15, combined_data, output_dir):
-    def extract_plot_data(positional_scores):
-        indices = []
-        scores = []
-        for subsubregion in positional_scores:
-            if len(subsubregion) < 3 or not subsubregion[0] or len(subsubregion[0]) < 4:
-                continue  # Skip if the sub-subregion does not have the expected format
-            start, end = subsubregion[0][2], subsubregion[0][3]
-            score = subsubregion[2]
-            indices.extend(range(start, end + 1))
-            scores.extend([score] * (end - start + 1))
-        return indices, scores
-
-    def extract_combined_plot_data(combined_data):
-        indices = []
-        scores = []
-        for subsubregion in combined_data:
-            if len(subsubregion) < 3:
-                continue  # Skip if the sub-subregion does not have the expected format
-            start, end = subsubregion[0][0], subsubregion[0][1]
-            score = subsubregion[2]
-            indices.extend(range(start, end + 1))
-            scores.extend([score] * (end - start + 1))
-        return indices, scores
-
-    # Extract data for plotting
-    indices_0, scores_0 = extract_plot_data(positional_scores_0)
-    indices_15, scores_15 = extract_plot_data(positional_scores_15)
-    indices_combined, scores_combined = extract_combined_plot_data(combined_data)
-
-    # Combine data into DataFrames for plotting with Seaborn
-    data_0 = pd.DataFrame({'Index': indices_0, 'Score': scores_0, 'Type': 'Start Index 0'})
-    data_15 = pd.DataFrame({'Index': indices_15, 'Score': scores_15, 'Type': 'Start Index 15'})
-    data_combined = pd.DataFrame({'Index': indices_combined, 'Score': scores_combined, 'Type': 'Combined'})
+def weighted_interval_moments(starts, ends, scores):
+    """
+    Weighted moments of the indices of intervals, each index weighted by the score of its interval.
+
+    Args:
+    - starts (np.ndarray): Interval starts.
+    - ends (np.ndarray): Interval ends, inclusive.
+    - scores (np.ndarray): Interval scores.
+
+    Returns:
+    - tuple: (total weight, sum of squared weights, weighted mean, unbiased weighted variance) of the indices.
+      The variance is 0 when it is undefined, e.g. for a single index.
+    """
+    lengths = (ends - starts + 1).astype(np.float64)
+    scores = scores.astype(np.float64)
+    midpoints = (starts + ends) / 2
+    total = np.dot(scores, lengths)
+    total_squares = np.dot(scores * scores, lengths)
+    if total <= 0:
+        return total, total_squares, 0.0, 0.0
+    mean = np.dot(scores * lengths, midpoints) / total
+
+    # Spread of the indices within each interval plus the spread of the intervals around the mean
+    spread = np.dot(scores, lengths * (lengths * lengths - 1) / 12 + lengths * (midpoints - mean) ** 2)
+    denominator = total - total_squares / total
+    if not denominator > 0:
+        return total, total_squares, mean, 0.0
+    return total, total_squares, mean, spread / denominator
+
+def interval_weight_histogram(starts, ends, scores, edges):
+    """
+    Sum the scores of all indices of intervals falling in each bin, without expanding the intervals.
+
+    The weight of the indices below c is the sum over intervals of score * (max(c - start, 0) - max(c - end - 1, 0)),
+    evaluated for all edges at once from prefix sums over the sorted starts and ends.
+
+    Args:
+    - starts (np.ndarray): Interval starts.
+    - ends (np.ndarray): Interval ends, inclusive.
+    - scores (np.ndarray): Interval scores.
+    - edges (np.ndarray): Increasing bin edges; a bin holds the indices from its left edge up to its right edge.
+
+    Returns:
+    - np.ndarray: Weight of each of the len(edges) - 1 bins.
+    """
+    cuts = np.ceil(edges)
+
+    def weight_below(bounds):
+        # Sum of score * max(c - bound, 0) over all intervals, for each cut c
+        order = np.argsort(bounds, kind='stable')
+        bounds, weights = bounds[order].astype(np.float64), scores[order].astype(np.float64)
+        weight_sums = np.concatenate(([0.0], np.cumsum(weights)))
+        bound_sums = np.concatenate(([0.0], np.cumsum(weights * bounds)))
+        below = np.searchsorted(bounds, cuts, side='left')
+        return cuts * weight_sums[below] - bound_sums[below]
+
+    return np.diff(weight_below(starts) - weight_below(ends + 1))
+
+def density_curves(score_intervals, num_points=1024, cut=3):
+    """
+    Weighted Gaussian kernel density of the indices of each set of scored intervals, as plotted by
+    plot_density_for_positional_scores.
+
+    Each index is weighted by the score of its interval, and the bandwidth follows Scott's rule for the effective
+    number of weighted indices, as in a weighted scipy gaussian_kde. The weights are summed into num_points bins with
+    interval_weight_histogram and smoothed with an FFT convolution, so the cost does not depend on the sequence
+    length or the number of points on the curve.
+
+    Args:
+    - score_intervals (tuple): (starts, ends, scores) arrays of each set.
+    - num_points (int, optional): Number of points on each curve. Default is 1024.
+    - cut (float, optional): Bandwidths the curves extend beyond the lowest and highest index. Default is 3.
+
+    Returns:
+    - tuple: (grid, densities), the shared index grid and the density of each set on it. Negative scores carry
+      no weight, and sets without positive weight have zero density.
+    """
+    # A density needs non-negative weights, so negative scores are clipped to 0
+    score_intervals = [(starts, ends, np.maximum(scores, 0)) for starts, ends, scores in score_intervals]
+    moments = [weighted_interval_moments(*intervals) for intervals in score_intervals]
+    bandwidths = []
+    for total, total_squares, _, variance in moments:
+        bandwidth = np.sqrt(variance) * (total * total / total_squares) ** -0.2 if total > 0 and variance > 0 else 0.0
+        # Degenerate spreads fall back to a one-bin kernel below
+        bandwidths.append(bandwidth if np.isfinite(bandwidth) else 0.0)
+
+    # One grid covering every curve
+    lows = [intervals[0].min() - cut * bandwidth for intervals, bandwidth in zip(score_intervals, bandwidths) if len(intervals[0])]
+    highs = [intervals[1].max() + cut * bandwidth for intervals, bandwidth in zip(score_intervals, bandwidths) if len(intervals[0])]
+    if not lows:
+        return np.zeros(num_points), [np.zeros(num_points) for _ in score_intervals]
+    low, high = min(lows), max(highs)
+    if high - low < 1:
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, num_points + 1)
+    step = edges[1] - edges[0]
+    grid = (edges[:-1] + edges[1:]) / 2
+
+    # Bin offsets in FFT order, covering every distance between two bins without wrapping around
+    size = 2 * num_points
+    offsets = np.fft.fftfreq(size, 1 / size) * step
+
+    densities = []
+    for intervals, (total, _, _, _), bandwidth in zip(score_intervals, moments, bandwidths):
+        if total <= 0:
+            densities.append(np.zeros(num_points))
+            continue
+        weights = interval_weight_histogram(*intervals, edges)
+
+        # Kernel normalized over the bins, so bandwidths narrower than a bin keep the total weight
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) if bandwidth > 0 else (offsets == 0).astype(np.float64)
+        kernel /= kernel.sum()
+        smoothed = np.fft.irfft(np.fft.rfft(weights, size) * np.fft.rfft(kernel), size)[:num_points]
+        densities.append(np.maximum(smoothed, 0) / (total * step))
+    return grid, densities
+
+def plot_density_for_positional_scores(figure_data, output_dir):
+    grid, densities = density_curves(figure_data.score_intervals)
+    labels = ['Start Index 0', 'Start Index 15', 'Combined']
+    colors = ['blue', 'green', 'red']
 
     # Plot the data
     plt.figure(figsize=(15, 8))
 
-    # KDE plot with less dense colors (more transparent)
-    sns.kdeplot(data=data_0, x='Index', weights='Score', fill=True, color='blue', label='Start Index 0', alpha=0.2)
-    sns.kdeplot(data=data_15, x='Index', weights='Score', fill=True, color='green', label='Start Index 15', alpha=0.2)
-    sns.kdeplot(data=data_combined, x='Index', weights='Score', fill=True, color='red', label='Combined', alpha=0.2)
+    # Filled density curves with less dense colors (more transparent)
+    for density, color, label in zip(densities, colors, labels):
+        plt.fill_between(grid, density, facecolor=to_rgba(color, 0.2), edgecolor=color, label=label)
+    plt.ylim(bottom=0)
 
     # Labels and legend
     plt.xlabel('Sub-subregions')
@@ -208,68 +556,141 @@ def plot_density_for_positional_scores(positional_scores_0, positional_scores_15
     plt.title('Positional Scores Density Plot')
     plt.legend(title='Type')
 
-    # Save the plot
+    # Save the plot, and the curves as data
     plot_file = os.path.join(output_dir, 'positional_score_density_plot.png')
     plt.savefig(plot_file)
     plt.close()
+    data_file = os.path.join(output_dir, 'positional_score_density.csv')
+    np.savetxt(data_file, np.column_stack([grid] + densities), fmt='%.10g', delimiter=',',
+               header=','.join(['Index'] + labels), comments='')
+
+def extract_plot_data_from_hierarchy(region_hierarchy):
+    region_numbers, subregion_numbers, subsubregion_numbers = hierarchy_numbers(region_hierarchy)
+    subregion_region_numbers = region_hierarchy.region_index + 1
+    subregion_local_numbers = subregion_numbers[group_first_indices(region_hierarchy.subregion_index, len(region_hierarchy.subregion_scores))]
+
+    # Extract region data
+    region_data = [
+        (start, end, score, number)
+        for number, ((start, end), score) in enumerate(zip(region_hierarchy.region_ranges.tolist(), region_hierarchy.region_scores.tolist()), start=1)
+    ]
 
-def extract_plot_data_from_details(region_details):
-    subsubregion_data = []
-    subregion_data = []
-    region_data = []
-    mutation_positions = []
-    mutation_scores = []
-
-    for region_detail in region_details:
-        # Extract region data
-        start, end = region_detail['region_range']
-        score = region_detail['region_score']
-        region_data.append((start, end, score, region_detail['region_number']))
-
-        for subregion_detail in region_detail['subregions']:
-            # Extract subregion data
-            sub_start, sub_end = subregion_detail['subregion_range']
-            subregion_score = subregion_detail['subregion_score']
-            if subregion_score != 0:
-                subregion_data.append((sub_start, sub_end, subregion_score, f"{region_detail['region_number']},{subregion_detail['subregion_number']}"))
-
-            for subsubregion_detail in subregion_detail['subsubregions']:
-                # Extract sub-subregion data
-                subsub_start, subsub_end = subsubregion_detail['subsubregion_range']
-                subsubregion_score = subsubregion_detail['subsubregion_score']
-                if subsubregion_score != 0:
-                    subsubregion_data.append((subsub_start, subsub_end, subsubregion_score, f"{region_detail['region_number']},{subregion_detail['subregion_number']},{subsubregion_detail['subsubregion_number']}"))
-                for mutation in subsubregion_detail['subsubregion_data'][1]:  # Assuming mutations are in subsubregion_detail['subsubregion_data'][1]
-                    if isinstance(mutation, tuple) or isinstance(mutation, list):  # Ensure mutation is a tuple or list
-                        mutation_positions.append(mutation[0])
-                        mutation_scores.append(subsubregion_score)
-    
-    return subsubregion_data, subregion_data, region_data, mutation_positions, mutation_scores
-
-
-
-# Function to add interval bars and labels
+    # Extract subregion data with non-zero scores
+    nonzero = np.flatnonzero(region_hierarchy.subregion_scores != 0)
+    subregion_data = [
+        (start, end, score, f"{region_number},{subregion_number}")
+        for (start, end), score, region_number, subregion_number in zip(
+            region_hierarchy.subregion_ranges[nonzero].tolist(), region_hierarchy.subregion_scores[nonzero].tolist(),
+            subregion_region_numbers[nonzero].tolist(), subregion_local_numbers[nonzero].tolist()
+        )
+    ]
+
+    # Extract sub-subregion data with non-zero scores
+    nonzero = np.flatnonzero(region_hierarchy.scores != 0)
+    subsubregion_data = [
+        (start, end, score, f"{region_number},{subregion_number},{subsubregion_number}")
+        for (start, end), score, region_number, subregion_number, subsubregion_number in zip(
+            region_hierarchy.intervals[nonzero].tolist(), region_hierarchy.scores[nonzero].tolist(),
+            region_numbers[nonzero].tolist(), subregion_numbers[nonzero].tolist(), subsubregion_numbers[nonzero].tolist()
+        )
+    ]
+
+    return subsubregion_data, subregion_data, region_data
+
+
+
+# Function to add interval bars
 def add_interval_bars(ax, data, color, label, hierarchy=False):
-    for start, end, score, *numbers in data:
-        ax.hlines(score, start, end, colors=color, alpha=0.4, linewidth=5)
-        if numbers:  # Ensure there are elements in numbers
-            if hierarchy:
-                ax.text((start + end) / 2, score, f"{numbers[0]}", fontsize=7, color=color, ha='center', va='bottom')
-            else:
-                ax.text((start + end) / 2, score, f"{numbers[0]}", fontsize=7, color=color, ha='center', va='bottom')
+    # All bars are drawn as one collection, aggregated to pixel columns when there are more bars than columns
+    width, _ = axes_pixel_size(ax)
+    starts, ends, low_scores, high_scores = decimate_intervals(*interval_columns(data), width)
+    segments = [np.column_stack((starts, high_scores, ends, high_scores)).reshape(-1, 2, 2)]
+    spread = high_scores > low_scores
+    if spread.any():
+        # Columns of several bars get their lowest bar and a vertical stroke spanning all of them
+        middles = (starts[spread] + ends[spread]) / 2
+        segments.append(np.column_stack((starts[spread], low_scores[spread], ends[spread], low_scores[spread])).reshape(-1, 2, 2))
+        segments.append(np.column_stack((middles, low_scores[spread], middles, high_scores[spread])).reshape(-1, 2, 2))
+    if len(starts):
+        ax.add_collection(LineCollection(np.concatenate(segments), colors=color, alpha=0.4, linewidth=5))
+        ax.autoscale_view()
+
+def interval_labels(data, color):
+    """
+    Labels of (start, end, score, label) tuples, anchored at the middle of each interval.
 
+    Args:
+    - data (list): (start, end, score, label) tuples.
+    - color (str): Label color.
+
+    Returns:
+    - list: (x, y, text, color) labels for add_labels.
+    """
+    return [((start + end) / 2, score, f"{numbers[0]}", color) for start, end, score, *numbers in data if numbers]
 
+def add_labels(ax, labels, max_labels=DEFAULT_MAX_LABELS, fontsize=7):
+    """
+    Place labels just above their anchors without overlaps, highest score first.
+
+    Placed labels are marked in a grid of label-height rows and character-wide columns over the figure, so each
+    label is checked against the grid cells it would cover instead of against every other label. A label that
+    collides is moved up by its own height at most MAX_LABEL_NUDGES times, and left out if it still collides.
+    At most max_labels labels are drawn, and the number left out is noted above the top right of the axes.
+
+    Args:
+    - ax (Axes): Axes to draw on, with all of its data already added.
+    - labels (list): (x, y, text, color) labels in data coordinates.
+    - max_labels (int, optional): Most labels drawn. Default is DEFAULT_MAX_LABELS.
+    - fontsize (float, optional): Font size of the labels in points. Default is 7.
 
+    Returns:
+    - int: Number of labels left out.
+    """
+    if not labels:
+        return 0
+
+    # Anchors in figure pixels, for the limits of the data drawn so far
+    ax.autoscale_view()
+    x, y, texts, colors = zip(*labels)
+    anchors = ax.transData.transform(np.column_stack((x, y)))
+
+    # Label size in pixels, estimated from the number of characters
+    dpi = ax.figure.dpi
+    row_height = fontsize * 1.2 * dpi / 72
+    column_width = fontsize * 0.6 * dpi / 72
+    num_columns = int(ax.figure.get_figwidth() * dpi / column_width) + 1
+    num_rows = int(ax.figure.get_figheight() * dpi / row_height) + 1
+    occupied = np.zeros((num_rows, num_columns), dtype=bool)
+
+    placed = 0
+    for i in np.lexsort((anchors[:, 0], -np.asarray(y, dtype=np.float64))):
+        if placed == max_labels:
+            break
+        half_width = len(texts[i]) * column_width / 2
+        first = max(0, int((anchors[i, 0] - half_width) / column_width))
+        last = min(num_columns - 1, int((anchors[i, 0] + half_width) / column_width))
+        for nudge in range(MAX_LABEL_NUDGES + 1):
+            bottom = anchors[i, 1] + nudge * row_height
+            row = int(bottom / row_height)
+            if row < 0 or row + 1 >= num_rows or first > last:
+                break
+            # A label spans parts of two grid rows
+            if not occupied[row:row + 2, first:last + 1].any():
+                occupied[row:row + 2, first:last + 1] = True
+                label_y = y[i] if nudge == 0 else ax.transData.inverted().transform((anchors[i, 0], bottom))[1]
+                ax.text(x[i], label_y, texts[i], fontsize=fontsize, color=colors[i], ha='center', va='bottom')
+                placed += 1
+                break
+
+    left_out = len(labels) - placed
+    if left_out:
+        ax.text(1, 1.01, f"{left_out} of {len(labels)} labels not shown", transform=ax.transAxes,
+                fontsize=fontsize, color='gray', ha='right', va='bottom')
+    return left_out
 
 # Function to add labels and prevent overlap
-def add_labels_with_prevention(ax, positions, scores, color):
-    y_positions = []
-    for i, (pos, score) in enumerate(zip(positions, scores)):
-        y = score + 0.02
-        while any(abs(y - prev_y) < 0.05 for prev_y in y_positions):
-            y += 0.05
-        y_positions.append(y)
-        ax.text(pos, y, str(pos), fontsize=7, color=color, ha='center', va='bottom')
+def add_labels_with_prevention(ax, positions, scores, color, max_labels=DEFAULT_MAX_LABELS):
+    add_labels(ax, [(pos, score, str(pos), color) for pos, score in zip(positions, scores)], max_labels)
 
 import matplotlib.ticker as ticker
 
@@ -278,16 +699,12 @@ def plot_data(data, label, color, title, output_dir, file_name, hierarchy=False,
 
     if points:
         # Plot points for subsubregions
-        for start, end, score, *numbers in data:
-            mid_point = (start + end) / 2
-            ax.scatter(mid_point, score, color=color, alpha=0.4, s=5)
-            if hierarchy:
-                ax.text(mid_point, score, f"{numbers[0]}", fontsize=7, color=color, ha='center', va='bottom')
-            else:
-                ax.text(mid_point, score, f"{numbers[0]}", fontsize=7, color=color, ha='center', va='bottom')
+        starts, ends, scores = interval_columns(data)
+        add_scatter_points(ax, [((starts + ends) / 2, scores, color, 0.4, 5)])
     else:
         # Add interval bars
         add_interval_bars(ax, data, color, label, hierarchy=hierarchy)
+    add_labels(ax, interval_labels(data, color))
 
     # Custom legend
     handles = [
@@ -308,9 +725,8 @@ def plot_data(data, label, color, title, output_dir, file_name, hierarchy=False,
 
 
 
-def plot_regions_subregions_positional_scores(region_details, output_dir):
-    # Extract plot data
-    subsubregion_data, subregion_data, region_data, mutation_positions, mutation_scores = extract_plot_data_from_details(region_details)
+def plot_regions_subregions_positional_scores(figure_data, output_dir):
+    subregion_data, region_data = figure_data.subregion_data, figure_data.region_data
 
     # Plotting the data
     fig, ax = plt.subplots(figsize=(15, 8))
@@ -318,6 +734,7 @@ def plot_regions_subregions_positional_scores(region_details, output_dir):
     # Add interval bars for regions and subregions
     add_interval_bars(ax, region_data, 'red', 'Regions')
     add_interval_bars(ax, subregion_data, 'green', 'Subregions')
+    add_labels(ax, interval_labels(region_data, 'red') + interval_labels(subregion_data, 'green'))
 
     # Custom legend
     handles = [
@@ -337,9 +754,8 @@ def plot_regions_subregions_positional_scores(region_details, output_dir):
     plt.savefig(plot_file)
     plt.close(fig)
 
-def plot_positional_scores(region_details, output_dir):
-    # Extract plot data
-    subsubregion_data, subregion_data, region_data, mutation_positions, mutation_scores = extract_plot_data_from_details(region_details)
+def plot_positional_scores(figure_data, output_dir):
+    subsubregion_data, subregion_data, region_data = figure_data.subsubregion_data, figure_data.subregion_data, figure_data.region_data
 
     # Plotting the data
     fig, ax = plt.subplots(figsize=(15, 8))
@@ -349,10 +765,9 @@ def plot_positional_scores(region_details, output_dir):
     add_interval_bars(ax, subregion_data, 'green', 'Subregions')
 
     # Plot points for sub-subregions
-    for start, end, score, *numbers in subsubregion_data:
-        mid_point = (start + end) / 2
-        ax.scatter(mid_point, score, color='blue', alpha=0.4, s=5)
-        ax.text(mid_point, score, f"{numbers[0]}", fontsize=7, color='blue', ha='center', va='bottom')
+    starts, ends, scores = interval_columns(subsubregion_data)
+    add_scatter_points(ax, [((starts + ends) / 2, scores, 'blue', 0.4, 5)])
+    add_labels(ax, interval_labels(region_data, 'red') + interval_labels(subregion_data, 'green') + interval_labels(subsubregion_data, 'blue'))
 
     # Custom legend
     handles = [
@@ -373,30 +788,77 @@ def plot_positional_scores(region_details, output_dir):
     plt.savefig(plot_file)
     plt.close(fig)
 
-    # Generate individual plots
-    plot_data(region_data, 'Region', 'red', 'Positional Scores of Regions', output_dir, 'positional_scores_regions.png')
-    plot_data(subregion_data, 'Subregion, Region', 'green', 'Positional Scores of Subregions', output_dir, 'positional_scores_subregions.png', hierarchy=True)
-    plot_data(subsubregion_data, 'Sub-subregion, Subregion, Region', 'blue', 'Positional Scores of Sub-subregions', output_dir, 'positional_scores_subsubregions.png', hierarchy=True, points=True)
+def plot_region_scores(figure_data, output_dir):
+    plot_data(figure_data.region_data, 'Region', 'red', 'Positional Scores of Regions', output_dir, 'positional_scores_regions.png')
+
+def plot_subregion_scores(figure_data, output_dir):
+    plot_data(figure_data.subregion_data, 'Subregion, Region', 'green', 'Positional Scores of Subregions', output_dir, 'positional_scores_subregions.png', hierarchy=True)
+
+def plot_subsubregion_scores(figure_data, output_dir):
+    plot_data(figure_data.subsubregion_data, 'Sub-subregion, Subregion, Region', 'blue', 'Positional Scores of Sub-subregions', output_dir, 'positional_scores_subsubregions.png', hierarchy=True, points=True)
+
+# Rendering function of each figure
+FIGURE_RENDERERS = {
+    'mutation_positions': plot_positional_scores_by_mutation_positions,
+    'regions_subregions': plot_regions_subregions_positional_scores,
+    'density': plot_density_for_positional_scores,
+    'hierarchy': plot_positional_scores,
+    'regions': plot_region_scores,
+    'subregions': plot_subregion_scores,
+    'subsubregions': plot_subsubregion_scores,
+}
+
+def init_plot_worker(figure_data):
+    """
+    Hold the plot data in a rendering process. Forked workers inherit it without copying.
+
+    Args:
+    - figure_data (PlotData): Data of the figures.
+    """
+    _worker['figure_data'] = figure_data
 
+def render_figure(figure, output_dir):
+    """
+    Render one figure in a rendering process.
 
+    Args:
+    - figure (str): Name from PLOT_FIGURES.
+    - output_dir (str): Directory to save the plot.
+    """
+    FIGURE_RENDERERS[figure](_worker['figure_data'], output_dir)
 
-def generate_plots(positional_scores_0, positional_scores_15, combined_data, region_details, output_dir):
+def generate_plots(scores_0, scores_15, combined_scores, region_hierarchy, output_dir, figures=None, jobs=None):
     """
-    Generate and save all plots to the specified output directory.
+    Generate and save plots to the specified output directory.
+
+    The plot data is extracted once, and the figures are rendered concurrently in a process pool.
 
     Args:
-    - positional_scores_0: Positional scores starting from index 0
-    - positional_scores_15: Positional scores starting from index 15
-    - combined_data: Combined positional scores data
-    - region_details: Detailed information about regions, subregions, and sub-subregions
+    - scores_0: Scores for sub-subregions starting at index 0 (TilingScores)
+    - scores_15: Scores for sub-subregions starting at index 15 (TilingScores)
+    - combined_scores: Scores of the combined intervals (CombinedScores)
+    - region_hierarchy: Flat hierarchy of regions, subregions, and sub-subregions (RegionHierarchy)
     - output_dir: Directory to save the plots
+    - figures: Names from PLOT_FIGURES to render (default: those of configure_plots, or all)
+    - jobs: Number of rendering processes (default: that of configure_plots, or one per figure up to the CPU count)
     """
+    if figures is None:
+        figures = _settings['figures'] or PLOT_FIGURES
+    unknown = [figure for figure in figures if figure not in FIGURE_RENDERERS]
+    if unknown:
+        raise ValueError(f"Unknown figures: {', '.join(unknown)}. Choose from {', '.join(PLOT_FIGURES)}.")
+    if jobs is None:
+        jobs = _settings['jobs'] or os.cpu_count() or 1
+    jobs = min(jobs, len(figures))
+
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    plot_positional_scores_by_mutation_positions(positional_scores_0, positional_scores_15, combined_data, output_dir)
-    # plot_positional_scores_by_subsubregion_ranges(positional_scores_0, positional_scores_15, combined_data, output_dir)
-    plot_regions_subregions_positional_scores(region_details, output_dir)
+    figure_data = extract_figure_data(scores_0, scores_15, combined_scores, region_hierarchy, figures)
+    if jobs <= 1:
+        for figure in figures:
+            FIGURE_RENDERERS[figure](figure_data, output_dir)
+        return
 
-    plot_density_for_positional_scores(positional_scores_0, positional_scores_15, combined_data, output_dir)
-    plot_positional_scores(region_details, output_dir)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_plot_worker, initargs=(figure_data,)) as executor:
+        list(executor.map(render_figure, figures, [output_dir] * len(figures)))
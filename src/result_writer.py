@@ -1,8 +1,22 @@
 import os
 import csv
-import pandas as pd
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.data_processor import hierarchy_numbers
 
-def write_results_to_csv(file_path, data, headers):
+# File extensions of the columnar output formats; 'compat' writes the original CSV files instead
+RESULT_FORMATS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'parquet': '.parquet',
+}
+OUTPUT_FORMATS = ['compat'] + list(RESULT_FORMATS)
+
+# Fast gzip level for .csv.gz results; Parquet is the compact format
+GZIP_COMPRESS_LEVEL = 1
+
+def write_results_to_csv(file_path, data, headers, append=False):
     """
     Write data to a CSV file, creating a new directory each time.
 
@@ -10,16 +24,18 @@ def write_results_to_csv(file_path, data, headers):
     - file_path (str): Path to the output file.
     - data (list): List of data to write.
     - headers (list): List of headers for the CSV file.
+    - append (bool, optional): Append the rows, without headers, to a file written before.
     """
     # Create directory, assuming it does not exist
     directory = os.path.dirname(file_path)
     os.makedirs(directory, exist_ok=True)
 
     # Write data to CSV
+    import pandas as pd
     df = pd.DataFrame(data, columns=headers)
-    df.to_csv(file_path, index=False)
+    df.to_csv(file_path, index=False, mode='a' if append else 'w', header=not append)
 
-def write_processed_data(result_dir, positional_scores_0_data, positional_scores_15_data, combined_data_csv):
+def write_processed_data(result_dir, positional_scores_0_data, positional_scores_15_data, combined_data_csv, append=False):
     """
     Write processed data to CSV files in the specified result directory.
 
@@ -28,6 +44,7 @@ def write_processed_data(result_dir, positional_scores_0_data, positional_scores
     - positional_scores_0_data (list): Data for positional scores starting at index 0.
     - positional_scores_15_data (list): Data for positional scores starting at index 15.
     - combined_data_csv (list): Combined and mapped sub-subregions data.
+    - append (bool, optional): Append the rows to files written before, e.g. for the next window of a sequence.
     """
     # Define file paths
     positional_scores_0_file = os.path.join(result_dir, "positional_scores_0.csv")
@@ -35,9 +52,9 @@ def write_processed_data(result_dir, positional_scores_0_data, positional_scores
     combined_data_file = os.path.join(result_dir, "combined_data.csv")
 
     # Write results to CSV files
-    write_results_to_csv(positional_scores_0_file, positional_scores_0_data, ['Sub-subregion', 'Mutations', 'Positional Score'])
-    write_results_to_csv(positional_scores_15_file, positional_scores_15_data, ['Sub-subregion', 'Mutations', 'Positional Score'])
-    write_results_to_csv(combined_data_file, combined_data_csv, ['Interval', 'Mutations', 'Average Score'])
+    write_results_to_csv(positional_scores_0_file, positional_scores_0_data, ['Sub-subregion', 'Mutations', 'Positional Score'], append)
+    write_results_to_csv(positional_scores_15_file, positional_scores_15_data, ['Sub-subregion', 'Mutations', 'Positional Score'], append)
+    write_results_to_csv(combined_data_file, combined_data_csv, ['Interval', 'Mutations', 'Average Score'], append)
 
 def write_region_data_to_csv(result_dir, region_details):
     """
@@ -95,3 +112,214 @@ def write_region_data_to_csv(result_dir, region_details):
     write_results_to_csv(region_scores_file, region_scores_data, [
         'Region Number', 'Region Range', 'Region Score'
     ])
+
+def write_region_hierarchy_to_csv(result_dir, region_hierarchy, chunk_size=None):
+    """
+    Write region details and region scores of a flat region hierarchy to CSV files in the specified result directory.
+
+    The files are identical to those written by write_region_data_to_csv for the same regions.
+
+    Args:
+    - result_dir (str): Path to the directory where the results will be stored.
+    - region_hierarchy (RegionHierarchy): Flat region hierarchy to write.
+    - chunk_size (int, optional): Write region details this many sub-subregions at a time, so the rows held
+      at once do not grow with the sequence length. Default writes them at once.
+    """
+    # Define file paths for region details and region scores
+    region_details_file = os.path.join(result_dir, "region_details.csv")
+    region_scores_file = os.path.join(result_dir, "region_scores.csv")
+
+    # Broadcast region and subregion ranges and scores to their sub-subregions
+    region_numbers, subregion_numbers, subsubregion_numbers = hierarchy_numbers(region_hierarchy)
+    subregion_index = region_hierarchy.subregion_index
+    region_index = region_hierarchy.region_index[subregion_index]
+    region_ranges = list(map(tuple, region_hierarchy.region_ranges.tolist()))
+    subregion_ranges = list(map(tuple, region_hierarchy.subregion_ranges.tolist()))
+
+    num_intervals = len(region_hierarchy.intervals)
+    chunk_size = chunk_size or max(1, num_intervals)
+    for chunk_start in range(0, max(1, num_intervals), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+
+        # Prepare the data for region details
+        region_details_data = list(zip(
+            region_numbers[chunk].tolist(),
+            [region_ranges[i] for i in region_index[chunk].tolist()],
+            region_hierarchy.region_scores[region_index[chunk]].tolist(),
+            subregion_numbers[chunk].tolist(),
+            [subregion_ranges[i] for i in subregion_index[chunk].tolist()],
+            region_hierarchy.subregion_scores[subregion_index[chunk]].tolist(),
+            subsubregion_numbers[chunk].tolist(),
+            map(tuple, region_hierarchy.intervals[chunk].tolist()),
+            region_hierarchy.scores[chunk].tolist()
+        ))
+
+        # Write region details to CSV
+        write_results_to_csv(region_details_file, region_details_data, [
+            'Region Number', 
+            'Region Range',
+            'Region Score',
+            'Subregion Number', 
+            'Subregion Range',
+            'Subregion Score',
+            'Subsubregion Number',
+            'Subsubregion Range',
+            'Subsubregion Score'
+        ], append=chunk_start > 0)
+
+    # Prepare the data for region scores
+    region_scores_data = list(zip(range(1, len(region_ranges) + 1), region_ranges, region_hierarchy.region_scores.tolist()))
+
+    # Write region scores to CSV
+    write_results_to_csv(region_scores_file, region_scores_data, [
+        'Region Number', 'Region Range', 'Region Score'
+    ])
+
+def write_columns(file_path, columns, output_format='csv'):
+    """
+    Write typed columns to a CSV, gzipped CSV or Parquet file.
+
+    CSV rows are formatted by pyarrow's multithreaded writer if it is installed, and by pandas otherwise.
+
+    Args:
+    - file_path (str): Path to the output file.
+    - columns (dict): Column names mapped to equal-length arrays.
+    - output_format (str): 'csv', 'csv.gz' or 'parquet'.
+    """
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
+
+    if output_format == 'parquet':
+        if pa is None:
+            raise ValueError("Writing parquet files requires pyarrow. Install it with: pip install pyarrow")
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table(columns), file_path)
+        return
+
+    f = gzip.open(file_path, 'wb', compresslevel=GZIP_COMPRESS_LEVEL) if output_format == 'csv.gz' else open(file_path, 'wb')
+    with f:
+        f.write((','.join(columns) + '\n').encode())
+        if pa is not None:
+            import pyarrow.csv as pa_csv
+            pa_csv.write_csv(pa.table(columns), f, pa_csv.WriteOptions(include_header=False))
+        else:
+            import pandas as pd
+            pd.DataFrame(columns).to_csv(f, index=False, header=False, mode='wb')
+
+def tiling_scores_columns(tiling_scores):
+    """
+    Typed columns of a set of scored sub-subregions.
+
+    Args:
+    - tiling_scores (TilingScores): Columnar scores of a set of sub-subregions.
+
+    Returns:
+    - dict: subsubregion_number, start, end, score and mutation_count columns.
+    """
+    subsubregions = tiling_scores.subsubregions.astype(np.int64, copy=False)
+    return {
+        'subsubregion_number': subsubregions[:, 0],
+        'start': subsubregions[:, 2],
+        'end': subsubregions[:, 3],
+        'score': tiling_scores.scores,
+        'mutation_count': tiling_scores.hi - tiling_scores.lo,
+    }
+
+def combined_scores_columns(combined_scores):
+    """
+    Typed columns of scored combined intervals.
+
+    Args:
+    - combined_scores (CombinedScores): Columnar combined intervals and scores.
+
+    Returns:
+    - dict: start, end, score and mutation_count columns.
+    """
+    intervals = combined_scores.intervals.astype(np.int64, copy=False)
+    return {
+        'start': intervals[:, 0],
+        'end': intervals[:, 1],
+        'score': combined_scores.scores,
+        'mutation_count': combined_scores.hi - combined_scores.lo,
+    }
+
+def region_hierarchy_columns(region_hierarchy):
+    """
+    Typed columns of a flat region hierarchy, with one row per sub-subregion and one row per region.
+
+    Args:
+    - region_hierarchy (RegionHierarchy): Flat region hierarchy.
+
+    Returns:
+    - tuple: (region_details_columns, region_scores_columns) dicts.
+    """
+    region_numbers, subregion_numbers, subsubregion_numbers = hierarchy_numbers(region_hierarchy)
+    subregion_index = region_hierarchy.subregion_index
+    region_index = region_hierarchy.region_index[subregion_index]
+    details_columns = {
+        'region_number': region_numbers,
+        'region_start': region_hierarchy.region_ranges[region_index, 0],
+        'region_end': region_hierarchy.region_ranges[region_index, 1],
+        'region_score': region_hierarchy.region_scores[region_index],
+        'subregion_number': subregion_numbers,
+        'subregion_start': region_hierarchy.subregion_ranges[subregion_index, 0],
+        'subregion_end': region_hierarchy.subregion_ranges[subregion_index, 1],
+        'subregion_score': region_hierarchy.subregion_scores[subregion_index],
+        'subsubregion_number': subsubregion_numbers,
+        'start': region_hierarchy.intervals[:, 0],
+        'end': region_hierarchy.intervals[:, 1],
+        'score': region_hierarchy.scores,
+    }
+    scores_columns = {
+        'region_number': np.arange(1, len(region_hierarchy.region_scores) + 1),
+        'start': region_hierarchy.region_ranges[:, 0],
+        'end': region_hierarchy.region_ranges[:, 1],
+        'score': region_hierarchy.region_scores,
+    }
+    return details_columns, scores_columns
+
+def write_result_columns(result_dir, scores_0, scores_15, combined_scores, region_hierarchy, output_format='csv'):
+    """
+    Write the results of an analysis as typed columns, one file per table, concurrently.
+
+    Files are named like the compatibility CSV files, with the extension of the output format.
+    Parquet writing and gzip compression release the GIL, so the tables are written by a thread pool.
+
+    Args:
+    - result_dir (str): Path to the directory where the results will be stored.
+    - scores_0 (TilingScores): Scores for sub-subregions starting at index 0.
+    - scores_15 (TilingScores): Scores for sub-subregions starting at index 15.
+    - combined_scores (CombinedScores): Scores of the combined intervals.
+    - region_hierarchy (RegionHierarchy): Flat region hierarchy of the combined intervals.
+    - output_format (str): 'csv', 'csv.gz' or 'parquet'.
+
+    Returns:
+    - list: Paths of the written files.
+    """
+    if output_format not in RESULT_FORMATS:
+        raise ValueError(f"Invalid output format: {output_format}. Choose one of {', '.join(OUTPUT_FORMATS)}.")
+
+    details_columns, scores_columns = region_hierarchy_columns(region_hierarchy)
+    tables = {
+        'positional_scores_0': tiling_scores_columns(scores_0),
+        'positional_scores_15': tiling_scores_columns(scores_15),
+        'combined_data': combined_scores_columns(combined_scores),
+        'region_details': details_columns,
+        'region_scores': scores_columns,
+    }
+
+    extension = RESULT_FORMATS[output_format]
+    file_paths = [os.path.join(result_dir, name + extension) for name in tables]
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        futures = [
+            executor.submit(write_columns, file_path, columns, output_format)
+            for file_path, columns in zip(file_paths, tables.values())
+        ]
+        for future in futures:
+            future.result()
+    return file_paths
@@ -0,0 +1,509 @@
+import os
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from src.data_processor import build_region_hierarchy, process_mutation_columns
+from src.mutation_file_reader import as_mutation_arrays, read_mutation_arrays, validate_mutation_arrays
+from src.result_writer import combined_scores_columns
+from src.tiling_cache import configure_tiling_cache, get_tiling
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# While workers are busy, requests arriving within the batch window are grouped by sequence length and scored together
+DEFAULT_BATCH_WINDOW = 0.002
+DEFAULT_MAX_BATCH_SIZE = 64
+
+# Largest accepted request body in bytes
+MAX_REQUEST_BYTES = 256 * 1024 * 1024
+
+ARROW_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+RESPONSE_TABLES = ['intervals', 'subregions', 'regions']
+
+HTTP_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    406: 'Not Acceptable',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+def init_worker(tiling_cache_dir=None, warm_lengths=()):
+    """
+    Configure the tiling cache of a scoring worker and build the tilings of the given lengths.
+
+    Args:
+    - tiling_cache_dir (str, optional): Directory of an on-disk tiling cache shared by the workers.
+    - warm_lengths (tuple): Sequence lengths to build tilings for up front.
+    """
+    if tiling_cache_dir:
+        configure_tiling_cache(cache_dir=tiling_cache_dir)
+    for seq_length in warm_lengths:
+        get_tiling(seq_length)
+
+def resolve_data_file(data_dir, file_name):
+    """
+    Resolve a client-supplied file name inside the service's data directory.
+
+    Args:
+    - data_dir (str): Directory the service may read mutation files from.
+    - file_name (str): File name relative to data_dir.
+
+    Returns:
+    - str: Real path of the file.
+
+    Raises:
+    - ValueError: If the path, after resolving '..' and symbolic links, is outside data_dir.
+    """
+    root = os.path.realpath(data_dir)
+    file_path = os.path.realpath(os.path.join(root, file_name))
+    if os.path.commonpath([root, file_path]) != root:
+        raise ValueError("Data error. 'mutation_file' must be a file inside the service's data directory.")
+    return file_path
+
+def parse_score_request(body, data_dir=None):
+    """
+    Parse the JSON body of a scoring request.
+
+    The body has a 'seq_length' and either 'positions' and 'impacts' lists or, if the service has a data
+    directory, the path of a 'mutation_file' in it readable by read_mutation_arrays.
+
+    Args:
+    - body (bytes): Request body.
+    - data_dir (str, optional): Directory of the mutation files clients may name; None accepts only inline mutations.
+
+    Returns:
+    - dict: Request with 'seq_length' and either 'mutations' ((positions, impacts) arrays) or 'mutation_file'
+      (the resolved path) and 'mutation_name' (the path as the client gave it).
+
+    Raises:
+    - ValueError: With the error message if the request is invalid.
+    """
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Parsing error. The request body must be JSON: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Parsing error. The request body must be a JSON object.")
+
+    seq_length = payload.get('seq_length')
+    if not isinstance(seq_length, int) or isinstance(seq_length, bool):
+        raise ValueError("Data type error. 'seq_length' must be an integer.")
+
+    if 'mutation_file' in payload:
+        # Clients must not read arbitrary server files, or probe them through the error messages
+        if data_dir is None:
+            raise ValueError("Parsing error. 'mutation_file' is disabled; send 'positions' and 'impacts' lists (or start the service with --data_dir).")
+        if not isinstance(payload['mutation_file'], str):
+            raise ValueError("Data type error. 'mutation_file' must be a string.")
+        return {'seq_length': seq_length, 'mutation_file': resolve_data_file(data_dir, payload['mutation_file']), 'mutation_name': payload['mutation_file']}
+
+    if 'positions' not in payload or 'impacts' not in payload:
+        raise ValueError("Parsing error. The request must contain 'positions' and 'impacts' lists.")
+    try:
+        positions = np.asarray(payload['positions'])
+        impacts = np.asarray(payload['impacts'])
+    except (TypeError, ValueError):
+        raise ValueError("Data type error. 'positions' and 'impacts' must be lists of numbers.")
+    if positions.ndim != 1 or positions.shape != impacts.shape:
+        raise ValueError("Data error. 'positions' and 'impacts' must be lists of the same length.")
+    if not len(positions):
+        positions, impacts = positions.astype(np.int64), impacts.astype(np.float64)
+    error = validate_mutation_arrays(positions, impacts)
+    if error:
+        raise ValueError(error)
+    return {'seq_length': seq_length, 'mutations': as_mutation_arrays(positions, impacts)}
+
+def score_request(request):
+    """
+    Score one parsed request into interval, subregion and region tables.
+
+    Args:
+    - request (dict): Request from parse_score_request.
+
+    Returns:
+    - dict: 'intervals', 'subregions' and 'regions' tables, each a dict of column arrays.
+
+    Raises:
+    - ValueError: With the error message if scoring fails.
+    """
+    mutations = request.get('mutations')
+    if mutations is None:
+        mutations = read_mutation_arrays(request['mutation_file'])
+        if isinstance(mutations, str):
+            # Report the file by the client's name, not by its path on the server
+            raise ValueError(mutations.replace(request['mutation_file'], request['mutation_name']))
+
+    _, _, combined_scores = process_mutation_columns(mutations, request['seq_length'])
+    region_hierarchy = build_region_hierarchy(combined_scores.intervals, combined_scores.scores)
+
+    intervals = combined_scores_columns(combined_scores)
+    intervals['subregion'] = region_hierarchy.subregion_index
+    return {
+        'intervals': intervals,
+        'subregions': {
+            'start': region_hierarchy.subregion_ranges[:, 0],
+            'end': region_hierarchy.subregion_ranges[:, 1],
+            'score': region_hierarchy.subregion_scores,
+            'region': region_hierarchy.region_index,
+        },
+        'regions': {
+            'start': region_hierarchy.region_ranges[:, 0],
+            'end': region_hierarchy.region_ranges[:, 1],
+            'score': region_hierarchy.region_scores,
+        },
+    }
+
+def score_batch(requests):
+    """
+    Score a batch of requests in one worker task and encode their response bodies.
+
+    Encoding in the worker keeps the service process free to accept and route requests.
+
+    Args:
+    - requests (list): Requests from parse_score_request, usually of one sequence length.
+
+    Returns:
+    - list: (status, content_type, body) response of each request.
+    """
+    results = []
+    for request in requests:
+        try:
+            results.append(encode_response(request, score_request(request)))
+        except ValueError as e:
+            results.append((400, 'application/json', json.dumps({'error': str(e)}).encode()))
+    return results
+
+def encode_response(request, tables):
+    """
+    Encode scored tables in the format asked for by a request.
+
+    Args:
+    - request (dict): Request from parse_score_request, with the 'format' and 'table' set by route_request.
+    - tables (dict): Tables from score_request.
+
+    Returns:
+    - tuple: (status, content_type, body) of the response.
+    """
+    if request.get('format') == 'arrow':
+        try:
+            return 200, ARROW_CONTENT_TYPE, table_to_arrow(tables[request['table']])
+        except ValueError as e:
+            return 406, 'application/json', json.dumps({'error': str(e)}).encode()
+    return 200, 'application/json', tables_to_json(request['seq_length'], tables)
+
+def tables_to_json(seq_length, tables):
+    """
+    Encode scored tables as a JSON response body.
+
+    Args:
+    - seq_length (int): Length of the sequence.
+    - tables (dict): Tables from score_request.
+
+    Returns:
+    - bytes: JSON object with 'seq_length' and one object of column lists per table.
+    """
+    payload = {'seq_length': seq_length}
+    for name, columns in tables.items():
+        payload[name] = {column: values.tolist() for column, values in columns.items()}
+    return json.dumps(payload).encode()
+
+def table_to_arrow(columns):
+    """
+    Encode one scored table as an Arrow IPC stream.
+
+    Args:
+    - columns (dict): Column arrays of the table.
+
+    Returns:
+    - bytes: Arrow IPC stream with a single record batch.
+
+    Raises:
+    - ValueError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Arrow responses require pyarrow. Install it with: pip install pyarrow")
+
+    batch = pa.record_batch(list(columns.values()), names=list(columns))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as stream:
+        stream.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+async def score_group(executor, group):
+    """
+    Score a group of queued requests in the worker pool and resolve their futures.
+
+    Args:
+    - executor (Executor): Worker pool.
+    - group (list): (request, future) pairs.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        results = await loop.run_in_executor(executor, score_batch, [request for request, _ in group])
+    except Exception as e:
+        results = [(500, 'application/json', json.dumps({'error': str(e)}).encode())] * len(group)
+    for (_, future), result in zip(group, results):
+        if not future.done():
+            future.set_result(result)
+
+async def run_batches(queue, executor, batch_window=DEFAULT_BATCH_WINDOW, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """
+    Collect queued requests and score them in groups of one sequence length.
+
+    An idle service scores a request as soon as it arrives. While earlier batches are still being scored,
+    requests arriving within batch_window seconds of the first one are batched together.
+
+    Args:
+    - queue (asyncio.Queue): Queue of (request, future) pairs.
+    - executor (Executor): Worker pool.
+    - batch_window (float): Seconds to wait for more requests after the first one of a batch.
+    - max_batch_size (int): Maximum number of requests per batch.
+    """
+    loop = asyncio.get_running_loop()
+    pending = set()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + batch_window if pending else loop.time()
+        while len(batch) < max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Each worker task scores one sequence length, so it reuses one cached tiling
+        groups = {}
+        for request, future in batch:
+            groups.setdefault(request['seq_length'], []).append((request, future))
+        for group in groups.values():
+            task = asyncio.ensure_future(score_group(executor, group))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+async def read_http_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    Args:
+    - reader (asyncio.StreamReader): Connection reader.
+
+    Returns:
+    - tuple: (method, path, query, headers, body), or None when the connection is closed.
+
+    Raises:
+    - ValueError: With an (HTTP status, message) pair if the request is malformed or too large.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise ValueError(400, "Malformed request line.")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    # Bodies are only read with an explicit length; requests without a body (GET) may omit it
+    if 'content-length' not in headers and method.upper() == 'POST':
+        raise ValueError(400, "POST requests need a Content-Length header.")
+    try:
+        content_length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise ValueError(400, "Content-Length must be a non-negative integer.")
+    if content_length < 0:
+        raise ValueError(400, "Content-Length must be a non-negative integer.")
+    if content_length > MAX_REQUEST_BYTES:
+        raise ValueError(413, f"Request bodies are limited to {MAX_REQUEST_BYTES} bytes.")
+    body = await reader.readexactly(content_length) if content_length else b''
+
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return method.upper(), url.path, query, headers, body
+
+def http_response(status, content_type, body, keep_alive=True):
+    """
+    Build an HTTP/1.1 response.
+
+    Args:
+    - status (int): HTTP status code.
+    - content_type (str): Content type of the body.
+    - body (bytes): Response body.
+    - keep_alive (bool): Whether the connection stays open.
+
+    Returns:
+    - bytes: The response.
+    """
+    head = (
+        f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+def json_response(status, payload, keep_alive=True):
+    """
+    Build an HTTP/1.1 JSON response.
+
+    Args:
+    - status (int): HTTP status code.
+    - payload (dict): Object to encode.
+    - keep_alive (bool): Whether the connection stays open.
+
+    Returns:
+    - bytes: The response.
+    """
+    return http_response(status, 'application/json', json.dumps(payload).encode(), keep_alive)
+
+async def route_request(queue, method, path, query, headers, body, data_dir=None):
+    """
+    Handle one request: GET /health or POST /score.
+
+    POST /score answers with JSON by default, or with one table (?table=intervals, subregions or regions)
+    as an Arrow IPC stream if ?format=arrow is given or the Accept header asks for it.
+
+    Args:
+    - queue (asyncio.Queue): Queue of (request, future) pairs of the batcher.
+    - method (str): HTTP method.
+    - path (str): Request path.
+    - query (dict): Query parameters.
+    - headers (dict): Lower-case request headers.
+    - body (bytes): Request body.
+    - data_dir (str, optional): Directory of the mutation files clients may name (see parse_score_request).
+
+    Returns:
+    - tuple: (status, content_type, body) of the response.
+    """
+    if path == '/health':
+        return 200, 'application/json', json.dumps({'status': 'ok', 'queued': queue.qsize()}).encode()
+    if path != '/score':
+        return 404, 'application/json', json.dumps({'error': f"Unknown path: {path}"}).encode()
+    if method != 'POST':
+        return 405, 'application/json', json.dumps({'error': "Use POST /score."}).encode()
+
+    arrow = query.get('format') == 'arrow' or ARROW_CONTENT_TYPE in headers.get('accept', '')
+    table = query.get('table', 'intervals')
+    if arrow and table not in RESPONSE_TABLES:
+        return 400, 'application/json', json.dumps({'error': f"Unknown table: {table}. Choose one of {', '.join(RESPONSE_TABLES)}."}).encode()
+
+    try:
+        request = parse_score_request(body, data_dir)
+    except ValueError as e:
+        return 400, 'application/json', json.dumps({'error': str(e)}).encode()
+
+    request['format'], request['table'] = ('arrow' if arrow else 'json'), table
+    future = asyncio.get_running_loop().create_future()
+    await queue.put((request, future))
+    return await future
+
+async def handle_connection(reader, writer, queue, data_dir=None):
+    """
+    Serve the requests of one keep-alive connection.
+
+    Args:
+    - reader (asyncio.StreamReader): Connection reader.
+    - writer (asyncio.StreamWriter): Connection writer.
+    - queue (asyncio.Queue): Queue of (request, future) pairs of the batcher.
+    - data_dir (str, optional): Directory of the mutation files clients may name (see parse_score_request).
+    """
+    try:
+        while True:
+            try:
+                request = await read_http_request(reader)
+            except ValueError as e:
+                status, message = e.args
+                writer.write(json_response(status, {'error': message}, keep_alive=False))
+                break
+            if request is None:
+                break
+
+            method, path, query, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            try:
+                status, content_type, response_body = await route_request(queue, method, path, query, headers, body, data_dir)
+            except Exception as e:
+                status, content_type, response_body = 500, 'application/json', json.dumps({'error': str(e)}).encode()
+            writer.write(http_response(status, content_type, response_body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        # Answer unexpected failures instead of dropping the connection without a response
+        writer.write(json_response(500, {'error': str(e)}, keep_alive=False))
+    finally:
+        writer.close()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, workers=None, tiling_cache_dir=None, warm_lengths=(),
+                batch_window=DEFAULT_BATCH_WINDOW, max_batch_size=DEFAULT_MAX_BATCH_SIZE, data_dir=None):
+    """
+    Run the scoring service until it is cancelled.
+
+    Args:
+    - host (str): Host to listen on.
+    - port (int): TCP port to listen on.
+    - socket_path (str, optional): Unix socket to listen on instead of host and port.
+    - workers (int, optional): Number of worker processes; 0 scores in a thread of the service process. Default is one per CPU.
+    - tiling_cache_dir (str, optional): Directory of an on-disk tiling cache shared by the workers.
+    - warm_lengths (tuple): Sequence lengths whose tilings are built before the first request.
+    - batch_window (float): Seconds to wait for more requests after the first one of a batch.
+    - max_batch_size (int): Maximum number of requests per batch.
+    - data_dir (str, optional): Directory clients may name mutation files in; None accepts only inline mutations.
+    """
+    # Warm the tilings here, so forked workers inherit them, and again in each worker for spawned ones
+    init_worker(tiling_cache_dir, tuple(warm_lengths))
+    if workers == 0:
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(tiling_cache_dir, tuple(warm_lengths)))
+
+    queue = asyncio.Queue()
+    batcher = asyncio.ensure_future(run_batches(queue, executor, batch_window, max_batch_size))
+
+    async def handler(reader, writer):
+        await handle_connection(reader, writer, queue, data_dir)
+
+    if socket_path:
+        server = await asyncio.start_unix_server(handler, path=socket_path)
+        print(f"Serving on unix socket {socket_path}")
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        print(f"Serving on http://{host}:{port}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+        executor.shutdown(cancel_futures=True)
+
+def run_service(**kwargs):
+    """
+    Run the scoring service in the foreground until interrupted.
+
+    Args:
+    - **kwargs: Arguments of serve.
+    """
+    try:
+        asyncio.run(serve(**kwargs))
+    except KeyboardInterrupt:
+        pass
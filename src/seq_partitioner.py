@@ -1,56 +1,194 @@
+from collections import namedtuple
+import numpy as np
 
-def partition_seq_length(seq_length):
+# Longest supported sequence; keeps positions and end + 1 boundaries within int32
+MAX_SEQ_LENGTH = 2 ** 30
+
+# Default window length (bp) for window-by-window processing
+DEFAULT_WINDOW_LENGTH = 3_000_000
+
+# Geometry of the tilings and of their grouping into the region hierarchy:
+# - step: length of the sub-subregions (bp).
+# - offset: start of the second set of sub-subregions (bp); it ends offset bp before the end of the sequence.
+# - max_length: length of sub-subregions above which another one is cut, so the last one takes up to max_length bp.
+# - subsubregions_per_subregion: number of combined intervals per subregion.
+# - subregions_per_region: number of regions the subregions are split into.
+TilingGeometry = namedtuple('TilingGeometry', ['step', 'offset', 'max_length', 'subsubregions_per_subregion', 'subregions_per_region'])
+DEFAULT_GEOMETRY = TilingGeometry(30, 15, 45, 20, 10)
+
+def validate_geometry(geometry):
+    """
+    Validate a tiling geometry.
+
+    Args:
+    - geometry (TilingGeometry): Geometry to validate.
+
+    Raises:
+    - ValueError: If the sub-subregions would not tile the sequence or the groups would be empty.
+    """
+    if geometry.step < 1 or not 0 <= geometry.offset < geometry.step:
+        raise ValueError(f"Error: The step must be positive and the offset between 0 and step - 1. Received step {geometry.step}, offset {geometry.offset}")
+    if not geometry.step <= geometry.max_length or 2 * geometry.offset >= geometry.max_length:
+        raise ValueError(f"Error: The maximum sub-subregion length must be at least the step and more than twice the offset. Received {geometry.max_length}")
+    if geometry.subsubregions_per_subregion < 1 or geometry.subregions_per_region < 1:
+        raise ValueError("Error: Subregions and regions must each group at least one item.")
+
+def partition_geometry(geometry):
+    """
+    The part of a geometry that determines the tilings.
+
+    Args:
+    - geometry (TilingGeometry): Tiling geometry.
+
+    Returns:
+    - tuple: (step, offset, max_length).
+    """
+    return geometry.step, geometry.offset, geometry.max_length
+
+def validate_seq_length(seq_length, geometry=DEFAULT_GEOMETRY):
+    """
+    Validate a sequence length before partitioning.
+
+    Args:
+    - seq_length (int): Length of sequence to partition.
+    - geometry (TilingGeometry, optional): Tiling geometry; sequences must be at least max_length long.
+    """
+    if not isinstance(seq_length, int):
+        raise ValueError(f"Error: Sequence length must be an integer. Received: {seq_length}")
+
+    if seq_length < geometry.max_length or seq_length > MAX_SEQ_LENGTH:
+        raise ValueError(f"Error: Sequence length must be between {geometry.max_length} and {MAX_SEQ_LENGTH}. You entered {seq_length}")
+
+def as_subsubregion_array(subsubregions):
+    """
+    View sub-subregions as an (n, 4) integer array, keeping the dtype of arrays that are already integer.
+
+    Args:
+    - subsubregions (list of lists or np.ndarray): [subsubregion_number, length, start_index, end_index] rows.
+
+    Returns:
+    - np.ndarray: (n, 4) integer array of sub-subregions.
+    """
+    if isinstance(subsubregions, np.ndarray) and np.issubdtype(subsubregions.dtype, np.integer):
+        return subsubregions.reshape(-1, 4)
+    return np.asarray(subsubregions, dtype=np.int64).reshape(-1, 4)
+
+def count_subsubregions(length, geometry=DEFAULT_GEOMETRY):
+    """
+    Count the sub-subregions of a stretch of sequence: step bp each (30 by default), with a final one of up to
+    max_length bp (45 by default).
+
+    Args:
+    - length (int): Length of the stretch to partition.
+    - geometry (TilingGeometry, optional): Tiling geometry.
+
+    Returns:
+    - int: Number of sub-subregions.
+    """
+    # Full step bp sub-subregions are cut while more than max_length bp remain
+    return max(0, -(-(length - geometry.max_length) // geometry.step)) + 1
+
+def tile_subsubregions(length, start_index, first=0, last=None, geometry=DEFAULT_GEOMETRY):
+    """
+    Build a range of the sub-subregions of a stretch of sequence as an int32 array.
+
+    Args:
+    - length (int): Length of the stretch to partition.
+    - start_index (int): Sequence index where the stretch starts.
+    - first (int, optional): Index of the first sub-subregion to build. Default is 0.
+    - last (int, optional): Index after the last sub-subregion to build. Default is all of them.
+    - geometry (TilingGeometry, optional): Tiling geometry.
+
+    Returns:
+    - np.ndarray: (n, 4) int32 array of [subsubregion_number, length, start_index, end_index] rows.
+    """
+    step = geometry.step
+    count = count_subsubregions(length, geometry)
+    last = count if last is None else min(last, count)
+    indices = np.arange(first, last, dtype=np.int32)
+
+    subsubregions = np.empty((len(indices), 4), dtype=np.int32)
+    subsubregions[:, 0] = indices + 1
+    subsubregions[:, 1] = step
+    subsubregions[:, 2] = start_index + step * indices
+
+    # The last sub-subregion takes the remaining bp (16-45 by default)
+    if last == count and len(indices):
+        subsubregions[-1, 1] = length - step * (count - 1)
+    subsubregions[:, 3] = subsubregions[:, 2] + subsubregions[:, 1] - 1
+    return subsubregions
+
+def partition_seq_length_arrays(seq_length, geometry=DEFAULT_GEOMETRY):
+    """
+    Partition a given sequence length into sub-subregions, as compact int32 arrays.
+
+    Args:
+    - seq_length (int): Length of sequence to partition.
+    - geometry (TilingGeometry, optional): Tiling geometry.
+
+    Returns:
+    - subsubregions_0 (np.ndarray): (n, 4) array of sub-subregions starting from index 0.
+    - subsubregions_15 (np.ndarray): (n, 4) array of sub-subregions starting from index 15 (the geometry's offset).
+    """
+    validate_geometry(geometry)
+    validate_seq_length(seq_length, geometry)
+
+    subsubregions_0 = tile_subsubregions(seq_length, 0, geometry=geometry)
+    if seq_length <= geometry.max_length:
+        subsubregions_15 = tile_subsubregions(seq_length, 0, geometry=geometry)
+    else:
+        subsubregions_15 = tile_subsubregions(seq_length - 2 * geometry.offset, geometry.offset, geometry=geometry)
+    return subsubregions_0, subsubregions_15
+
+def partition_seq_length(seq_length, geometry=DEFAULT_GEOMETRY):
     """
     Partition a given sequence length into sub-subregions for further analysis.
 
     Args:
     - seq_length (int): Length of sequence to partition.
+    - geometry (TilingGeometry, optional): Tiling geometry.
 
     Returns:
     - subsubregions_0 (list): List of sub-subregions starting from index 0.
     - subsubregions_15 (list): List of sub-subregions starting from index 15.
     """
-    
-    if not isinstance(seq_length, int):
-        raise ValueError(f"Error: Sequence length must be an integer. Received: {seq_length}")
-    
-    if seq_length < 45 or seq_length > 100000:
-        raise ValueError(f"Error: Sequence length must be between 45 and 100000. You entered {seq_length}")
-
-    # Initialize lists to store sub-subregions
-    subsubregions_0 = []
-    subsubregions_15 = []
-
-    # Process for sub-subregions starting at index 0
-    remaining_seq_length = seq_length
-    start_index = 0
-    subsubregion_number = 1
-    while remaining_seq_length > 0:
-        if remaining_seq_length <= 45:
-            subsubregions_0.append([subsubregion_number, remaining_seq_length, start_index, start_index + remaining_seq_length - 1])
-            break
+    subsubregions_0, subsubregions_15 = partition_seq_length_arrays(seq_length, geometry)
+    return subsubregions_0.tolist(), subsubregions_15.tolist()
+
+def iter_partition_windows(seq_length, window_length=DEFAULT_WINDOW_LENGTH, geometry=DEFAULT_GEOMETRY):
+    """
+    Lazily partition a sequence window by window, so only one window of sub-subregions is held at a time.
+
+    Windows start and end on boundaries of the sub-subregions starting at index 0, which are also
+    boundaries of the combined intervals.
+
+    Args:
+    - seq_length (int): Length of sequence to partition.
+    - window_length (int, optional): Approximate window length in bp, rounded down to a multiple of the step.
+    - geometry (TilingGeometry, optional): Tiling geometry.
+
+    Yields:
+    - tuple: (window_start, window_end, subsubregions_0, subsubregions_15), where the arrays hold every
+      sub-subregion of each partition that overlaps [window_start, window_end].
+    """
+    validate_geometry(geometry)
+    validate_seq_length(seq_length, geometry)
+    step, offset = geometry.step, geometry.offset
+
+    subsubregions_per_window = max(1, window_length // step)
+    count_0 = count_subsubregions(seq_length, geometry)
+    for first in range(0, count_0, subsubregions_per_window):
+        subsubregions_0 = tile_subsubregions(seq_length, 0, first, first + subsubregions_per_window, geometry)
+        window_start, window_end = int(subsubregions_0[0, 2]), int(subsubregions_0[-1, 3])
+
+        if seq_length <= geometry.max_length:
+            subsubregions_15 = tile_subsubregions(seq_length, 0, geometry=geometry)
         else:
-            subsubregions_0.append([subsubregion_number, 30, start_index, start_index + 29])
-            remaining_seq_length -= 30
-            start_index += 30
-            subsubregion_number += 1
-
-    # Process for sub-subregions starting at index 15
-    if seq_length <= 45:
-        subsubregions_15.append([1, seq_length, 0, seq_length - 1])
-    else:
-        remaining_seq_length = seq_length - 30
-        start_index = 15
-        subsubregion_number = 1
-        while remaining_seq_length > 0:
-            if remaining_seq_length <= 45:
-                subsubregions_15.append([subsubregion_number, remaining_seq_length, start_index, start_index + remaining_seq_length - 1])
-                break
-            else:
-                subsubregions_15.append([subsubregion_number, 30, start_index, start_index + 29])
-                remaining_seq_length -= 30
-                start_index += 30
-                subsubregion_number += 1
-    # Return the partitioned sub-subregions
-
-    return subsubregions_0, subsubregions_15
\ No newline at end of file
+            # Sub-subregions starting at index 15 (the offset) that overlap the window
+            count_15 = count_subsubregions(seq_length - 2 * offset, geometry)
+            first_15 = min(max(0, (window_start - offset) // step), count_15 - 1)
+            last_15 = min(max(0, (window_end - offset) // step), count_15 - 1) + 1
+            subsubregions_15 = tile_subsubregions(seq_length - 2 * offset, offset, first_15, last_15, geometry)
+            subsubregions_15 = subsubregions_15[(subsubregions_15[:, 3] >= window_start) & (subsubregions_15[:, 2] <= window_end)]
+
+        yield window_start, window_end, subsubregions_0, subsubregions_15
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS is not reported
+    resource = None
+
+# File names of the profile report and of the optional cProfile dump, in the result directory
+PROFILE_REPORT = 'profile.json'
+CPROFILE_DUMP = 'profile.pstats'
+
+# Metrics of one stage of an analysis:
+# - stage: stage name; wall_time, cpu_time: seconds (cpu_time includes finished child processes such as plot workers).
+# - peak_rss: peak resident set size of the process so far, at the end of the stage, in bytes (None if unavailable).
+# - peak_traced: peak Python memory allocated during the stage above what was allocated at its start, in bytes,
+#   if tracemalloc is tracing (else None).
+# - counts: items handled by the stage, e.g. {'mutations': ...}.
+# - error: 'ExceptionType: message' if the stage failed, else None.
+StageMetrics = namedtuple('StageMetrics', ['stage', 'wall_time', 'cpu_time', 'peak_rss', 'peak_traced', 'counts', 'error'])
+
+# Metrics of a whole analysis: its StageMetrics, their total wall and CPU time, the highest peaks, the counts
+# of all stages and the first error.
+AnalysisMetrics = namedtuple('AnalysisMetrics', ['stages', 'wall_time', 'cpu_time', 'peak_rss', 'peak_traced', 'counts', 'error'])
+
+_settings = {'trace_memory': False, 'cprofile': False}
+
+def configure_profiling(trace_memory=None, cprofile=None):
+    """
+    Configure what run_profiled records besides wall time, CPU time and peak RSS.
+
+    Args:
+    - trace_memory (bool, optional): Trace Python allocations with tracemalloc for per-stage peaks (slows the analysis down).
+    - cprofile (bool, optional): Dump cProfile statistics of the analysis to CPROFILE_DUMP.
+    """
+    if trace_memory is not None:
+        _settings['trace_memory'] = trace_memory
+    if cprofile is not None:
+        _settings['cprofile'] = cprofile
+
+def cpu_time():
+    """
+    CPU time of the process and of its finished child processes, in seconds.
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def peak_rss():
+    """
+    Peak resident set size of the process, in bytes, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+@contextmanager
+def profile_stage(metrics, stage):
+    """
+    Measure one stage of an analysis. Stages must not be nested.
+
+    Args:
+    - metrics (list or None): StageMetrics of the stages so far; the stage is appended when it ends, even if it fails.
+      None measures nothing.
+    - stage (str): Stage name.
+
+    Yields:
+    - dict: Counts of the stage, filled in by the caller.
+    """
+    counts = {}
+    if metrics is None:
+        yield counts
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        start_traced = tracemalloc.get_traced_memory()[0]
+    start_wall, start_cpu = time.perf_counter(), cpu_time()
+    error = None
+    try:
+        yield counts
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        metrics.append(StageMetrics(
+            stage, time.perf_counter() - start_wall, cpu_time() - start_cpu, peak_rss(),
+            tracemalloc.get_traced_memory()[1] - start_traced if tracing else None, {name: int(count) for name, count in counts.items()}, error
+        ))
+
+def summarize_metrics(stages):
+    """
+    Combine the metrics of the stages of an analysis.
+
+    Args:
+    - stages (list): StageMetrics of each stage, in order.
+
+    Returns:
+    - AnalysisMetrics: The stages with their totals and peaks.
+    """
+    def peak(values):
+        values = [value for value in values if value is not None]
+        return max(values) if values else None
+
+    counts = {}
+    for stage in stages:
+        counts.update(stage.counts)
+    errors = [stage.error for stage in stages if stage.error is not None]
+    return AnalysisMetrics(
+        list(stages), sum(stage.wall_time for stage in stages), sum(stage.cpu_time for stage in stages),
+        peak(stage.peak_rss for stage in stages), peak(stage.peak_traced for stage in stages), counts, errors[0] if errors else None
+    )
+
+def write_profile_report(file_path, analysis_metrics, info=None):
+    """
+    Write the metrics of an analysis to a JSON file.
+
+    Args:
+    - file_path (str): Path of the JSON report.
+    - analysis_metrics (AnalysisMetrics): Metrics to write.
+    - info (dict, optional): Description of the analysis, e.g. its input file and sequence length.
+    """
+    report = {
+        'info': info or {},
+        'total': {field: value for field, value in analysis_metrics._asdict().items() if field != 'stages'},
+        'stages': [stage._asdict() for stage in analysis_metrics.stages],
+    }
+    with open(file_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def run_profiled(function, args, result_dir, info=None):
+    """
+    Call function(*args, metrics=stages) and write its profile report (and cProfile dump) to result_dir.
+
+    The report is written even if the analysis raises, with the exception as its error, and the exception is re-raised.
+
+    Args:
+    - function (callable): Analysis taking a metrics list of StageMetrics, e.g. run_ecmpia_analysis.
+    - args (tuple): Positional arguments of the analysis.
+    - result_dir (str): Directory of PROFILE_REPORT and CPROFILE_DUMP.
+    - info (dict, optional): Description of the analysis written to the report.
+
+    Returns:
+    - tuple: (result of the analysis, AnalysisMetrics).
+    """
+    stages = []
+    tracing = _settings['trace_memory'] and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler = None
+    if _settings['cprofile']:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    error = None
+    try:
+        result = function(*args, metrics=stages)
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if tracing:
+            tracemalloc.stop()
+
+        analysis_metrics = summarize_metrics(stages)
+        if error is not None and analysis_metrics.error is None:
+            # The analysis failed outside of its stages
+            analysis_metrics = analysis_metrics._replace(error=error)
+        os.makedirs(result_dir, exist_ok=True)
+        write_profile_report(os.path.join(result_dir, PROFILE_REPORT), analysis_metrics, info)
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(result_dir, CPROFILE_DUMP))
+    return result, analysis_metrics
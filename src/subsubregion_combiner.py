@@ -1,5 +1,13 @@
-from collections import defaultdict
-from src.mutation_and_weight_assignor import assign_mutations
+from collections import defaultdict, namedtuple
+import numpy as np
+
+# Columnar combined intervals:
+# - intervals: (n, 2) int64 array of [start, end] rows.
+# - lo, hi: offsets into the unique mutations; order[lo[i]:hi[i]] are the mutations of interval i.
+# - scores: normalized impact score per interval.
+# - positions, impacts, order: the shared mutation arrays (input order) and the sort order of their
+#   unique (position, impact) pairs.
+CombinedScores = namedtuple('CombinedScores', ['intervals', 'lo', 'hi', 'scores', 'positions', 'impacts', 'order'])
 
 def extract_boundaries(subsubregions):
     """
@@ -51,13 +59,13 @@ def map_subsubregions_to_intervals(subsubregions):
         interval_dict[(sub_start, sub_end)].append(sub)
     return interval_dict
 
-def calculate_overlap_and_combine(interval, interval_dict):
+def combine_overlapping_subsubregions(interval, overlapping_subsubregions):
     """
-    Calculate overlap and combine mutations and impact scores for an interval.
+    Combine mutations and impact scores of the sub-subregions overlapping an interval.
 
     Args:
     - interval (tuple): Interval represented as (start, end).
-    - interval_dict (dict): Dictionary mapping intervals to sub-subregions.
+    - overlapping_subsubregions (iterable): (sub_start, sub_end, sub) for each sub-subregion overlapping the interval.
 
     Returns:
     - tuple: Combined interval data including mutations and normalized impact scores.
@@ -66,20 +74,20 @@ def calculate_overlap_and_combine(interval, interval_dict):
     total_impact_score = 0
     total_length = 0
     combined_mutations = []
+    seen_mutations = set()
 
-    for (sub_start, sub_end), subs in interval_dict.items():
-        if sub_end >= start and sub_start <= end:
-            for sub in subs:
-                overlap_start = max(start, sub_start)
-                overlap_end = min(end, sub_end)
-                overlap_length = overlap_end - overlap_start + 1
-                impact_score = sum(mutation[1] for mutation in sub[1])
-                total_impact_score += impact_score * overlap_length
-                total_length += overlap_length
-                for mutation in sub[1]:
-                    if overlap_start <= mutation[0] <= overlap_end:
-                        if mutation not in combined_mutations:
-                            combined_mutations.append(mutation)
+    for sub_start, sub_end, sub in overlapping_subsubregions:
+        overlap_start = max(start, sub_start)
+        overlap_end = min(end, sub_end)
+        overlap_length = overlap_end - overlap_start + 1
+        impact_score = sum(mutation[1] for mutation in sub[1])
+        total_impact_score += impact_score * overlap_length
+        total_length += overlap_length
+        for mutation in sub[1]:
+            if overlap_start <= mutation[0] <= overlap_end:
+                if mutation not in seen_mutations:
+                    seen_mutations.add(mutation)
+                    combined_mutations.append(mutation)
 
     if total_length > 0:
         normalized_impact_score = total_impact_score / total_length
@@ -88,6 +96,53 @@ def calculate_overlap_and_combine(interval, interval_dict):
 
     return (interval, combined_mutations, normalized_impact_score)
 
+def calculate_overlap_and_combine(interval, interval_dict):
+    """
+    Calculate overlap and combine mutations and impact scores for an interval.
+
+    Args:
+    - interval (tuple): Interval represented as (start, end).
+    - interval_dict (dict): Dictionary mapping intervals to sub-subregions.
+
+    Returns:
+    - tuple: Combined interval data including mutations and normalized impact scores.
+    """
+    start, end = interval
+    overlapping_subsubregions = [
+        (sub_start, sub_end, sub)
+        for (sub_start, sub_end), subs in interval_dict.items()
+        if sub_end >= start and sub_start <= end
+        for sub in subs
+    ]
+    return combine_overlapping_subsubregions(interval, overlapping_subsubregions)
+
+def sweep_overlapping_subsubregions(combined_intervals, *subsubregion_sets):
+    """
+    Find the sub-subregions overlapping each combined interval with one pointer per set of sub-subregions.
+
+    Args:
+    - combined_intervals (list): Combined intervals sorted by start.
+    - *subsubregion_sets (list): Sets of sub-subregions, each sorted by start and non-overlapping.
+
+    Yields:
+    - list: (sub_start, sub_end, sub) for the sub-subregions overlapping each interval, in set order.
+    """
+    pointers = [0] * len(subsubregion_sets)
+    for start, end in combined_intervals:
+        overlapping_subsubregions = []
+        for n, subs in enumerate(subsubregion_sets):
+            # Skip sub-subregions that end before this interval
+            i = pointers[n]
+            while i < len(subs) and subs[i][0][3] < start:
+                i += 1
+            pointers[n] = i
+
+            # Collect sub-subregions that start before the interval ends
+            while i < len(subs) and subs[i][0][2] <= end:
+                overlapping_subsubregions.append((subs[i][0][2], subs[i][0][3], subs[i]))
+                i += 1
+        yield overlapping_subsubregions
+
 def combine_and_map_mutations(subsubregions1, subsubregions2):
     """
     Combine and map mutations and impact scores for two sets of sub-subregions.
@@ -107,13 +162,150 @@ def combine_and_map_mutations(subsubregions1, subsubregions2):
     # Create combined intervals
     combined_intervals = create_combined_intervals(sorted_boundaries)
 
-    # Map subsubregions to intervals
-    subsubregions = subsubregions1 + subsubregions2
-    interval_dict = map_subsubregions_to_intervals(subsubregions)
-
-    # Calculate overlap and combine mutations for each interval
+    # Sweep both sets of sub-subregions along the combined intervals and combine their mutations
     mapped_data = []
-    for interval in combined_intervals:
-        mapped_data.append(calculate_overlap_and_combine(interval, interval_dict))
+    overlaps = sweep_overlapping_subsubregions(combined_intervals, subsubregions1, subsubregions2)
+    for interval, overlapping_subsubregions in zip(combined_intervals, overlaps):
+        mapped_data.append(combine_overlapping_subsubregions(interval, overlapping_subsubregions))
+
+    return mapped_data
+
+def unique_mutation_order(positions, impacts):
+    """
+    Sort the first occurrence of every distinct (position, impact) pair by position.
+
+    Args:
+    - positions (np.ndarray): Mutation positions in input order.
+    - impacts (np.ndarray): Mutation impact scores in input order.
+
+    Returns:
+    - tuple: (sorted_positions, order) of the unique mutations, where order holds their input indices.
+    """
+    order = np.lexsort((np.arange(len(positions)), impacts, positions))
+    sorted_positions = positions[order]
+    sorted_impacts = impacts[order]
+
+    # Keep the first (lowest input index) of each run of equal (position, impact) pairs
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (sorted_positions[1:] != sorted_positions[:-1]) | (sorted_impacts[1:] != sorted_impacts[:-1])
+    return sorted_positions[first], order[first]
+
+def covering_subsubregions(subsubregions, starts):
+    """
+    Find the sub-subregion of a set that covers each interval start.
+
+    Args:
+    - subsubregions (np.ndarray): (n, 4) array of sorted, non-overlapping sub-subregions.
+    - starts (np.ndarray): Interval starts.
 
+    Returns:
+    - tuple: (indices, covered) arrays; covered is False where no sub-subregion contains the start.
+    """
+    if not len(subsubregions):
+        return np.zeros(len(starts), dtype=np.int64), np.zeros(len(starts), dtype=bool)
+
+    indices = np.clip(np.searchsorted(subsubregions[:, 2], starts, side='right') - 1, 0, None)
+    covered = (subsubregions[indices, 2] <= starts) & (starts <= subsubregions[indices, 3])
+    return indices, covered
+
+def combined_interval_boundaries(subsubregions_0, subsubregions_15):
+    """
+    Create combined intervals from the sorted union of the boundaries of two sets of sub-subregions.
+
+    Args:
+    - subsubregions_0 (np.ndarray): (n, 4) array of sub-subregions starting at index 0.
+    - subsubregions_15 (np.ndarray): (n, 4) array of sub-subregions starting at index 15.
+
+    Returns:
+    - tuple: (starts, ends) arrays of the combined intervals.
+    """
+    boundaries = np.union1d(
+        np.concatenate((subsubregions_0[:, 2], subsubregions_0[:, 3] + 1)),
+        np.concatenate((subsubregions_15[:, 2], subsubregions_15[:, 3] + 1)),
+    )
+    return boundaries[:-1], boundaries[1:] - 1
+
+def combined_interval_scores(starts, ends, coverings, totals):
+    """
+    Score combined intervals from the impact totals of the sub-subregions covering them.
+
+    Args:
+    - starts (np.ndarray): Combined interval starts.
+    - ends (np.ndarray): Combined interval ends.
+    - coverings (list of tuples): (indices, covered) of each set of sub-subregions, as returned by covering_subsubregions.
+    - totals (list of np.ndarray): Impact totals of each set of sub-subregions.
+
+    Returns:
+    - np.ndarray: Overlap-weighted average score of each combined interval.
+    """
+    lengths = ends - starts + 1
+
+    # Every combined interval lies inside at most one sub-subregion of each set;
+    # accumulate their overlap-weighted impact totals in set order
+    total_impact_scores = np.zeros(len(starts))
+    total_lengths = np.zeros(len(starts), dtype=np.int64)
+    for set_totals, (indices, covered) in zip(totals, coverings):
+        total_impact_scores += np.where(covered, set_totals[indices] * lengths, 0)
+        total_lengths += np.where(covered, lengths, 0)
+
+    scores = np.zeros(len(starts))
+    np.divide(total_impact_scores, total_lengths, out=scores, where=total_lengths > 0)
+    return scores
+
+def combine_tiling_scores(scores_0, scores_15, unique_mutations=None, window=None, tiling=None):
+    """
+    Combine the columnar scores of two sets of sub-subregions into intervals between their boundaries.
+
+    Args:
+    - scores_0 (TilingScores): Scores for sub-subregions starting at index 0.
+    - scores_15 (TilingScores): Scores for sub-subregions starting at index 15, sharing the same mutation arrays.
+    - unique_mutations (tuple, optional): Output of unique_mutation_order, to share it across windows.
+    - window (tuple, optional): (window_start, window_end); only combined intervals inside it are kept.
+    - tiling (Tiling, optional): Precomputed combined intervals of the whole sequence (see tiling_cache).
+
+    Returns:
+    - CombinedScores: Columnar combined intervals, mutation offsets and scores.
+    """
+    if tiling is not None:
+        starts, ends = tiling.intervals[:, 0], tiling.intervals[:, 1]
+        coverings = [(tiling.covering_0, tiling.covered_0), (tiling.covering_15, tiling.covered_15)]
+    else:
+        starts, ends = combined_interval_boundaries(scores_0.subsubregions, scores_15.subsubregions)
+        coverings = [covering_subsubregions(scores.subsubregions, starts) for scores in (scores_0, scores_15)]
+
+    if window is not None:
+        inside = (starts >= window[0]) & (ends <= window[1])
+        starts, ends = starts[inside], ends[inside]
+        coverings = [(indices[inside], covered[inside]) for indices, covered in coverings]
+    scores = combined_interval_scores(starts, ends, coverings, (scores_0.totals, scores_15.totals))
+
+    # Locate the unique mutations of each combined interval
+    if unique_mutations is None:
+        unique_mutations = unique_mutation_order(scores_0.positions, scores_0.impacts)
+    sorted_positions, order = unique_mutations
+    lo = np.searchsorted(sorted_positions, starts, side='left')
+    hi = np.searchsorted(sorted_positions, ends, side='right')
+
+    intervals = np.column_stack((starts, ends))
+    return CombinedScores(intervals, lo, hi, scores, scores_0.positions, scores_0.impacts, order)
+
+def combined_scores_to_tuples(combined_scores, mutations=None):
+    """
+    Convert columnar combined scores to the list-of-tuples format of combine_and_map_mutations.
+
+    Args:
+    - combined_scores (CombinedScores): Columnar combined intervals and scores.
+    - mutations (list of tuples, optional): The original mutations; rebuilt from the arrays if not given.
+
+    Returns:
+    - list: (interval, combined_mutations, normalized_impact_score) for each combined interval.
+    """
+    if mutations is None or isinstance(mutations, tuple):
+        mutations = list(zip(combined_scores.positions.tolist(), combined_scores.impacts.tolist()))
+
+    mapped_data = []
+    lo, hi, order = combined_scores.lo.tolist(), combined_scores.hi.tolist(), combined_scores.order
+    for i, (interval, score) in enumerate(zip(combined_scores.intervals.tolist(), combined_scores.scores.tolist())):
+        combined_mutations = [mutations[j] for j in np.sort(order[lo[i]:hi[i]]).tolist()]
+        mapped_data.append((interval, combined_mutations, score))
     return mapped_data
@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from src.seq_partitioner import DEFAULT_GEOMETRY, partition_geometry, partition_seq_length_arrays
+from src.subsubregion_combiner import combined_interval_boundaries, covering_subsubregions
+
+# Everything about the partitioning that depends only on the sequence length (and the tiling geometry):
+# - subsubregions_0, subsubregions_15: (n, 4) arrays of sub-subregions starting at index 0 and 15.
+# - intervals: (n, 2) array of combined [start, end] intervals.
+# - covering_0, covered_0, covering_15, covered_15: the sub-subregion of each set covering each combined interval.
+Tiling = namedtuple('Tiling', ['subsubregions_0', 'subsubregions_15', 'intervals', 'covering_0', 'covered_0', 'covering_15', 'covered_15'])
+
+# Default number of tilings kept in memory
+DEFAULT_TILING_CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_settings = {'maxsize': DEFAULT_TILING_CACHE_SIZE, 'cache_dir': os.environ.get('MICA_TILING_CACHE_DIR')}
+_counters = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'disk_misses': 0}
+
+def build_tiling(seq_length, geometry=DEFAULT_GEOMETRY):
+    """
+    Partition a sequence length and precompute its combined intervals.
+
+    Args:
+    - seq_length (int): Length of the sequence.
+    - geometry (TilingGeometry, optional): Tiling geometry.
+
+    Returns:
+    - Tiling: The precomputed partitions and combined intervals.
+    """
+    subsubregions_0, subsubregions_15 = partition_seq_length_arrays(seq_length, geometry)
+    starts, ends = combined_interval_boundaries(subsubregions_0, subsubregions_15)
+    covering_0, covered_0 = covering_subsubregions(subsubregions_0, starts)
+    covering_15, covered_15 = covering_subsubregions(subsubregions_15, starts)
+    return Tiling(subsubregions_0, subsubregions_15, np.column_stack((starts, ends)), covering_0, covered_0, covering_15, covered_15)
+
+def tiling_cache_path(seq_length, cache_dir, geometry=DEFAULT_GEOMETRY):
+    """
+    Get the on-disk cache file of a sequence length.
+
+    Args:
+    - seq_length (int): Length of the sequence.
+    - cache_dir (str): Directory of the on-disk cache.
+    - geometry (TilingGeometry, optional): Tiling geometry; files of the default geometry are named by length only.
+
+    Returns:
+    - str: Path to the .npz file.
+    """
+    if partition_geometry(geometry) == partition_geometry(DEFAULT_GEOMETRY):
+        return os.path.join(cache_dir, f"tiling_{seq_length}.npz")
+    step, offset, max_length = partition_geometry(geometry)
+    return os.path.join(cache_dir, f"tiling_{seq_length}_{step}_{offset}_{max_length}.npz")
+
+def load_tiling(path):
+    """
+    Load a tiling from an .npz file.
+
+    Args:
+    - path (str): Path to the .npz file.
+
+    Returns:
+    - Tiling: The loaded tiling.
+    """
+    with np.load(path) as data:
+        return Tiling(*(data[field] for field in Tiling._fields))
+
+def save_tiling(path, tiling):
+    """
+    Save a tiling to an .npz file atomically, so concurrent workers never read a partial file.
+
+    Args:
+    - path (str): Path to the .npz file.
+    - tiling (Tiling): The tiling to save.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **tiling._asdict())
+    os.replace(temp_path, path)
+
+def load_or_build_tiling(seq_length, cache_dir, geometry=DEFAULT_GEOMETRY):
+    """
+    Load a tiling from the on-disk cache, building and saving it on a miss.
+
+    Args:
+    - seq_length (int): Length of the sequence.
+    - cache_dir (str): Directory of the on-disk cache, or None to disable it.
+    - geometry (TilingGeometry, optional): Tiling geometry.
+
+    Returns:
+    - Tiling: The tiling of the sequence length.
+    """
+    if cache_dir is None:
+        return build_tiling(seq_length, geometry)
+
+    path = tiling_cache_path(seq_length, cache_dir, geometry)
+    if os.path.isfile(path):
+        try:
+            tiling = load_tiling(path)
+            with _lock:
+                _counters['disk_hits'] += 1
+            return tiling
+        except (OSError, ValueError, KeyError):
+            pass  # Unreadable cache file; rebuild it
+
+    with _lock:
+        _counters['disk_misses'] += 1
+    tiling = build_tiling(seq_length, geometry)
+    try:
+        save_tiling(path, tiling)
+    except OSError:
+        pass  # The on-disk cache is best effort
+    return tiling
+
+def get_tiling(seq_length, geometry=DEFAULT_GEOMETRY):
+    """
+    Get the tiling of a sequence length from the process-wide LRU cache.
+
+    Args:
+    - seq_length (int): Length of the sequence.
+    - geometry (TilingGeometry, optional): Tiling geometry; only its step, offset and max_length matter.
+
+    Returns:
+    - Tiling: The tiling of the sequence length. Its arrays are shared and read-only.
+    """
+    key = (seq_length,) + partition_geometry(geometry)
+    with _lock:
+        tiling = _cache.get(key)
+        if tiling is not None:
+            _counters['hits'] += 1
+            _cache.move_to_end(key)
+            return tiling
+        _counters['misses'] += 1
+
+    tiling = load_or_build_tiling(seq_length, _settings['cache_dir'], geometry)
+    for array in tiling:
+        array.setflags(write=False)
+
+    with _lock:
+        _cache[key] = tiling
+        _cache.move_to_end(key)
+        while len(_cache) > _settings['maxsize']:
+            _cache.popitem(last=False)
+    return tiling
+
+def configure_tiling_cache(maxsize=None, cache_dir=None):
+    """
+    Configure the tiling cache.
+
+    Args:
+    - maxsize (int, optional): Number of tilings kept in memory.
+    - cache_dir (str, optional): Directory of the on-disk .npz cache shared between processes.
+    """
+    with _lock:
+        if maxsize is not None:
+            _settings['maxsize'] = max(1, maxsize)
+            while len(_cache) > _settings['maxsize']:
+                _cache.popitem(last=False)
+        if cache_dir is not None:
+            _settings['cache_dir'] = cache_dir
+
+def tiling_cache_info():
+    """
+    Get the tiling cache counters.
+
+    Returns:
+    - dict: Memory hits and misses, on-disk hits and misses, current and maximum size.
+    """
+    with _lock:
+        return dict(_counters, currsize=len(_cache), maxsize=_settings['maxsize'], cache_dir=_settings['cache_dir'])
+
+def clear_tiling_cache():
+    """
+    Empty the in-memory tiling cache and reset its counters.
+    """
+    with _lock:
+        _cache.clear()
+        for key in _counters:
+            _counters[key] = 0
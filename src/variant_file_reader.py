@@ -0,0 +1,220 @@
+import os
+import re
+import gzip
+from array import array
+import numpy as np
+
+# Supported variant file formats by file extension; each may be plain or (b)gzipped
+VARIANT_FILE_FORMATS = {
+    '.vcf': 'vcf',
+    '.bed': 'bed',
+}
+
+CONTIG_HEADER = re.compile(r'^##contig=<(.*)>')
+
+# First tokens of BED header lines; contigs may start with the same letters, e.g. 'track2'
+BED_HEADER_LINES = ('track', 'browser')
+
+# Integer impact scores, which keep the impacts int64 as in read_mutation_data
+INTEGER_SCORE = re.compile(r'^\s*[+-]?\d+\s*$')
+
+def detect_variant_format(file_path):
+    """
+    Detect the format of a variant file from its extension.
+
+    Args:
+    - file_path (str): Path to the input file.
+
+    Returns:
+    - str: 'vcf' or 'bed', or None if the file is not a variant file.
+    """
+    name = file_path.lower()
+    for suffix in ('.gz', '.bgz'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return VARIANT_FILE_FORMATS.get(os.path.splitext(name)[1])
+
+def open_variant_file(file_path):
+    """
+    Open a plain or (b)gzipped text file for streaming.
+
+    Args:
+    - file_path (str): Path to the input file.
+
+    Returns:
+    - file object: Text-mode file object.
+    """
+    with open(file_path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(file_path, 'rt')
+    return open(file_path, 'r')
+
+def parse_contig_header(line):
+    """
+    Parse the ID and length of a ##contig header line.
+
+    Args:
+    - line (str): VCF header line.
+
+    Returns:
+    - tuple: (contig, length), with length None if it is not given; None if the line is not a contig header.
+    """
+    match = CONTIG_HEADER.match(line)
+    if not match:
+        return None
+    fields = dict(item.split('=', 1) for item in match.group(1).split(',') if '=' in item)
+    length = fields.get('length')
+    return fields.get('ID'), int(length) if length and length.isdigit() else None
+
+def contig_dir_name(contig, used_names=()):
+    """
+    Turn a contig name into a safe result directory name.
+
+    Path separators become '_' and names made only of dots (such as '..') have their dots replaced, so every
+    contig stays inside the result directory. Other names, e.g. 'chr1', are kept as they are.
+
+    Args:
+    - contig (str): Contig name from the variant file.
+    - used_names (set, optional): Directory names already taken by other contigs; a clashing name gets a numeric suffix.
+
+    Returns:
+    - str: Directory name of the contig.
+    """
+    name = re.sub(r'[/\\\0]', '_', contig)
+    if not name.strip('.'):
+        name = name.replace('.', '_') or '_'
+    unique_name, suffix = name, 2
+    while unique_name in used_names:
+        unique_name, suffix = f"{name}_{suffix}", suffix + 1
+    return unique_name
+
+def read_contig_lengths(file_path):
+    """
+    Read contig lengths from a two-column (contig, length) file such as a .fai index or .genome file.
+
+    Args:
+    - file_path (str): Path to the contig lengths file.
+
+    Returns:
+    - dict: Contig lengths if successful.
+    - str: Error message if any issue occurs.
+    """
+    if not os.path.isfile(file_path):
+        return f"File not found: {file_path}"
+
+    contig_lengths = {}
+    with open(file_path) as f:
+        for line_number, line in enumerate(f, start=1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) < 2 or not fields[1].isdigit():
+                return f"Data type error. Contig lengths line {line_number} must have a contig name and an integer length."
+            contig_lengths[fields[0]] = int(fields[1])
+    return contig_lengths
+
+def info_value(info, info_field):
+    """
+    Get the first value of a field of a VCF INFO column.
+
+    Args:
+    - info (str): INFO column, e.g. 'DP=10;impact_score=0.3,0.1'.
+    - info_field (str): Name of the field.
+
+    Returns:
+    - str: The first value of the field, or None if it is missing.
+    """
+    prefix = info_field + '='
+    for item in info.split(';'):
+        if item.startswith(prefix):
+            value = item[len(prefix):].split(',', 1)[0]
+            return None if value in ('', '.') else value
+    return None
+
+def read_variant_data(file_path, info_field='impact_score', contig_lengths=None, bed_score_column=5):
+    """
+    Stream a plain or bgzipped VCF or BED file in a single pass and route its records by contig.
+
+    VCF positions are converted from 1-based POS to 0-based sequence indices and impact scores are taken
+    from an INFO field; records without it are skipped. BED positions are the 0-based start column and
+    impact scores are taken from bed_score_column. Contig lengths come from the VCF ##contig headers,
+    overridden by contig_lengths.
+
+    Args:
+    - file_path (str): Path to the input VCF or BED file.
+    - info_field (str, optional): INFO field holding the impact score. Default is 'impact_score'.
+    - contig_lengths (dict, optional): Contig lengths overriding (or, for BED, replacing) the header lengths.
+    - bed_score_column (int, optional): 1-based BED column holding the impact score. Default is 5 (score).
+
+    Returns:
+    - dict: {contig: ((positions, impacts), seq_length)} in file order, with seq_length None if unknown.
+      Impacts are int64 if every impact score of the file is an integer, else float64.
+    - str: Error message if any issue occurs.
+    """
+    try:
+        if not os.path.isfile(file_path):
+            return f"File not found: {file_path}"
+
+        file_format = detect_variant_format(file_path)
+        if file_format is None:
+            return "Invalid file format. Only VCF and BED files (plain or bgzipped) are supported."
+
+        header_lengths = {}
+        positions = {}
+        impacts = {}
+        integral = True
+        with open_variant_file(file_path) as f:
+            for line_number, line in enumerate(f, start=1):
+                if line.startswith('#') or not line.strip() or (file_format == 'bed' and line.split(None, 1)[0] in BED_HEADER_LINES):
+                    contig_header = parse_contig_header(line) if line.startswith('##contig') else None
+                    if contig_header and contig_header[1] is not None:
+                        header_lengths[contig_header[0]] = contig_header[1]
+                    continue
+
+                # Split only the columns that are needed
+                if file_format == 'vcf':
+                    fields = line.rstrip('\r\n').split('\t', 8)
+                    if len(fields) < 8:
+                        return f"Parsing error. VCF line {line_number} has fewer than 8 columns."
+                    contig, position, value = fields[0], int(fields[1]) - 1, info_value(fields[7], info_field)
+                    if value is None:
+                        continue
+                else:
+                    fields = line.rstrip('\r\n').split('\t', bed_score_column)
+                    if len(fields) < max(3, bed_score_column):
+                        return f"Parsing error. BED line {line_number} has no column {bed_score_column}."
+                    contig, position, value = fields[0], int(fields[1]), fields[bed_score_column - 1]
+
+                try:
+                    impact = float(value)
+                except ValueError:
+                    return f"Data type error. Line {line_number}: the impact score must be a float or integer. Received: {value}"
+                if impact != impact:
+                    return f"Data error. Line {line_number}: the impact score must not be a missing value."
+                if integral and not INTEGER_SCORE.match(value):
+                    integral = False
+
+                if contig not in positions:
+                    positions[contig] = array('q')
+                    impacts[contig] = array('d')
+                positions[contig].append(position)
+                impacts[contig].append(impact)
+
+        if not positions:
+            return "File is empty."
+
+        lengths = {**header_lengths, **(contig_lengths or {})}
+        impact_dtype = np.int64 if integral else np.float64
+        return {
+            contig: (
+                (np.frombuffer(positions[contig], dtype=np.int64), np.frombuffer(impacts[contig], dtype=np.float64).astype(impact_dtype, copy=False)),
+                lengths.get(contig)
+            )
+            for contig in positions
+        }
+
+    except ValueError as e:
+        return f"Data type error. {str(e)}"
+    except (OSError, EOFError) as e:
+        return f"{str(e)}"
@@ -1,93 +1,233 @@
+import threading
+from collections import OrderedDict, namedtuple
 import numpy as np
-from src.mutation_and_weight_assignor import assign_positional_weight
-from src.normalizer import weighted_ave_normalization 
+from src.data_bucketer import group_first_indices
+from src.mutation_and_weight_assignor import DEFAULT_KERNEL, assign_positional_weight
+from src.normalizer import weighted_ave_normalization, weighted_ave_normalization_array
 
-def calculate_subsubregion_weights(subsubregion, subsubregion_mutations):
+# Scores selectable on the command line: summed impacts, or impacts spread over their neighbourhood by distance
+SCORE_MODES = ['impact', 'positional']
+
+# Summed impacts of a set of sub-subregions by offset, aggregated once and rescored with any kernel:
+# - bin_ids, offsets, impacts: total impact of each occupied (sub-subregion, offset from its start) pair.
+# - lengths: number of positions of each sub-subregion.
+ImpactProfile = namedtuple('ImpactProfile', ['bin_ids', 'offsets', 'impacts', 'lengths'])
+
+# Default number of cumulative kernels kept in memory
+DEFAULT_KERNEL_CACHE_SIZE = 64
+
+_kernel_cache = OrderedDict()
+_kernel_lock = threading.Lock()
+_kernel_settings = {'maxsize': DEFAULT_KERNEL_CACHE_SIZE}
+
+def cumulative_positional_weights(max_length, kernel=DEFAULT_KERNEL):
+    """
+    Cumulative positional weights of the distances 0 to max_length - 1, built once per (kernel, length).
+
+    Args:
+    - max_length (int): Number of distances.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight.
+
+    Returns:
+    - np.ndarray: Read-only sums of the weights of the distances 0 to d, for each distance d.
+    """
+    key = (kernel, max(1, max_length))
+    with _kernel_lock:
+        cumulative = _kernel_cache.get(key)
+        if cumulative is not None:
+            _kernel_cache.move_to_end(key)
+            return cumulative
+
+    cumulative = np.cumsum(assign_positional_weight(np.arange(key[1]), kernel))
+    cumulative.setflags(write=False)
+    with _kernel_lock:
+        _kernel_cache[key] = cumulative
+        while len(_kernel_cache) > _kernel_settings['maxsize']:
+            _kernel_cache.popitem(last=False)
+    return cumulative
+
+def configure_kernel_cache(maxsize=None):
+    """
+    Configure the cache of cumulative kernels.
+
+    Args:
+    - maxsize (int, optional): Number of (kernel, length) entries kept in memory.
+    """
+    with _kernel_lock:
+        if maxsize is not None:
+            _kernel_settings['maxsize'] = max(1, maxsize)
+            while len(_kernel_cache) > _kernel_settings['maxsize']:
+                _kernel_cache.popitem(last=False)
+
+def clear_kernel_cache():
+    """
+    Empty the cache of cumulative kernels.
+    """
+    with _kernel_lock:
+        _kernel_cache.clear()
+
+def positional_weight_sums(offsets, lengths, kernel=DEFAULT_KERNEL):
+    """
+    Total positional weight a unit impact at each offset spreads over the positions of its group.
+
+    The positional weighted impact of a group is its impact signal convolved with the weight kernel, and a
+    group score is the mean of that convolution over the group. Summed over the group, the convolution of an
+    impact at offset o is the kernel convolved with the group's box of ones, evaluated at o: the cumulative
+    weights of the distances to the group's first and last position. Scores therefore cost one lookup per
+    impact rather than one distance vector per impact and position.
+
+    Args:
+    - offsets (np.ndarray): Offset of each impact from the first position of its group.
+    - lengths (np.ndarray): Number of positions of the group of each impact.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight.
+
+    Returns:
+    - np.ndarray: Sum over the positions k of the group of the weight of |k - offset|, for each impact.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if not len(offsets):
+        return np.zeros(0)
+    cumulative = cumulative_positional_weights(int(lengths.max()), kernel)
+    return cumulative[offsets] + cumulative[lengths - 1 - offsets] - cumulative[0]
+
+def impact_profile(tiling_scores):
+    """
+    Aggregate the impacts of a set of sub-subregions by offset within each sub-subregion.
+
+    Args:
+    - tiling_scores (TilingScores): Columnar impact scores of a set of sub-subregions.
+
+    Returns:
+    - ImpactProfile: Total impact of each occupied (sub-subregion, offset) pair, for profile_scores.
+    """
+    subsubregions = tiling_scores.subsubregions
+    lo, hi = tiling_scores.lo, tiling_scores.hi
+    starts = subsubregions[:, 2].astype(np.int64)
+    lengths = subsubregions[:, 3].astype(np.int64) - starts + 1
+
+    # Mutations of the sub-subregions, one run of the sorted order, labelled with their sub-subregion
+    run = tiling_scores.order[lo[0]:hi[-1]] if len(subsubregions) else tiling_scores.order[:0]
+    bin_ids = np.repeat(np.arange(len(subsubregions)), hi - lo)
+    positions = tiling_scores.positions[run]
+
+    # The run is sorted by position, so the mutations of each (sub-subregion, offset) pair are adjacent;
+    # sum their impacts in input order
+    new_pair = np.ones(len(run), dtype=bool)
+    new_pair[1:] = positions[1:] != positions[:-1]
+    pair_ids = np.cumsum(new_pair) - 1
+    input_order = np.argsort(run, kind='stable')
+    impacts = np.bincount(pair_ids[input_order], weights=tiling_scores.impacts[run[input_order]], minlength=int(new_pair.sum()))
+
+    bin_ids = bin_ids[new_pair]
+    return ImpactProfile(bin_ids, positions[new_pair] - starts[bin_ids], impacts.astype(np.float64, copy=False), lengths)
+
+def profile_scores(profile, kernel=DEFAULT_KERNEL):
+    """
+    Positional weighted totals and scores of the sub-subregions of an impact profile.
+
+    Args:
+    - profile (ImpactProfile): Aggregated impacts of a set of sub-subregions.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight.
+
+    Returns:
+    - tuple: (totals, scores) arrays, the total positional weighted impact and its mean per position.
+    """
+    weight_sums = positional_weight_sums(profile.offsets, profile.lengths[profile.bin_ids], kernel)
+    totals = np.bincount(profile.bin_ids, weights=profile.impacts * weight_sums, minlength=len(profile.lengths)).astype(np.float64, copy=False)
+    return totals, weighted_ave_normalization_array(totals, profile.lengths)
+
+def positional_tiling_scores(tiling_scores, kernel=DEFAULT_KERNEL, profile=None):
+    """
+    Score a set of sub-subregions by the mean positional weighted impact of their mutations.
+
+    Args:
+    - tiling_scores (TilingScores): Columnar impact scores of a set of sub-subregions.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight, with distances in positions.
+    - profile (ImpactProfile, optional): impact_profile(tiling_scores), to rescore with several kernels.
+
+    Returns:
+    - TilingScores: The same sub-subregions and mutations, with positional weighted totals and their means per position.
+    """
+    if profile is None:
+        profile = impact_profile(tiling_scores)
+    totals, scores = profile_scores(profile, kernel)
+    return tiling_scores._replace(totals=totals, scores=scores)
+
+def positional_group_scores(values, group_index, num_groups, kernel=DEFAULT_KERNEL):
+    """
+    Score groups of consecutive items by the mean positional weighted value of their items.
+
+    Args:
+    - values (np.ndarray): Value of each item.
+    - group_index (np.ndarray): Sorted group of each item.
+    - num_groups (int): Number of groups; every group must have at least one item.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight, with distances in items.
+
+    Returns:
+    - np.ndarray: Score of each group.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    first = group_first_indices(group_index, num_groups)
+    counts = np.bincount(group_index, minlength=num_groups)
+    offsets = np.arange(len(values)) - first[group_index]
+    weight_sums = positional_weight_sums(offsets, counts[group_index], kernel)
+    totals = np.bincount(group_index, weights=values * weight_sums, minlength=num_groups)
+    return weighted_ave_normalization_array(totals, counts)
+
+def calculate_subsubregion_weights(subsubregion, subsubregion_mutations, kernel=DEFAULT_KERNEL):
     """
     Calculate the weighted impact for a sub-subregion based on mutations.
 
     Args:
     - subsubregion (list): A sub-subregion represented as [subsubregion_number, length, start_index, end_index].
     - subsubregion_mutations (list of tuples): Mutations within the sub-subregion, each represented as (position, impact).
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight, with distances in positions.
 
     Returns:
     - float: The normalized weighted impact for the sub-subregion.
     """
-    total_positional_weighted_impact = 0
-
     # Return 0 if no mutations are found in the subsubregion
     if not subsubregion_mutations:
         return 0
 
-    for pos, impact in subsubregion_mutations:
-        # Calculate the distance from the mutation position to each position in the sub-subregion
-        distance = np.abs(np.arange(subsubregion[2], subsubregion[3] + 1) - pos)
-        # Calculate positional weights based on the distance
-        positional_weights = assign_positional_weight(distance)
-        # Calculate the positional weighted impact
-        positional_weighted_impact = positional_weights * impact
-        # Accumulate the total positional weighted impact
-        total_positional_weighted_impact += positional_weighted_impact
+    length = subsubregion[3] - subsubregion[2] + 1
+    positions, impacts = np.array(subsubregion_mutations, dtype=np.float64).T
+    weight_sums = positional_weight_sums(positions.astype(np.int64) - subsubregion[2], np.full(len(positions), length), kernel)
 
-    # Normalize the total positional weighted impact
-    subsubregion_normalized_weighted_impact = weighted_ave_normalization(total_positional_weighted_impact)
-    return subsubregion_normalized_weighted_impact
+    # Normalize the total positional weighted impact by the number of positions
+    return weighted_ave_normalization(np.dot(impacts, weight_sums), length)
 
-
-def calculate_subregion_weights(subregion):
+def calculate_subregion_weights(subregion, kernel=DEFAULT_KERNEL):
     """
     Calculate the weights for a subregion.
 
     Args:
-    - subregion (list): A list of sub-subregions within a subregion.
+    - subregion (list): A list of (interval, combined_mutations, weight) sub-subregions within a subregion.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight, with distances in sub-subregions.
 
     Returns:
     - float: The normalized weighted impact for the subregion.
     """
-    subregion_size = len(subregion)
-    total_positional_weighted_impact = np.zeros(subregion_size)
-    
     if not subregion:
         return 0  # Return 0 if no sub-subregions found in the subregion
 
-    for i, (interval, combined_mutations, weight) in enumerate(subregion):
-        if weight == 0:
-            continue
-
-        distance = np.abs(np.arange(subregion_size) - i)
-        positional_weights = assign_positional_weight(distance)
-        positional_weighted_impact = positional_weights * weight
-        total_positional_weighted_impact += positional_weighted_impact
-        
-    subregion_normalized_weighted_impact = weighted_ave_normalization(total_positional_weighted_impact)
-    return subregion_normalized_weighted_impact
+    weights = np.array([weight for _, _, weight in subregion], dtype=np.float64)
+    return float(positional_group_scores(weights, np.zeros(len(weights), dtype=np.int64), 1, kernel)[0])
 
-
-def calculate_region_weights(region):
+def calculate_region_weights(region, kernel=DEFAULT_KERNEL):
     """
     Calculate the weights for a region.
 
     Args:
     - region (list): A list of subregions within a region.
+    - kernel (DecayKernel, optional): Decay kernel of assign_positional_weight, with distances in sub-subregions and subregions.
 
     Returns:
     - float: The normalized weighted impact for the region.
     """
-    region_size = len(region)
-    total_positional_weighted_impact = np.zeros(region_size)
-    
     if not region:
         return 0  # Return 0 if no subregions found in the region
 
-    for i, subregion in enumerate(region):
-        subregion_weight = calculate_subregion_weights(subregion)
-        if subregion_weight == 0:
-            continue
-        distance = np.abs(np.arange(region_size) - i)
-        positional_weights = assign_positional_weight(distance)
-        positional_weighted_impact = positional_weights * subregion_weight
-        total_positional_weighted_impact += positional_weighted_impact
-
-    region_normalized_weighted_impact = weighted_ave_normalization(total_positional_weighted_impact)
-
-    return region_normalized_weighted_impact
\ No newline at end of file
+    subregion_weights = np.array([calculate_subregion_weights(subregion, kernel) for subregion in region])
+    return float(positional_group_scores(subregion_weights, np.zeros(len(subregion_weights), dtype=np.int64), 1, kernel)[0])